@@ -0,0 +1,388 @@
+"""
+Gera CSVs sintéticos no formato do dataset da Olist, em qualquer escala.
+
+Os sete arquivos lidos por pipeline.load_raw_data são gerados com as mesmas
+colunas do Kaggle e com distribuições parecidas com as reais: estados,
+cidades, categorias, vendedores e produtos seguem distribuições concentradas
+(São Paulo tem ~42% dos clientes, poucas categorias concentram a maior parte
+dos itens), o volume de pedidos cresce ao longo do período, com sazonalidade
+semanal e pico na Black Friday, e atrasos na entrega derrubam a nota da
+avaliação.
+
+Os pedidos são gerados e gravados em blocos, então a memória usada não
+depende da escala: 100 mil itens levam segundos, 100 milhões levam horas e
+dezenas de GB em disco. A mesma semente gera sempre os mesmos arquivos.
+
+Uso (a partir da raiz do repositório):
+    python benchmarks/generate_olist_data.py --items 100000 --output data/synthetic/
+    python benchmarks/generate_olist_data.py --items 10000000 --output /mnt/olist_10m/ --seed 7
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# Mesmos nomes de arquivo de pipeline.FILES_TO_LOAD
+ORDERS_FILE = "olist_orders_dataset.csv"
+ITEMS_FILE = "olist_order_items_dataset.csv"
+CUSTOMERS_FILE = "olist_customers_dataset.csv"
+PRODUCTS_FILE = "olist_products_dataset.csv"
+PAYMENTS_FILE = "olist_order_payments_dataset.csv"
+REVIEWS_FILE = "olist_order_reviews_dataset.csv"
+TRANSLATION_FILE = "product_category_name_translation.csv"
+
+# Período coberto pelo dataset original
+PERIOD_START = pd.Timestamp("2016-09-04")
+PERIOD_END = pd.Timestamp("2018-09-03")
+BLACK_FRIDAY = pd.Timestamp("2017-11-24")
+
+# Participação de cada estado nos clientes, com a capital (cidade mais comum)
+STATES = {
+    "SP": (0.420, "sao paulo"), "RJ": (0.129, "rio de janeiro"), "MG": (0.117, "belo horizonte"),
+    "RS": (0.055, "porto alegre"), "PR": (0.051, "curitiba"), "SC": (0.037, "florianopolis"),
+    "BA": (0.034, "salvador"), "DF": (0.022, "brasilia"), "ES": (0.020, "vitoria"),
+    "GO": (0.020, "goiania"), "PE": (0.017, "recife"), "CE": (0.013, "fortaleza"),
+    "PA": (0.010, "belem"), "MT": (0.009, "cuiaba"), "MA": (0.008, "sao luis"),
+    "MS": (0.007, "campo grande"), "PB": (0.005, "joao pessoa"), "PI": (0.005, "teresina"),
+    "RN": (0.005, "natal"), "AL": (0.004, "maceio"), "SE": (0.003, "aracaju"),
+    "TO": (0.003, "palmas"), "RO": (0.003, "porto velho"), "AM": (0.0015, "manaus"),
+    "AC": (0.0008, "rio branco"), "AP": (0.0007, "macapa"), "RR": (0.0005, "boa vista"),
+}
+# Parte dos clientes de cada estado que mora na capital; o restante se
+# espalha (Zipf) por CITIES_PER_STATE municípios do interior
+CAPITAL_SHARE = 0.35
+CITIES_PER_STATE = 200
+# Estados com entrega mais rápida; nos demais a mediana é maior
+FAST_DELIVERY_STATES = {"SP": 6.0, "PR": 9.0, "MG": 9.0, "RJ": 11.0, "SC": 11.0, "RS": 12.0, "DF": 10.0}
+DEFAULT_DELIVERY_DAYS = 16.0
+
+# Categorias (em ordem de popularidade) e a tradução para o inglês
+CATEGORIES = [
+    ("cama_mesa_banho", "bed_bath_table"), ("beleza_saude", "health_beauty"),
+    ("esporte_lazer", "sports_leisure"), ("moveis_decoracao", "furniture_decor"),
+    ("informatica_acessorios", "computers_accessories"), ("utilidades_domesticas", "housewares"),
+    ("relogios_presentes", "watches_gifts"), ("telefonia", "telephony"),
+    ("ferramentas_jardim", "garden_tools"), ("automotivo", "auto"),
+    ("brinquedos", "toys"), ("cool_stuff", "cool_stuff"), ("perfumaria", "perfumery"),
+    ("bebes", "baby"), ("eletronicos", "electronics"), ("papelaria", "stationery"),
+    ("fashion_bolsas_e_acessorios", "fashion_bags_accessories"), ("pet_shop", "pet_shop"),
+    ("moveis_escritorio", "office_furniture"), ("consoles_games", "consoles_games"),
+    ("malas_acessorios", "luggage_accessories"), ("construcao_ferramentas_construcao", "construction_tools_construction"),
+    ("eletrodomesticos", "home_appliances"), ("instrumentos_musicais", "musical_instruments"),
+    ("eletroportateis", "small_appliances"), ("casa_construcao", "home_construction"),
+    ("livros_interesse_geral", "books_general_interest"), ("alimentos", "food"),
+    ("moveis_sala", "furniture_living_room"), ("casa_conforto", "home_confort"),
+    ("bebidas", "drinks"), ("audio", "audio"), ("market_place", "market_place"),
+    ("climatizacao", "air_conditioning"), ("livros_tecnicos", "books_technical"),
+    ("fashion_calcados", "fashion_shoes"), ("artes", "art"), ("pcs", "computers"),
+    ("artigos_de_natal", "christmas_supplies"), ("musica", "music"),
+]
+# Produtos sem categoria no cadastro
+MISSING_CATEGORY_SHARE = 0.0185
+
+ORDER_STATUSES = {
+    "delivered": 0.9702, "shipped": 0.0111, "canceled": 0.0063, "unavailable": 0.0061,
+    "invoiced": 0.0032, "processing": 0.0030, "created": 0.0001,
+}
+# Probabilidade de o pedido ter 1, 2, 3... itens (média de ~1,14 item por pedido)
+ITEMS_PER_ORDER = [0.900, 0.075, 0.015, 0.006, 0.004]
+PAYMENT_TYPES = {"credit_card": 0.739, "boleto": 0.190, "voucher": 0.056, "debit_card": 0.015}
+# Distribuição da nota quando o pedido chega no prazo e quando atrasa (notas 1 a 5)
+REVIEW_SCORES_ON_TIME = [0.07, 0.03, 0.08, 0.20, 0.62]
+REVIEW_SCORES_LATE = [0.45, 0.10, 0.13, 0.12, 0.20]
+REVIEW_SHARE = 0.993
+DUPLICATE_REVIEW_SHARE = 0.006
+REVIEW_MESSAGES = [
+    "Produto chegou antes do prazo, recomendo",
+    "Ótimo produto, bem embalado",
+    "Não recebi o produto até agora",
+    "Veio com defeito, \"péssimo\"",
+    "Bom custo-benefício,\nentrega rápida",
+    "",
+]
+
+# Proporções de cadastro em relação ao número de itens
+PRODUCTS_PER_ITEM = 0.29
+SELLERS_PER_ITEM = 0.027
+# Parte dos pedidos feita por um cliente que já comprou antes
+REPEAT_CUSTOMER_SHARE = 0.03
+
+_HEX_DIGITS = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+_SHIFTS = np.arange(60, -4, -4, dtype=np.uint64)
+
+
+def _mix64(values: np.ndarray) -> np.ndarray:
+    # Finalizador do splitmix64: uma bijeção nos inteiros de 64 bits que
+    # espalha bem índices consecutivos
+    with np.errstate(over="ignore"):
+        values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+def hex_ids(index: np.ndarray, salt: int) -> np.ndarray:
+    """
+    IDs de 32 dígitos hexadecimais (como os md5 da Olist), determinísticos e
+    únicos para cada par (índice, salt).
+    """
+    with np.errstate(over="ignore"):
+        high = _mix64(index.astype(np.uint64) + np.uint64(salt) * np.uint64(0x9E3779B97F4A7C15))
+    low = _mix64(high)
+    halves = [(part[:, None] >> _SHIFTS) & np.uint64(0xF) for part in (high, low)]
+    digits = _HEX_DIGITS[np.hstack(halves).astype(np.uint8)]
+    return np.ascontiguousarray(digits).view("S32").ravel().astype("U32")
+
+
+def zipf_weights(n: int, exponent: float = 1.1) -> np.ndarray:
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+
+def day_weights() -> tuple[pd.DatetimeIndex, np.ndarray]:
+    """
+    Peso de cada dia do período: crescimento das vendas ao longo do tempo,
+    menos compras no fim de semana e o pico da Black Friday.
+    """
+    days = pd.date_range(PERIOD_START, PERIOD_END, freq="D")
+    growth = np.linspace(0.05, 1.0, len(days)) ** 0.6
+    weekday = np.array([1.10, 1.12, 1.08, 1.05, 0.98, 0.80, 0.87])[days.dayofweek]
+    special = np.where(days == BLACK_FRIDAY, 6.0, 1.0) + np.where(abs(days - BLACK_FRIDAY).days <= 3, 1.0, 0.0)
+    weights = growth * weekday * special
+    return days, weights / weights.sum()
+
+
+def _timestamps(values: pd.DatetimeIndex | pd.Series, mask: np.ndarray | None = None) -> np.ndarray:
+    # Datas no formato do CSV original; posições fora de `mask` ficam vazias
+    formatted = pd.DatetimeIndex(values).strftime("%Y-%m-%d %H:%M:%S").to_numpy(dtype=object)
+    if mask is not None:
+        formatted[~mask] = ""
+    return formatted
+
+
+def _write(df: pd.DataFrame, path: str, first_chunk: bool) -> None:
+    df.to_csv(path, mode="w" if first_chunk else "a", header=first_chunk, index=False)
+
+
+class OlistGenerator:
+    """
+    Gera o dataset em blocos de `chunk_orders` pedidos. Produtos, vendedores e
+    a tradução das categorias são gerados uma única vez; pedidos, itens,
+    clientes, pagamentos e avaliações, bloco a bloco.
+    """
+
+    def __init__(self, items: int, output: str, seed: int = 42, chunk_orders: int = 500_000):
+        self.items = items
+        self.output = output
+        self.chunk_orders = chunk_orders
+        self.rng = np.random.default_rng(seed)
+
+        mean_items = np.dot(np.arange(1, len(ITEMS_PER_ORDER) + 1), ITEMS_PER_ORDER)
+        self.orders = max(int(round(items / mean_items)), 1)
+        self.products = max(int(items * PRODUCTS_PER_ITEM), 100)
+        self.sellers = max(int(items * SELLERS_PER_ITEM), 20)
+
+        self.days, self.day_probabilities = day_weights()
+        self.state_codes = np.array(list(STATES))
+        state_shares = np.array([share for share, _ in STATES.values()])
+        self.state_probabilities = state_shares / state_shares.sum()
+        self.capitals = np.array([capital for _, capital in STATES.values()], dtype=object)
+        self.delivery_days = np.array([FAST_DELIVERY_STATES.get(s, DEFAULT_DELIVERY_DAYS) for s in STATES])
+
+        self.product_weights = zipf_weights(self.products)
+        self.seller_weights = zipf_weights(self.sellers, exponent=1.3)
+        self.city_weights = zipf_weights(CITIES_PER_STATE)
+
+    def path(self, filename: str) -> str:
+        return os.path.join(self.output, filename)
+
+    def generate(self) -> dict[str, int]:
+        """
+        Grava os sete arquivos e retorna o número de linhas de cada um.
+        """
+        os.makedirs(self.output, exist_ok=True)
+        rows = {TRANSLATION_FILE: self._write_translation(), PRODUCTS_FILE: self._write_products()}
+
+        for start in range(0, self.orders, self.chunk_orders):
+            size = min(self.chunk_orders, self.orders - start)
+            for filename, count in self._write_chunk(start, size, first_chunk=start == 0).items():
+                rows[filename] = rows.get(filename, 0) + count
+        return rows
+
+    def _write_translation(self) -> int:
+        df = pd.DataFrame(CATEGORIES, columns=["product_category_name", "product_category_name_english"])
+        _write(df, self.path(TRANSLATION_FILE), first_chunk=True)
+        return len(df)
+
+    def _write_products(self) -> int:
+        rng, n = self.rng, self.products
+        category_names = np.array([name for name, _ in CATEGORIES], dtype=object)
+        categories = category_names[rng.choice(len(CATEGORIES), n, p=zipf_weights(len(CATEGORIES), 0.9))]
+        categories[rng.random(n) < MISSING_CATEGORY_SHARE] = ""
+
+        # Preço base de cada produto: os itens do mesmo produto custam parecido
+        self.product_prices = np.round(np.exp(rng.normal(4.3, 0.9, n)) + 5, 2)
+        self.product_freights = np.round(np.exp(rng.normal(2.8, 0.5, n)), 2)
+
+        df = pd.DataFrame({
+            "product_id": hex_ids(np.arange(n), salt=3),
+            "product_category_name": categories,
+            "product_name_lenght": rng.integers(5, 77, n),
+            "product_description_lenght": rng.integers(4, 4000, n),
+            "product_photos_qty": rng.choice(np.arange(1, 11), n, p=zipf_weights(10, 1.5)),
+            "product_weight_g": np.round(np.exp(rng.normal(6.6, 1.2, n))).astype(int),
+            "product_length_cm": rng.integers(7, 106, n),
+            "product_height_cm": rng.integers(2, 106, n),
+            "product_width_cm": rng.integers(6, 119, n),
+        })
+        _write(df, self.path(PRODUCTS_FILE), first_chunk=True)
+        return n
+
+    def _write_chunk(self, start: int, size: int, first_chunk: bool) -> dict[str, int]:
+        rng = self.rng
+        order_index = np.arange(start, start + size)
+        order_ids = hex_ids(order_index, salt=1)
+        customer_ids = hex_ids(order_index, salt=2)
+
+        # --- Clientes: um customer_id por pedido, como no dataset original ---
+        unique_index = np.where(
+            rng.random(size) < REPEAT_CUSTOMER_SHARE,
+            rng.integers(0, start + size, size),
+            order_index,
+        )
+        states = rng.choice(len(self.state_codes), size, p=self.state_probabilities)
+        city_rank = rng.choice(CITIES_PER_STATE, size, p=self.city_weights)
+        cities = np.where(
+            rng.random(size) < CAPITAL_SHARE,
+            self.capitals[states],
+            np.char.add(np.char.add("municipio ", np.char.lower(self.state_codes[states])),
+                        np.char.add(" ", (city_rank + 1).astype(str))).astype(object),
+        )
+        customers = pd.DataFrame({
+            "customer_id": customer_ids,
+            "customer_unique_id": hex_ids(unique_index, salt=4),
+            "customer_zip_code_prefix": np.char.zfill((states * 3000 + city_rank * 13 + 1000).astype(str), 5),
+            "customer_city": cities,
+            "customer_state": self.state_codes[states],
+        })
+
+        # --- Pedidos: data de compra e as etapas da entrega ---
+        statuses = rng.choice(list(ORDER_STATUSES), size, p=np.array(list(ORDER_STATUSES.values())) / sum(ORDER_STATUSES.values()))
+        day = self.days[rng.choice(len(self.days), size, p=self.day_probabilities)]
+        purchase = day + pd.to_timedelta(rng.integers(0, 86400, size), unit="s")
+        approved = purchase + pd.to_timedelta(rng.exponential(10 * 3600, size).astype(int), unit="s")
+        carrier = approved + pd.to_timedelta((rng.gamma(2.0, 0.8, size) * 86400).astype(int), unit="s")
+        transit_days = np.exp(rng.normal(np.log(self.delivery_days[states]), 0.5))
+        delivered = carrier + pd.to_timedelta((transit_days * 86400).astype(int), unit="s")
+        estimated = (purchase + pd.to_timedelta(rng.normal(24, 6, size).clip(7, 60).astype(int), unit="D")).normalize()
+
+        is_delivered = statuses == "delivered"
+        has_carrier = is_delivered | (statuses == "shipped")
+        has_approval = statuses != "created"
+        orders = pd.DataFrame({
+            "order_id": order_ids,
+            "customer_id": customer_ids,
+            "order_status": statuses,
+            "order_purchase_timestamp": _timestamps(purchase),
+            "order_approved_at": _timestamps(approved, has_approval),
+            "order_delivered_carrier_date": _timestamps(carrier, has_carrier),
+            "order_delivered_customer_date": _timestamps(delivered, is_delivered),
+            "order_estimated_delivery_date": _timestamps(estimated),
+        })
+
+        # --- Itens: produtos e vendedores concentrados (Zipf) ---
+        items_per_order = rng.choice(np.arange(1, len(ITEMS_PER_ORDER) + 1), size, p=ITEMS_PER_ORDER)
+        item_order = np.repeat(np.arange(size), items_per_order)
+        item_number = np.arange(len(item_order)) - np.repeat(np.cumsum(items_per_order) - items_per_order, items_per_order) + 1
+        products = rng.choice(self.products, len(item_order), p=self.product_weights)
+        prices = np.round(self.product_prices[products] * rng.normal(1.0, 0.03, len(item_order)).clip(0.9, 1.1), 2)
+        freights = np.round(self.product_freights[products] * rng.normal(1.0, 0.2, len(item_order)).clip(0.3, 2.0), 2)
+        items = pd.DataFrame({
+            "order_id": order_ids[item_order],
+            "order_item_id": item_number,
+            "product_id": hex_ids(products, salt=3),
+            "seller_id": hex_ids(rng.choice(self.sellers, len(item_order), p=self.seller_weights), salt=5),
+            "shipping_limit_date": _timestamps(approved[item_order] + pd.Timedelta(days=6)),
+            "price": prices,
+            "freight_value": freights,
+        })
+
+        # --- Pagamentos: o valor do pedido, dividido entre os vouchers ---
+        order_totals = np.bincount(item_order, weights=prices + freights, minlength=size)
+        payment_types = rng.choice(list(PAYMENT_TYPES), size, p=list(PAYMENT_TYPES.values()))
+        payments_per_order = np.where(payment_types == "voucher", rng.integers(1, 4, size), 1)
+        payment_order = np.repeat(np.arange(size), payments_per_order)
+        payment_sequential = np.arange(len(payment_order)) - np.repeat(np.cumsum(payments_per_order) - payments_per_order, payments_per_order) + 1
+        installments = np.where(
+            payment_types[payment_order] == "credit_card",
+            rng.choice(np.arange(1, 11), len(payment_order), p=zipf_weights(10, 1.2)),
+            1,
+        )
+        payments = pd.DataFrame({
+            "order_id": order_ids[payment_order],
+            "payment_sequential": payment_sequential,
+            "payment_type": payment_types[payment_order],
+            "payment_installments": installments,
+            "payment_value": np.round(order_totals[payment_order] / payments_per_order[payment_order], 2),
+        })
+
+        # --- Avaliações: atrasos derrubam a nota ---
+        late = is_delivered & (delivered > estimated + pd.Timedelta(days=1))
+        not_delivered = ~is_delivered
+        scores = np.where(
+            late | not_delivered,
+            rng.choice(np.arange(1, 6), size, p=REVIEW_SCORES_LATE),
+            rng.choice(np.arange(1, 6), size, p=REVIEW_SCORES_ON_TIME),
+        )
+        reviewed = np.flatnonzero(rng.random(size) < REVIEW_SHARE)
+        duplicated = reviewed[rng.random(len(reviewed)) < DUPLICATE_REVIEW_SHARE]
+        review_order = np.concatenate([reviewed, duplicated])
+        created = pd.DatetimeIndex(np.where(is_delivered, delivered, estimated)[review_order]).normalize() + pd.Timedelta(days=1)
+        answered = created + pd.to_timedelta(rng.exponential(2 * 86400, len(review_order)).astype(int), unit="s")
+        messages = np.array(REVIEW_MESSAGES, dtype=object)
+        reviews = pd.DataFrame({
+            "review_id": hex_ids(start * 2 + np.arange(len(review_order)), salt=6),
+            "order_id": order_ids[review_order],
+            "review_score": scores[review_order],
+            "review_comment_title": np.where(rng.random(len(review_order)) < 0.12, "Recomendo", ""),
+            "review_comment_message": np.where(rng.random(len(review_order)) < 0.41,
+                                               messages[rng.integers(0, len(messages), len(review_order))], ""),
+            "review_creation_date": _timestamps(created),
+            "review_answer_timestamp": _timestamps(answered),
+        })
+
+        chunks = {
+            ORDERS_FILE: orders,
+            ITEMS_FILE: items,
+            CUSTOMERS_FILE: customers,
+            PAYMENTS_FILE: payments,
+            REVIEWS_FILE: reviews,
+        }
+        for filename, df in chunks.items():
+            _write(df, self.path(filename), first_chunk)
+        return {filename: len(df) for filename, df in chunks.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera CSVs sintéticos no formato da Olist.")
+    parser.add_argument("--items", type=int, default=100_000,
+                        help="Número aproximado de itens de pedido (ex.: 100000 a 100000000)")
+    parser.add_argument("--output", default="data/synthetic/", help="Diretório de saída dos CSVs")
+    parser.add_argument("--seed", type=int, default=42, help="Semente do gerador aleatório")
+    parser.add_argument("--chunk-orders", type=int, default=500_000,
+                        help="Pedidos gerados e gravados por bloco (limita a memória usada)")
+    args = parser.parse_args()
+
+    generator = OlistGenerator(args.items, args.output, seed=args.seed, chunk_orders=args.chunk_orders)
+    print(f"Gerando ~{args.items:,} itens ({generator.orders:,} pedidos, {generator.products:,} produtos) em '{args.output}'...")
+
+    started_at = time.perf_counter()
+    rows = generator.generate()
+    for filename, count in rows.items():
+        print(f"  - {filename}: {count:,} linhas")
+    print(f"Concluído em {time.perf_counter() - started_at:.1f}s.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,395 @@
+"""
+Benchmark de ponta a ponta do dashboard: pipeline, queries, previsão e
+componentes, com um relatório JSON comparável entre execuções.
+
+Suítes:
+  - pipeline: cada etapa de pipeline.main (carga completa) sobre os CSVs de
+    --data, como os gerados por generate_olist_data.py;
+  - queries: cada função de queries.py em cada backend (PostgreSQL do
+    pipeline e DuckDB sobre a exportação colunar), lendo os rollups e as
+    tabelas de fatos, com o cache vazio (frio) e com o cache cheio (quente);
+  - forecast: train_and_forecast_model com o registro vazio, com o modelo
+    registrado e com outro horizonte, e os modelos de referência;
+  - components: cada aba da página no AppTest do Streamlit, com o tempo de
+    desenho de cada componente medido pelo módulo instrumentation.
+
+O PostgreSQL é o das variáveis DB_* do .env (o mesmo do pipeline). Cada
+medição guarda todas as execuções, o mínimo e a mediana; com --compare, as
+medianas são comparadas às de um relatório anterior e o script falha
+(código de saída 1) se alguma piorar mais que --max-regression.
+
+Uso (a partir da raiz do repositório):
+    python benchmarks/generate_olist_data.py --items 1000000 --output data/synthetic/
+    python benchmarks/run_benchmarks.py --data data/synthetic/ --json baseline.json
+    python benchmarks/run_benchmarks.py --skip pipeline --json atual.json --compare baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC_DIR)
+
+SUITES = ("pipeline", "queries", "forecast", "components")
+BACKENDS = ("postgres", "duckdb")
+
+# Horizonte usado nas medições de previsão (dias)
+FORECAST_PERIODS = 60
+
+
+def _timed(fn, *args, **kwargs) -> tuple[float, object]:
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def _result(suite: str, name: str, variant: str, runs: list[float], **extra) -> dict:
+    return {
+        "suite": suite,
+        "name": name,
+        "variant": variant,
+        "seconds": statistics.median(runs),
+        "min": min(runs),
+        "runs": runs,
+        **extra,
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              cwd=SRC_DIR, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def bench_pipeline(engine, data_path: str, export_path: str) -> list[dict]:
+    """
+    Executa as etapas da carga completa na ordem de pipeline.main.
+    """
+    import pipeline
+
+    stages = [
+        ("load_raw_data", lambda: pipeline.load_raw_data(engine, data_path)),
+        ("transform_data", lambda: pipeline.transform_data(engine)),
+        ("build_rollups", lambda: pipeline.build_rollups(engine)),
+        ("tune_database", lambda: pipeline.tune_database(engine)),
+        ("bump_data_version", lambda: pipeline.bump_data_version(engine)),
+        ("export_columnar", lambda: pipeline.export_columnar(engine, export_path)),
+    ]
+    results = []
+    for name, stage in stages:
+        seconds, _ = _timed(stage)
+        results.append(_result("pipeline", name, "full", [seconds]))
+    return results
+
+
+def _use_backend(backend: str, export_path: str) -> None:
+    import queries
+
+    queries.QUERY_BACKEND = backend
+    queries.PARQUET_PATH = export_path
+    queries.get_backend.clear()
+    queries.get_query_cache().clear()
+    queries._build_revenue_index.clear()
+    queries._build_sketch_index.clear()
+
+
+def _estimate_customers(index) -> int | None:
+    # Clientes únicos do histórico completo, pelo índice de sketches em memória
+    if index is None:
+        return None
+    import queries
+
+    return index.estimate('customer_unique_id', queries.DATA_START_DATE, queries.DATA_END_DATE)
+
+
+def _query_calls() -> dict:
+    import queries
+
+    dimensions = list(queries.SALES_DIMENSION_COLUMNS)
+    calls = {
+        "get_available_rollups": lambda: queries.get_available_rollups(),
+        "get_kpi_snapshot": lambda: queries.get_kpi_snapshot(),
+        "get_delivery_time_distribution": lambda: queries.get_delivery_time_distribution(),
+        "get_raw_delivery_times": lambda: queries.get_raw_delivery_times(),
+        "get_delivery_time_histogram": lambda: queries.get_delivery_time_histogram(),
+        "get_delivery_box_stats": lambda: queries.get_delivery_box_stats(),
+        "get_delivery_times_and_reviews": lambda: queries.get_delivery_times_and_reviews(),
+        "get_orders_by_time_period": lambda: queries.get_orders_by_time_period(queries.DATA_START_DATE, queries.DATA_END_DATE),
+        "get_distinct_counts": lambda: queries.get_distinct_counts(),
+        "get_distinct_counts[periodo]": lambda: queries.get_distinct_counts(queries.DATA_START_DATE, queries.DATA_END_DATE),
+        "get_distinct_counts[customer_state]": lambda: queries.get_distinct_counts(customer_state='SP'),
+        "get_sketch_index": lambda: queries.get_sketch_index(),
+        "DailySketchIndex.estimate[periodo]": lambda: _estimate_customers(queries.get_sketch_index()),
+    }
+    calls["get_sales_by_all_dimensions"] = lambda: queries.get_sales_by_all_dimensions()
+    for dimension in dimensions:
+        calls[f"get_sales_by_dimension[{dimension}]"] = lambda d=dimension: queries.get_sales_by_dimension(d, dimensions)
+    return calls
+
+
+def bench_queries(backends: list[str], export_path: str, repeat: int) -> list[dict]:
+    """
+    Mede cada função de queries.py com o cache vazio e com o cache cheio,
+    lendo os rollups e, com get_available_rollups vazio, as tabelas de fatos.
+    """
+    import queries
+
+    original_rollups = queries.get_available_rollups
+    sources = {"rollups": original_rollups, "fatos": lambda: set()}
+    results = []
+    try:
+        for backend in backends:
+            _use_backend(backend, export_path)
+            for source, available_rollups in sources.items():
+                queries.get_available_rollups = available_rollups
+                for name, call in _query_calls().items():
+                    if source == "fatos" and name == "get_available_rollups":
+                        continue
+                    cold, warm, error = [], [], None
+                    for _ in range(repeat):
+                        queries.get_query_cache().clear()
+                        queries._build_revenue_index.clear()
+                        queries._build_sketch_index.clear()
+                        try:
+                            # Erros viram exceção em vez de st.error
+                            with queries.deferred_errors():
+                                cold.append(_timed(call)[0])
+                                warm.append(_timed(call)[0])
+                        except Exception as e:
+                            error = f"{type(e).__name__}: {e}"
+                            break
+                    if error:
+                        results.append({"suite": "queries", "name": name, "variant": f"{backend}/{source}", "error": error})
+                        continue
+                    results.append(_result("queries", name, f"{backend}/{source}/frio", cold))
+                    results.append(_result("queries", name, f"{backend}/{source}/quente", warm))
+    finally:
+        queries.get_available_rollups = original_rollups
+    return results
+
+
+def bench_forecast(repeat: int) -> list[dict]:
+    """
+    Mede o Prophet com o registro de modelos vazio (treino), com o modelo já
+    registrado e com um novo horizonte (só a previsão), e os modelos de referência.
+    """
+    import forecasting
+    import queries
+
+    df_revenue = queries.get_orders_by_time_period(queries.DATA_START_DATE, queries.DATA_END_DATE)
+    if df_revenue is None:
+        return [{"suite": "forecast", "name": "train_and_forecast_model", "variant": "", "error": "sem dados de faturamento"}]
+    df_prophet = df_revenue.rename(columns={'date': 'ds', 'total_price': 'y'})
+
+    results = []
+    for model_name in ("seasonal_naive", "holt_winters"):
+        runs = [_timed(forecasting.forecast_baseline, df_prophet, FORECAST_PERIODS, model_name)[0] for _ in range(repeat)]
+        results.append(_result("forecast", "forecast_baseline", model_name, runs))
+
+    cold, warm, horizon = [], [], []
+    try:
+        for _ in range(repeat):
+            with tempfile.TemporaryDirectory() as registry_path:
+                forecasting.MODEL_REGISTRY_PATH = registry_path
+                forecasting.get_model_registry.clear()
+                cold.append(_timed(forecasting.train_and_forecast_model, df_prophet, FORECAST_PERIODS)[0])
+                warm.append(_timed(forecasting.train_and_forecast_model, df_prophet, FORECAST_PERIODS)[0])
+                horizon.append(_timed(forecasting.train_and_forecast_model, df_prophet, FORECAST_PERIODS * 2)[0])
+    except ImportError as e:
+        # Ambientes sem o Prophet medem só os modelos de referência
+        return results + [{"suite": "forecast", "name": "train_and_forecast_model", "variant": "", "error": str(e)}]
+    finally:
+        forecasting.get_model_registry.clear()
+
+    results.append(_result("forecast", "train_and_forecast_model", "registro vazio", cold, rows=len(df_prophet)))
+    results.append(_result("forecast", "train_and_forecast_model", "modelo registrado", warm, rows=len(df_prophet)))
+    results.append(_result("forecast", "train_and_forecast_model", "novo horizonte", horizon, rows=len(df_prophet)))
+    return results
+
+
+def bench_components(backends: list[str], export_path: str, repeat: int, timeout: float) -> list[dict]:
+    """
+    Abre cada aba da página no AppTest, com o cache de queries vazio e cheio.
+    O tempo de cada componente vem dos eventos do módulo instrumentation.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    import instrumentation
+    import queries
+    from app import TABS
+
+    results = []
+    for backend in backends:
+        for state in ("frio", "quente"):
+            page_runs, component_runs, failed = {}, {}, False
+            for _ in range(repeat):
+                if state == "frio":
+                    _use_backend(backend, export_path)
+                instrumentation.clear()
+                app = AppTest.from_file(os.path.join(SRC_DIR, "app.py"), default_timeout=timeout)
+                for tab in TABS:
+                    # Só a aba selecionada é desenhada (ver app.main)
+                    run = app.run if tab == TABS[0] else app.radio(key="aba").set_value(tab).run
+                    seconds, _ = _timed(run)
+                    if app.exception:
+                        results.append({"suite": "components", "name": f"app[{tab}]", "variant": f"{backend}/{state}",
+                                        "error": str(app.exception[0].value)})
+                        failed = True
+                        break
+                    page_runs.setdefault(f"app[{tab}]", []).append(seconds)
+                if failed:
+                    break
+                for event in instrumentation.get_events("component"):
+                    component_runs.setdefault(event["name"], []).append(event["ms"] / 1000)
+            if failed:
+                continue
+            for name, runs in {**page_runs, **component_runs}.items():
+                results.append(_result("components", name, f"{backend}/{state}", runs))
+    # A próxima suíte (ou execução) começa com o cache vazio
+    queries.get_query_cache().clear()
+    return results
+
+
+def table_sizes(engine) -> dict[str, int]:
+    from sqlalchemy import text
+
+    import pipeline
+
+    sizes = {}
+    with engine.connect() as connection:
+        for tablename in (*pipeline.FACT_TABLES, *pipeline.DIMENSION_TABLES):
+            try:
+                sizes[tablename] = connection.execute(text(f"SELECT COUNT(*) FROM {tablename}")).scalar()
+            except Exception:
+                connection.rollback()
+    return sizes
+
+
+def compare_reports(current: dict, baseline: dict, max_regression: float, min_seconds: float) -> list[dict]:
+    """
+    Compara as medianas com as do relatório `baseline`. Medições abaixo de
+    `min_seconds` nos dois relatórios são ruído e não contam como regressão.
+    """
+    def key(result):
+        return result["suite"], result["name"], result["variant"]
+
+    previous = {key(r): r for r in baseline["results"] if "seconds" in r}
+    comparison = []
+    for result in current["results"]:
+        before = previous.get(key(result))
+        if before is None or "seconds" not in result:
+            continue
+        change = (result["seconds"] - before["seconds"]) / before["seconds"] if before["seconds"] else 0.0
+        noisy = max(result["seconds"], before["seconds"]) < min_seconds
+        comparison.append({
+            "suite": result["suite"], "name": result["name"], "variant": result["variant"],
+            "baseline": before["seconds"], "current": result["seconds"], "change": change,
+            "regression": change > max_regression and not noisy,
+        })
+    return comparison
+
+
+def print_report(report: dict, comparison: list[dict] | None) -> None:
+    print(f"\n=== Benchmark ({report['meta']['created']}, commit {report['meta']['git_commit'] or '?'}) ===")
+    if report["meta"]["tables"]:
+        print("Tabelas: " + ", ".join(f"{t}={n:,}" for t, n in report["meta"]["tables"].items()))
+
+    suite = None
+    for result in report["results"]:
+        if result["suite"] != suite:
+            suite = result["suite"]
+            print(f"\n[{suite}]")
+        label = f"{result['name']} ({result['variant']})" if result["variant"] else result["name"]
+        if "error" in result:
+            print(f"  {label:<70} ERRO: {result['error'][:80]}")
+        else:
+            print(f"  {label:<70} {result['seconds'] * 1000:10.1f} ms  (mín. {result['min'] * 1000:.1f} ms)")
+
+    if comparison:
+        print("\nComparação com o relatório anterior (medianas):")
+        for row in comparison:
+            marker = "❌" if row["regression"] else "  "
+            print(f"{marker} {row['suite']:<11} {row['name'] + ' (' + row['variant'] + ')':<70} "
+                  f"{row['baseline'] * 1000:10.1f} -> {row['current'] * 1000:10.1f} ms ({row['change']:+.0%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de ponta a ponta do dashboard.")
+    parser.add_argument("--data", default="data/", help="Diretório com os CSVs da Olist (suíte pipeline)")
+    parser.add_argument("--export-path", default=None,
+                        help="Diretório da exportação colunar lida pelo DuckDB (padrão: um diretório temporário)")
+    parser.add_argument("--skip", action="append", choices=SUITES, default=[], help="Suíte a pular (pode repetir)")
+    parser.add_argument("--backend", action="append", choices=BACKENDS,
+                        help="Backend das suítes queries e components (pode repetir). Padrão: todos")
+    parser.add_argument("--repeat", type=int, default=3, help="Execuções de cada medição")
+    parser.add_argument("--timeout", type=float, default=600, help="Tempo máximo de cada execução do AppTest (s)")
+    parser.add_argument("--json", help="Grava o relatório neste arquivo JSON")
+    parser.add_argument("--compare", help="Relatório JSON anterior para comparar")
+    parser.add_argument("--max-regression", type=float, default=0.25,
+                        help="Piora relativa máxima da mediana antes de falhar (0.25 = 25%%)")
+    parser.add_argument("--min-seconds", type=float, default=0.005,
+                        help="Medições mais rápidas que isso não contam como regressão")
+    args = parser.parse_args()
+
+    # O pipeline lê as credenciais do .env, como em produção
+    import pipeline
+
+    engine = pipeline.create_db_engine(pipeline.DB_USER, pipeline.DB_PASSWORD, pipeline.DB_HOST,
+                                       pipeline.DB_PORT, pipeline.DB_NAME)
+    if engine is None:
+        sys.exit(1)
+
+    backends = args.backend or list(BACKENDS)
+    with tempfile.TemporaryDirectory() as tmp_export:
+        export_path = args.export_path or tmp_export
+        results = []
+        if "pipeline" not in args.skip:
+            results += bench_pipeline(engine, args.data, export_path)
+        elif "duckdb" in backends and not args.export_path:
+            # Sem a etapa do pipeline, o DuckDB lê uma exportação do banco atual
+            pipeline.export_columnar(engine, export_path)
+        if "queries" not in args.skip:
+            results += bench_queries(backends, export_path, args.repeat)
+        if "forecast" not in args.skip:
+            results += bench_forecast(args.repeat)
+        if "components" not in args.skip:
+            results += bench_components(backends, export_path, args.repeat, args.timeout)
+
+    report = {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backends": backends,
+            "repeat": args.repeat,
+            "tables": table_sizes(engine),
+        },
+        "results": results,
+    }
+
+    comparison = None
+    if args.compare:
+        with open(args.compare) as f:
+            comparison = compare_reports(report, json.load(f), args.max_regression, args.min_seconds)
+    print_report(report, comparison)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({**report, "comparison": comparison}, f, indent=2, default=str)
+
+    failed = any("error" in r for r in results) or any(row["regression"] for row in comparison or [])
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
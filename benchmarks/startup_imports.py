@@ -0,0 +1,144 @@
+"""
+Mede o tempo de importação dos módulos do dashboard na inicialização.
+
+Cada medição roda num interpretador novo com `python -X importtime`, para
+reproduzir o cold start de uma réplica, e o melhor tempo de algumas execuções
+é usado para reduzir o ruído. O relatório mostra o tempo total, o tempo por
+pacote e os módulos mais lentos, e falha (código de saída 1) se a
+inicialização importar uma dependência pesada que deveria ser carregada sob
+demanda ou passar do tempo máximo informado.
+
+Uso (a partir da raiz do repositório):
+    python benchmarks/startup_imports.py
+    python benchmarks/startup_imports.py --module components.revenue_forecast
+    python benchmarks/startup_imports.py --max-seconds 2 --json startup.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+# Dependências que só devem ser importadas quando o componente que as usa é
+# desenhado. O próprio Streamlit importa plotly.graph_objects (que carrega os
+# tipos de gráfico sob demanda), então a verificação olha para o plotly.express.
+LAZY_MODULES = ("prophet", "cmdstanpy", "plotly.express", "snowflake.snowpark")
+
+
+def measure_imports(module: str, runs: int = 3) -> dict[str, dict]:
+    """
+    Importa `module` em `runs` interpretadores novos e retorna, para cada
+    módulo importado, o menor tempo próprio e acumulado (em segundos).
+    """
+    env = dict(os.environ, PYTHONPATH=SRC_DIR)
+    timings: dict[str, dict] = {}
+
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=SRC_DIR, env=env, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"Falha ao importar {module}:\n{result.stderr[-2000:]}")
+
+        for line in result.stderr.splitlines():
+            # Formato: "import time: <self us> | <cumulative us> | <indentação><módulo>"
+            if not line.startswith("import time:") or "self [us]" in line:
+                continue
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            name = name.strip()
+            current = timings.get(name)
+            self_s, cumulative_s = int(self_us) / 1e6, int(cumulative_us) / 1e6
+            if current is None or cumulative_s < current["cumulative"]:
+                timings[name] = {"self": self_s, "cumulative": cumulative_s}
+
+    return timings
+
+
+def by_package(timings: dict[str, dict]) -> dict[str, float]:
+    """
+    Soma o tempo próprio dos módulos de cada pacote de primeiro nível.
+    """
+    totals = defaultdict(float)
+    for name, timing in timings.items():
+        totals[name.split(".")[0]] += timing["self"]
+    return dict(sorted(totals.items(), key=lambda item: item[1], reverse=True))
+
+
+def lazy_violations(timings: dict[str, dict]) -> list[str]:
+    return [
+        lazy for lazy in LAZY_MODULES
+        if any(name == lazy or name.startswith(f"{lazy}.") for name in timings)
+    ]
+
+
+def build_report(module: str, runs: int, top: int) -> dict:
+    timings = measure_imports(module, runs)
+    slowest = sorted(timings.items(), key=lambda item: item[1]["cumulative"], reverse=True)
+    return {
+        "module": module,
+        "runs": runs,
+        "total_seconds": timings.get(module, {}).get("cumulative", 0.0),
+        "modules_imported": len(timings),
+        "packages": by_package(timings),
+        "slowest_modules": [{"module": name, **timing} for name, timing in slowest[:top]],
+        "lazy_violations": lazy_violations(timings),
+    }
+
+
+def print_report(report: dict, top: int) -> None:
+    print(f"\n=== import {report['module']} ===")
+    print(f"Tempo total: {report['total_seconds']:.3f}s "
+          f"({report['modules_imported']} módulos, melhor de {report['runs']} execuções)")
+
+    print("\nTempo por pacote:")
+    for package, seconds in list(report["packages"].items())[:top]:
+        print(f"  {package:<30} {seconds:8.3f}s")
+
+    print("\nMódulos mais lentos (tempo acumulado):")
+    for timing in report["slowest_modules"]:
+        print(f"  {timing['module']:<50} {timing['cumulative']:8.3f}s  (próprio {timing['self']:.3f}s)")
+
+    if report["lazy_violations"]:
+        print(f"\n⚠️  Importados na inicialização, mas deveriam ser sob demanda: {', '.join(report['lazy_violations'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede o tempo de importação do dashboard.")
+    parser.add_argument("--module", action="append",
+                        help="Módulo a importar (pode repetir). Padrão: app")
+    parser.add_argument("--runs", type=int, default=3, help="Execuções por módulo (usa a melhor)")
+    parser.add_argument("--top", type=int, default=15, help="Quantos pacotes/módulos listar")
+    parser.add_argument("--max-seconds", type=float,
+                        help="Falha se a importação de 'app' levar mais que isso")
+    parser.add_argument("--json", help="Grava o relatório neste arquivo JSON")
+    args = parser.parse_args()
+
+    modules = args.module or ["app"]
+    reports = [build_report(module, args.runs, args.top) for module in modules]
+    for report in reports:
+        print_report(report, args.top)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2)
+
+    # Só a inicialização ('app') precisa estar livre das dependências pesadas
+    failed = False
+    for report in reports:
+        if report["module"] != "app":
+            continue
+        if report["lazy_violations"]:
+            failed = True
+        if args.max_seconds is not None and report["total_seconds"] > args.max_seconds:
+            print(f"\n❌ A importação de 'app' levou {report['total_seconds']:.3f}s "
+                  f"(limite: {args.max_seconds:.3f}s)")
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,18 @@
 import streamlit as st
+import instrumentation
+import prefetch
 import queries
 
-from components import (
-    display_correlation_boxplot,
-    display_delivery_time_histogram,
-    kpi_card,
-    display_orders_data,
-    display_revenue_forecast,
-    display_sales_by_category_pie_chart,
-)
+# Os componentes são carregados sob demanda (ver components/__init__.py):
+# cada um importa o Plotly/Prophet apenas quando é desenhado
+import components
+from components.sales_by_category import SALES_DIMENSIONS
+
+# Abas da página
+TAB_SALES = "📊 Análise de Vendas"
+TAB_DELIVERY = "🚚 Análise de Entregas"
+TAB_FORECAST = "🔮 Previsão do Faturamento"
+TABS = [TAB_SALES, TAB_DELIVERY, TAB_FORECAST]
 
 
 def main():
@@ -21,36 +25,56 @@ def main():
 
     st.title("📈 Dashboard - Análise de Vendas")
 
-    # --- Exibe os KPIs principais ---
-    kpi_card(
-        faturamento_total=queries.get_faturamento_total(),
-        total_pedidos=queries.get_total_orders(), 
-        ticket_medio=queries.get_ticket_medio(),
-        avaliacao_media=queries.get_average_rating(),
-        tempo_medio_entrega=queries.get_average_delivery_time(),
-        total_clientes=queries.get_total_customers(),
-    )
+    # --- Seleção da aba ---
+    # Diferente de st.tabs, que executa o conteúdo de todas as abas a cada
+    # execução, só a aba selecionada é desenhada: a previsão (histórico
+    # completo e Prophet) só roda para quem abre a aba
+    selected_tab = st.radio("Aba", TABS, horizontal=True, label_visibility="collapsed", key="aba")
+
+    # --- Dispara em paralelo todas as queries independentes da página ---
+    # Os componentes aguardam os resultados apenas quando são desenhados,
+    # então a latência da página passa a ser a da query mais lenta.
+    # Só são antecipadas as queries da aba selecionada.
+    sales_dimensions = list(SALES_DIMENSIONS.values())
+    tab_prefetch = {
+        TAB_SALES: [
+            (queries.get_revenue_index,),
+            (queries.get_sketch_index,),
+            (queries.get_sales_by_dimension, sales_dimensions[0], sales_dimensions),
+        ],
+        TAB_DELIVERY: [
+            (queries.get_delivery_time_histogram,),
+            (queries.get_delivery_box_stats,),
+        ],
+        TAB_FORECAST: [
+            (queries.get_revenue_index,),
+        ],
+    }
+    prefetch.start_prefetch([(queries.get_kpi_snapshot,), *tab_prefetch[selected_tab]])
 
-    # --- Criação das Abas ---
-    tab1, tab2, tab3 = st.tabs(["📊 Análise de Vendas", 
-                                "🚚 Análise de Entregas", 
-                                "🔮 Previsão do Faturamento"])
+    # --- Exibe os KPIs principais ---
+    components.kpi_card(prefetch.resolve(queries.get_kpi_snapshot))
 
     # --- Conteúdo da Aba 1: Análise de Vendas ---
-    with tab1:
+    if selected_tab == TAB_SALES:
         st.header("Visão Geral das Vendas")
-        display_orders_data()
-        display_sales_by_category_pie_chart()
-        
+        components.display_orders_data()
+        components.display_sales_by_category_pie_chart()
+
     # --- Conteúdo da Aba 2: Análise de Entregas ---
-    with tab2:
+    elif selected_tab == TAB_DELIVERY:
         st.header("Performance da Logística e Satisfação do Cliente")
-        display_delivery_time_histogram()
-        display_correlation_boxplot()
-    
+        components.display_delivery_time_histogram()
+        components.display_correlation_boxplot()
+
     # --- Conteúdo da Aba 3: Previsão ---
-    with tab3:
-        display_revenue_forecast()
+    elif selected_tab == TAB_FORECAST:
+        components.display_revenue_forecast()
+
+    # --- Diagnóstico (DASHBOARD_DEBUG=1 ou ?debug=1 na URL) ---
+    # Desenhado por último para incluir as medições desta execução
+    if instrumentation.DEBUG_SIDEBAR or st.query_params.get("debug") == "1":
+        components.display_debug_sidebar()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,214 @@
+import glob
+import os
+import threading
+from typing import Iterator
+
+import pandas as pd
+import pyarrow as pa
+
+from result_schema import ResultMemory, ResultSchema
+
+
+# Linhas por lote na leitura dos resultados
+FETCH_BATCH_ROWS = 100_000
+
+
+class QueryBackend:
+    """
+    Interface comum dos bancos consultados pelo dashboard.
+
+    Cada backend entrega o resultado em lotes Arrow (`fetch_batches`), que
+    são compactados um a um segundo o ResultSchema da query e montados num
+    DataFrame com os nomes de colunas em minúsculas. As diferenças de dialeto
+    usadas pelas queries (aritmética de datas) ficam em métodos estáticos,
+    que podem ser chamados sem conexão. Parâmetros são posicionais, com `?`
+    como marcador.
+    """
+
+    name = ""
+
+    def fetch_batches(self, query: str, params=None) -> Iterator[pa.RecordBatch]:
+        raise NotImplementedError
+
+    def fetch(self, query: str, params=None, schema: ResultSchema | None = None) -> tuple[pd.DataFrame, ResultMemory]:
+        """
+        Executa a query e retorna o DataFrame compacto e a memória ocupada.
+        """
+        return (schema or ResultSchema()).to_frame(self.fetch_batches(query, params))
+
+    def execute(self, query: str, params=None, schema: ResultSchema | None = None) -> pd.DataFrame:
+        return self.fetch(query, params, schema)[0]
+
+    def refresh(self) -> None:
+        """
+        Chamado quando o pipeline publica uma nova versão dos dados.
+        """
+
+    @staticmethod
+    def days_between(start: str, end: str) -> str:
+        """
+        Expressão SQL com o número de dias de calendário de `start` até `end`.
+        """
+        return f"({end}::DATE - {start}::DATE)"
+
+    @staticmethod
+    def to_date(expression: str) -> str:
+        return f"CAST({expression} AS DATE)"
+
+
+class SnowflakeBackend(QueryBackend):
+    """
+    Snowflake, através de uma Session do Snowpark.
+    """
+
+    name = "snowflake"
+
+    def __init__(self, session):
+        self.session = session
+
+    def fetch_batches(self, query: str, params=None) -> Iterator[pa.RecordBatch]:
+        if params:
+            # Parâmetros posicionais (?) são vinculados pelo Snowpark
+            for chunk in self.session.sql(query, params=params).to_pandas_batches():
+                yield pa.RecordBatch.from_pandas(chunk, preserve_index=False)
+            return
+
+        # Sem parâmetros, o cursor do conector entrega os lotes Arrow do
+        # resultado como vieram do Snowflake, sem DataFrames intermediários
+        cursor = self.session.connection.cursor()
+        try:
+            cursor.execute(query)
+            for table in cursor.fetch_arrow_batches():
+                yield from table.to_batches()
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def days_between(start: str, end: str) -> str:
+        return f"DATEDIFF('day', {start}, {end})"
+
+
+class PostgresBackend(QueryBackend):
+    """
+    PostgreSQL, através de uma engine do SQLAlchemy (o banco do pipeline).
+    """
+
+    name = "postgres"
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def fetch_batches(self, query: str, params=None) -> Iterator[pa.RecordBatch]:
+        with self.engine.connect() as connection:
+            # stream_results usa um cursor no servidor: as linhas chegam em lotes
+            connection = connection.execution_options(stream_results=True)
+            if params:
+                # O psycopg2 usa %s como marcador (e exige escapar os % literais)
+                query = query.replace("%", "%%").replace("?", "%s")
+                chunks = pd.read_sql_query(query, connection, params=tuple(params), chunksize=FETCH_BATCH_ROWS)
+            else:
+                chunks = pd.read_sql_query(query, connection, chunksize=FETCH_BATCH_ROWS)
+            for chunk in chunks:
+                yield pa.RecordBatch.from_pandas(chunk, preserve_index=False)
+
+
+class DuckDBBackend(QueryBackend):
+    """
+    DuckDB embarcado, lendo os arquivos exportados pelo pipeline
+    (ver pipeline.export_columnar).
+
+    Cada tabela vira uma view sobre `<parquet_path>/<tabela>.parquet` ou sobre
+    todos os arquivos de `<parquet_path>/<tabela>/` (partições no formato
+    Hive, como `purchase_month=2018-01/`). O DuckDB lê só as colunas usadas
+    pela query e pula as partições e os row groups que os filtros excluem.
+
+    Arquivos Arrow IPC (`.arrow`) são abertos por memory-map com o pyarrow e
+    entregues ao DuckDB sem cópia: uma leitura custa páginas do cache do
+    sistema operacional, não uma ida ao banco.
+    """
+
+    name = "duckdb"
+
+    def __init__(self, parquet_path: str):
+        # O DuckDB só é necessário (e importado) quando este backend é usado
+        import duckdb
+
+        self.parquet_path = parquet_path
+        self.connection = duckdb.connect(database=":memory:")
+        self._refresh_lock = threading.Lock()
+        # Datasets Arrow registrados; o registro vale só para a conexão que o
+        # fez, então cada cursor os registra de novo
+        self._arrow_datasets = {}
+        self.refresh()
+
+    def refresh(self) -> None:
+        with self._refresh_lock:
+            for entry in sorted(os.listdir(self.parquet_path)):
+                # Entradas ocultas são exportações em andamento ou já substituídas
+                if entry.startswith("."):
+                    continue
+                path = os.path.join(self.parquet_path, entry)
+                if os.path.isdir(path):
+                    table = entry
+                    files = glob.glob(os.path.join(path, "**", "*.*"), recursive=True)
+                else:
+                    table, files = os.path.splitext(entry)[0], [path]
+
+                extensions = {os.path.splitext(file)[1] for file in files}
+                if ".parquet" in extensions:
+                    pattern = f"{path}/**/*.parquet" if os.path.isdir(path) else path
+                    source = f"read_parquet('{pattern}', hive_partitioning = true)"
+                elif ".arrow" in extensions:
+                    source = self._register_arrow(table, path)
+                else:
+                    continue
+                self.connection.execute(f'CREATE OR REPLACE VIEW "{table}" AS SELECT * FROM {source}')
+
+    def _register_arrow(self, table: str, path: str) -> str:
+        # Dataset do pyarrow sobre arquivos mapeados em memória; o DuckDB
+        # repassa a ele a projeção e os filtros da query (inclusive os de partição)
+        import pyarrow.dataset as ds
+        from pyarrow import fs
+
+        dataset = ds.dataset(path, format="ipc", partitioning="hive",
+                             filesystem=fs.LocalFileSystem(use_mmap=True))
+        name = f"arrow_{table}"
+        self._arrow_datasets[name] = dataset
+        self.connection.register(name, dataset)
+        return f'"{name}"'
+
+    def fetch_batches(self, query: str, params=None) -> Iterator[pa.RecordBatch]:
+        # Cada thread usa o seu cursor; a conexão principal não é thread-safe
+        cursor = self.connection.cursor()
+        try:
+            for name, dataset in list(self._arrow_datasets.items()):
+                cursor.register(name, dataset)
+            reader = cursor.execute(query, params).fetch_record_batch(FETCH_BATCH_ROWS)
+            empty = True
+            for batch in reader:
+                empty = False
+                yield batch
+            if empty:
+                # Mantém as colunas de um resultado vazio
+                yield pa.RecordBatch.from_pylist([], schema=reader.schema)
+        finally:
+            cursor.close()
+
+    def fetch(self, query: str, params=None, schema: ResultSchema | None = None) -> tuple[pd.DataFrame, ResultMemory]:
+        try:
+            return super().fetch(query, params, schema)
+        except Exception:
+            # Uma nova exportação do pipeline pode ter trocado os arquivos
+            # desde o último refresh: relista o diretório e tenta de novo
+            self.refresh()
+            return super().fetch(query, params, schema)
+
+    @staticmethod
+    def days_between(start: str, end: str) -> str:
+        return f"DATE_DIFF('day', CAST({start} AS DATE), CAST({end} AS DATE))"
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (SnowflakeBackend, PostgresBackend, DuckDBBackend)
+}
@@ -1,13 +1,47 @@
-from components.correlation_boxplot import display_correlation_boxplot
-from components.delivery_time_histogram import display_delivery_time_histogram
-from components.kpi_card import kpi_card
-from components.orders_data import display_orders_data
-from components.revenue_forecast import display_revenue_forecast
-from components.sales_by_category import display_sales_by_category_pie_chart
+import importlib
+
+import streamlit as st
+
+import instrumentation
+
+
+# Módulo de cada componente. Os módulos só são importados quando o componente
+# é acessado pela primeira vez, para que dependências pesadas (Plotly, Prophet)
+# não atrasem a inicialização do app antes do primeiro elemento ser desenhado.
+_COMPONENT_MODULES = {
+    "display_correlation_boxplot": "components.correlation_boxplot",
+    "display_debug_sidebar": "components.debug_sidebar",
+    "display_delivery_time_histogram": "components.delivery_time_histogram",
+    "kpi_card": "components.kpi_card",
+    "display_orders_data": "components.orders_data",
+    "display_revenue_forecast": "components.revenue_forecast",
+    "display_sales_by_category_pie_chart": "components.sales_by_category",
+}
+
+# Componentes desenhados em toda execução da página, fora de um fragmento: a
+# barra lateral de diagnóstico escreve em st.sidebar (o que um fragmento não
+# pode fazer) e precisa incluir as medições da execução completa
+_FULL_RUN_COMPONENTS = {"display_debug_sidebar"}
+
+
+def __getattr__(name):
+    if name not in _COMPONENT_MODULES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    component = getattr(importlib.import_module(_COMPONENT_MODULES[name]), name)
+    # O tempo de desenho de cada componente é medido (ver instrumentation)
+    component = instrumentation.instrument("component", name)(component)
+    if name not in _FULL_RUN_COMPONENTS:
+        # Cada componente é um fragmento: mexer em um widget reexecuta só o
+        # componente dele, e não a página inteira com as queries dos demais.
+        # O fragmento envolve a medição, então as reexecuções também são medidas
+        component = st.fragment(component)
+    globals()[name] = component
+    return component
 
 
 __all__ = [
     "display_correlation_boxplot",
+    "display_debug_sidebar",
     "display_delivery_time_histogram",
     "kpi_card",
     "display_orders_data",
@@ -1,35 +1,52 @@
 import streamlit as st
-import plotly.express as px
 
+import prefetch
 import queries
 
 
 def display_correlation_boxplot():
+    import plotly.express as px
+    import plotly.graph_objects as go
+
     with st.container(border=True):
         st.markdown("#### Tempo de Entrega vs. Avaliação do Cliente", help="O gráfico abaixo mostra a distribuição do tempo de entrega para cada nota de avaliação. Se as caixas para notas baixas (1, 2) estiverem mais altas, significa que entregas mais longas recebem piores avaliações.")
         
-        df_corr = queries.get_delivery_times_and_reviews()
+        # Quartis, bigodes e outliers já vêm calculados do banco (uma linha por nota),
+        # então o gráfico não depende do volume de pedidos
+        df_stats = prefetch.resolve(queries.get_delivery_box_stats)
         
-        if not df_corr.empty:
+        if not df_stats.empty:
             # Para o Box Plot, é melhor tratar a nota como uma categoria
-            df_corr['review_score'] = df_corr['review_score'].astype(str)
+            df_stats['review_score'] = df_stats['review_score'].astype(int).astype(str)
+            colors = px.colors.sequential.Blues_r[1:]
 
-            # Remove outliers de entrega para uma melhor visualização do box plot
-            cutoff = df_corr['dias_para_entrega'].quantile(0.95) # Remove os 5% mais longos
-            df_filtered = df_corr[df_corr['dias_para_entrega'] <= cutoff]
+            fig = go.Figure()
+            for i, row in enumerate(df_stats.itertuples()):
+                fig.add_trace(go.Box(
+                    name=row.review_score,
+                    x=[row.review_score],
+                    q1=[row.q1],
+                    median=[row.mediana],
+                    q3=[row.q3],
+                    lowerfence=[row.limite_inferior],
+                    upperfence=[row.limite_superior],
+                    marker_color=colors[i % len(colors)],
+                ))
+                # Os pontos fora dos bigodes não são enviados; mostramos apenas quantos são
+                fig.add_annotation(
+                    x=row.review_score,
+                    y=row.limite_superior,
+                    text=f"{int(row.outliers):,} outliers",
+                    showarrow=False,
+                    yshift=12,
+                    font=dict(size=10),
+                )
 
-            fig = px.box(
-                df_filtered,
-                x='review_score',
-                y='dias_para_entrega',
-                color='review_score',
-                labels={
-                    "review_score": "Avaliação do Cliente ⭐",
-                    "dias_para_entrega": "Tempo de Entrega (dias)"
-                },
+            fig.update_layout(
+                xaxis_title="Avaliação do Cliente ⭐",
+                yaxis_title="Tempo de Entrega (dias)",
                 # Ordena o eixo X de 1 a 5
-                category_orders={"review_score": ["1", "2", "3", "4", "5"]},
-                color_discrete_sequence=px.colors.sequential.Blues_r[1:]
+                xaxis=dict(categoryorder="array", categoryarray=["1", "2", "3", "4", "5"]),
             )
 
             st.plotly_chart(fig, use_container_width=True)
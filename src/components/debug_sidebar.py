@@ -0,0 +1,63 @@
+import pandas as pd
+import streamlit as st
+
+import instrumentation
+import queries
+
+
+def _render_summary(title, df):
+    st.markdown(f"**{title}**")
+    if df.empty:
+        st.caption("Nenhuma medição ainda.")
+    else:
+        st.dataframe(df.round(1), use_container_width=True)
+
+
+def display_debug_sidebar():
+    """
+    Barra lateral de diagnóstico: tempos das queries (com acertos do cache),
+    queries lentas, tempo de desenho dos componentes, treinos do Prophet e a
+    memória dos resultados. As medições são do processo inteiro, não só desta
+    sessão.
+    """
+    with st.sidebar:
+        st.header("🛠️ Diagnóstico")
+
+        stats = queries.get_cache_stats()
+        st.caption(f"Backend: `{queries.QUERY_BACKEND}` · Versão dos dados: `{stats['data_version']}`")
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Acertos do cache", f"{stats['hit_rate']:.0%}")
+        with col2:
+            st.metric("Memória do cache", f"{stats['bytes'] / 1024 ** 2:.1f} MB")
+
+        _render_summary("Queries", instrumentation.summarize("query"))
+
+        st.markdown(f"**Queries lentas (≥ {instrumentation.SLOW_QUERY_SECONDS:g}s)**")
+        slow_queries = instrumentation.get_slow_queries()
+        if not slow_queries:
+            st.caption("Nenhuma query lenta registrada.")
+        else:
+            df_slow = pd.DataFrame(slow_queries)
+            df_slow["ts"] = pd.to_datetime(df_slow["ts"], unit="s")
+            columns = [c for c in ("ts", "name", "ms", "rows", "backend", "sql") if c in df_slow]
+            st.dataframe(df_slow[columns].iloc[::-1], use_container_width=True)
+
+        _render_summary("Componentes", instrumentation.summarize("component"))
+        _render_summary("Prophet (treino)", instrumentation.summarize("prophet_fit"))
+        _render_summary("Prophet (previsão)", instrumentation.summarize("prophet_predict"))
+
+        st.markdown("**Memória dos resultados**")
+        result_memory = queries.get_result_memory()
+        if not result_memory:
+            st.caption("Nenhum resultado buscado no banco ainda.")
+        else:
+            df_memory = pd.DataFrame(
+                [(query[:80], m.rows, m.arrow_bytes, m.frame_bytes) for query, m in result_memory.items()],
+                columns=["query", "linhas", "bytes (Arrow)", "bytes (DataFrame)"],
+            )
+            st.dataframe(df_memory.iloc[::-1], use_container_width=True, hide_index=True)
+
+        if st.button("Limpar medições"):
+            instrumentation.clear()
+            st.rerun()
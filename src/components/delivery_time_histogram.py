@@ -1,31 +1,32 @@
 import streamlit as st
-import plotly.express as px
 
+import prefetch
 import queries
 
 
 def display_delivery_time_histogram():
+    import plotly.express as px
+
     with st.container(border=True):
         st.markdown("#### Distribuição do Tempo de Entrega", help="Para uma melhor visualização, os valores 1% mais altos foram removidos.")
         
-        df_delivery_raw = queries.get_raw_delivery_times()
+        # O corte no 99º percentil e a contagem por faixa são feitos no banco,
+        # que devolve apenas as ~50 faixas do histograma
+        df_bins = prefetch.resolve(queries.get_delivery_time_histogram)
         
-        if not df_delivery_raw.empty:        
-            # 2. Calcula o limite para considerar um valor como outlier (99º percentil)
-            # Isso significa que estamos removendo o 1% dos maiores valores.
-            cutoff = df_delivery_raw['dias_para_entrega'].quantile(0.99)
-            
-            # 3. Filtra o DataFrame para remover os outliers
-            df_filtered = df_delivery_raw[df_delivery_raw['dias_para_entrega'] <= cutoff]
-            
-            fig = px.histogram(
-                df_filtered, 
-                x="dias_para_entrega",
-                nbins=50,
+        if not df_bins.empty:
+            fig = px.bar(
+                df_bins,
+                x="inicio_faixa",
+                y="quantidade_de_pedidos",
             )
+
+            # Cada barra começa no início da faixa e ocupa toda a sua largura
+            fig.update_traces(width=df_bins["largura_faixa"].tolist(), offset=0)
             
             # Ajusta os nomes dos eixos para maior clareza
             fig.update_layout(
+                bargap=0,
                 xaxis_title="Tempo de Entrega (dias)",
                 yaxis_title="Número de Pedidos (Frequência)"
             )
@@ -1,7 +1,9 @@
 import streamlit as st
 
+from queries import KpiSnapshot
 
-def kpi_card(faturamento_total, total_pedidos, ticket_medio, avaliacao_media, tempo_medio_entrega, total_clientes):
+
+def kpi_card(snapshot: KpiSnapshot):
     with st.container(border=True):
         # TÍTULO CENTRALIZADO USANDO MARKDOWN E HTML
         # st.markdown("<h3 style='text-align: center;'>Métricas Principais</h3>", unsafe_allow_html=True)
@@ -11,23 +13,27 @@ def kpi_card(faturamento_total, total_pedidos, ticket_medio, avaliacao_media, te
         # --- Primeira linha ---
         col1, col2 = st.columns(2)
         with col1:
-            st.metric(label="💰 Faturamento Total", value=f"R$ {faturamento_total:,.2f}")
+            st.metric(label="💰 Faturamento Total", value=f"R$ {snapshot.faturamento_total:,.2f}")
         with col2:
-            st.metric(label="📦 Total de Pedidos", value=f"{total_pedidos:,}")
+            st.metric(label="📦 Total de Pedidos", value=f"{snapshot.total_pedidos:,}")
 
         # --- Segunda linha ---
         col3, col4 = st.columns(2)
         with col3:
-            st.metric(label="🛒 Ticket Médio", value=f"R$ {ticket_medio:,.2f}")
+            st.metric(label="🛒 Ticket Médio", value=f"R$ {snapshot.ticket_medio:,.2f}")
         with col4:
-            st.metric(label="⭐ Avaliação Média", value=f"{avaliacao_media:.2f}")
+            st.metric(label="⭐ Avaliação Média", value=f"{snapshot.avaliacao_media:.2f}")
         
         # --- Terceira linha ---
         col5, col6 = st.columns(2)
         with col5:
-            st.metric(label="🚚 Tempo Médio de Entrega", value=f"{tempo_medio_entrega:.1f} dias")
+            st.metric(label="🚚 Tempo Médio de Entrega", value=f"{snapshot.tempo_medio_entrega:.1f} dias")
         
         # Só exibe o sexto KPI se a coluna 'customer_id' existir
-        if total_clientes is not None:
+        if snapshot.total_clientes is not None:
             with col6:
-                st.metric(label="👥 Clientes Únicos", value=f"{total_clientes:,}")
+                # Estimativa dos sketches HyperLogLog: o erro vai na dica do KPI
+                help_text = None
+                if snapshot.erro_padrao_clientes:
+                    help_text = f"Estimativa (HyperLogLog), com erro padrão de {snapshot.erro_padrao_clientes:.1%}."
+                st.metric(label="👥 Clientes Únicos", value=f"{snapshot.total_clientes:,}", help=help_text)
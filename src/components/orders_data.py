@@ -1,6 +1,6 @@
-from datetime import date
 import streamlit as st
 
+import prefetch
 import queries
 
 
@@ -8,9 +8,15 @@ def display_orders_data():
     with st.container(border=True):
         st.markdown("#### Análise de Vendas por Período")
 
-        # 1. Define o intervalo possível para o slider dinamicamente
-        min_date = date(2016, 9, 15)
-        max_date = date(2018, 8, 29)
+        # 1. Carrega o índice diário de faturamento (uma vez por versão dos dados)
+        revenue_index = prefetch.resolve(queries.get_revenue_index)
+        if revenue_index is None:
+            st.warning("Não foi possível carregar os dados de vendas.")
+            return
+
+        # Define o intervalo possível para o slider dinamicamente
+        min_date = revenue_index.min_date
+        max_date = revenue_index.max_date
 
         # 2. Cria o slider de intervalo de datas
         start_date, end_date = st.slider(
@@ -28,10 +34,26 @@ def display_orders_data():
         if start_date > end_date:
             st.error("Erro: A data de início não pode ser posterior à data de fim.")
         else:
-            # Chama a função de consulta passando as datas do slider
-            df_orders = queries.get_orders_by_time_period(start_date, end_date)
-            
+            # O recorte, os totais e os clientes saem dos índices em memória, sem ir ao banco
+            df_orders = revenue_index.slice(start_date, end_date)
+
             if not df_orders.empty:
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.metric(label="💰 Receita no Período", value=f"R$ {revenue_index.total(start_date, end_date):,.2f}")
+                with col2:
+                    st.metric(label="📅 Média Diária", value=f"R$ {revenue_index.mean(start_date, end_date):,.2f}")
+
+                # Clientes únicos do período, estimados pelos sketches diários
+                # em memória (carregados uma vez por versão dos dados)
+                sketch_index = prefetch.resolve(queries.get_sketch_index)
+                if sketch_index is not None:
+                    total_clientes = sketch_index.estimate('customer_unique_id', start_date, end_date)
+                    help_text = f"Estimativa (HyperLogLog), com erro padrão de {sketch_index.standard_error:.1%}."
+                    col3, _ = st.columns(2)
+                    with col3:
+                        st.metric(label="👥 Clientes no Período", value=f"{total_clientes:,}", help=help_text)
+
                 chart_data = df_orders.set_index('date')
                 st.line_chart(chart_data)
             else:
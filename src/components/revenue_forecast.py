@@ -1,19 +1,90 @@
-from datetime import date
-from prophet.plot import plot_plotly, plot_components_plotly
+from collections import OrderedDict
+from concurrent.futures import TimeoutError
+
 import streamlit as st
 
+import cv_jobs
 import forecasting
 import queries
 
 
+# Tempo que a página espera pelo Prophet antes de exibir a prévia (segundos);
+# modelos já treinados respondem dentro desse prazo e dispensam a prévia
+FORECAST_PREVIEW_DELAY = 0.5
+# Quantas previsões prontas (figuras) cada sessão guarda: voltar à aba ou a um
+# período já visto redesenha os gráficos sem passar pelo Prophet
+FORECAST_SESSION_CACHE_SIZE = 4
+
+
+def _session_forecasts() -> OrderedDict:
+    # Figuras das previsões desta sessão, da mais antiga para a mais recente
+    if "forecast_figures" not in st.session_state:
+        st.session_state["forecast_figures"] = OrderedDict()
+    return st.session_state["forecast_figures"]
+
+
+def _plot_baseline_preview(df_prophet, days_to_forecast):
+    """
+    Gráfico da previsão do modelo de referência (Holt-Winters), que fica
+    pronto em milissegundos, no mesmo formato do gráfico do Prophet.
+    """
+    import plotly.graph_objects as go
+
+    _, forecast = forecasting.forecast_baseline(df_prophet, days_to_forecast)
+
+    fig = go.Figure([
+        go.Scatter(x=forecast['ds'], y=forecast['yhat_upper'], mode='lines', line=dict(width=0),
+                   hoverinfo='skip', showlegend=False),
+        go.Scatter(x=forecast['ds'], y=forecast['yhat_lower'], mode='lines', line=dict(width=0),
+                   fill='tonexty', fillcolor='rgba(0, 114, 178, 0.2)', hoverinfo='skip', showlegend=False),
+        go.Scatter(x=forecast['ds'], y=forecast['yhat'], mode='lines', name='Prévia',
+                   line=dict(color='#0072B2', width=2)),
+        go.Scatter(x=df_prophet['ds'], y=df_prophet['y'], mode='markers', name='Real',
+                   marker=dict(color='#87CEEB', size=4)),
+    ])
+    fig.update_layout(
+        title=f"Prévia da Previsão para os Próximos {days_to_forecast} Dias",
+        xaxis_title="Data",
+        yaxis_title="Faturamento (R$)"
+    )
+    return fig
+
+
+@st.fragment(run_every=1)
+def _wait_for_forecast(future):
+    """
+    Aguarda o treino do Prophet em segundo plano e recarrega a página quando
+    ele termina, substituindo a prévia pela previsão final.
+    """
+    if future.done():
+        st.rerun()
+    st.caption("⏳ Prévia calculada com Holt-Winters. A previsão do Prophet substituirá este gráfico assim que o treino terminar.")
+
+
 def _generate_and_plot_forecast(df_prophet, days_to_forecast):
     """
     Recebe dados preparados, treina o modelo, e retorna as figuras dos gráficos.
     Esta função isola a lógica de modelagem e plotagem.
+
+    O Prophet treina em segundo plano; enquanto isso, uma prévia do modelo de
+    referência é exibida e a função retorna (None, None).
     """
     try:
-        with st.spinner(f"Treinando modelo e prevendo os próximos {days_to_forecast} dias..."):
-            model, forecast = forecasting.train_and_forecast_model(df_prophet, days_to_forecast)
+        future = forecasting.submit_forecast(df_prophet, days_to_forecast)
+        try:
+            model, forecast = future.result(timeout=FORECAST_PREVIEW_DELAY)
+        except TimeoutError:
+            try:
+                st.plotly_chart(_plot_baseline_preview(df_prophet, days_to_forecast),
+                                use_container_width=True, theme="streamlit")
+            except ValueError:
+                # Histórico curto demais para a prévia: aguarda só o Prophet
+                pass
+            _wait_for_forecast(future)
+            return None, None
+
+        # O Prophet (e o cmdstanpy) só é importado quando há um modelo para plotar
+        from prophet.plot import plot_plotly, plot_components_plotly
 
         # Gráfico 1: Previsão Principal
         fig1 = plot_plotly(model, forecast)
@@ -36,33 +107,89 @@ def _generate_and_plot_forecast(df_prophet, days_to_forecast):
         return None, None
 
 
+def _render_metrics(df_metrics):
+    df_prophet_metrics = df_metrics[df_metrics['model'] == 'prophet']
+
+    st.write("Métricas de Performance (Horizonte de 60 dias):")
+    st.dataframe(df_prophet_metrics[['horizon', 'mape', 'mae', 'rmse']].head())
+
+    mape_value = df_prophet_metrics['mape'].iloc[0] * 100
+    mae_value = df_prophet_metrics['mae'].iloc[0]
+    st.markdown(f"""
+    - **MAPE:** Em média, o erro da previsão é de **{mape_value:.2f}%**.
+    - **MAE:** Em média, o erro da previsão é de **R$ {mae_value:,.2f}**.
+    """)
+
+    st.write("Comparação com os modelos de referência (média de todos os horizontes):")
+    df_comparison = (
+        df_metrics.groupby('model', sort=False)[['mape', 'mae', 'rmse']].mean()
+        .rename(index=forecasting.MODEL_LABELS)
+    )
+    df_comparison.index.name = "Modelo"
+    st.dataframe(df_comparison)
+
+
+def _render_validation_error(error):
+    if isinstance(error, ValueError):
+        st.error(f"Erro na Validação: {error}")
+        st.warning("O histórico de dados pode ser muito curto para os parâmetros de validação. Verifique a configuração da validação cruzada em forecasting.py.")
+    else:
+        st.error(f"Ocorreu um erro inesperado durante a validação: {error}")
+
+
+@st.fragment(run_every=2)
+def _render_job_progress(job_key):
+    """
+    Acompanha a validação cruzada em segundo plano, atualizando só este trecho
+    da página, e recarrega a seção quando o resultado fica disponível.
+    """
+    runner = cv_jobs.get_runner()
+    job = runner.get_job(job_key)
+    if job is None or job.error is not None or runner.load_metrics(job_key) is not None:
+        st.rerun()
+
+    st.progress(
+        job.progress,
+        text=f"Executando validação cruzada em segundo plano... {job.completed}/{job.total} cortes concluídos."
+    )
+
+
 def _render_accuracy_section(queries, forecasting, min_date, max_date):
     with st.container(border=True):
         st.subheader("Qualidade do Modelo de Referência")
-        st.info("As métricas abaixo são calculadas usando o histórico completo de dados para uma avaliação robusta do modelo.")
+        st.info("As métricas abaixo são calculadas usando o histórico completo de dados para uma avaliação robusta do modelo. O cálculo roda em segundo plano e o resultado fica salvo até os dados serem atualizados.")
+
+        full_history_df = queries.get_orders_by_time_period(min_date, max_date)
+        if full_history_df is None:
+            st.warning("Nenhum dado de faturamento disponível para avaliar o modelo.")
+            return
+
+        df_full_prophet = full_history_df.rename(columns={'date': 'ds', 'total_price': 'y'})
+
+        runner = cv_jobs.get_runner()
+        job_key = runner.job_key(df_full_prophet, queries.get_data_version())
+
+        # Métricas já calculadas para esta versão dos dados aparecem na hora
+        df_metrics = runner.load_metrics(job_key)
+        if df_metrics is not None:
+            _render_metrics(df_metrics)
+            return
+
+        job = runner.get_job(job_key)
+        if job is not None and job.error is None:
+            _render_job_progress(job_key)
+            return
+        if job is not None:
+            _render_validation_error(job.error)
 
         if st.button("Calcular Métricas de Acurácia"):
-            with st.spinner("Executando validação cruzada... Isso pode levar alguns minutos."):
-                try:
-                    full_history_df = queries.get_orders_by_time_period(min_date, max_date)
-                    df_full_prophet = full_history_df.rename(columns={'date': 'ds', 'total_price': 'y'})
-                    
-                    df_metrics = forecasting.evaluate_model(df_full_prophet)
-                    
-                    st.write("Métricas de Performance (Horizonte de 60 dias):")
-                    st.dataframe(df_metrics[['horizon', 'mape', 'mae', 'rmse']].head())
-                    
-                    mape_value = df_metrics['mape'].iloc[0] * 100
-                    mae_value = df_metrics['mae'].iloc[0]
-                    st.markdown(f"""
-                    - **MAPE:** Em média, o erro da previsão é de **{mape_value:.2f}%**.
-                    - **MAE:** Em média, o erro da previsão é de **R$ {mae_value:,.2f}**.
-                    """)
-                except ValueError as e:
-                    st.error(f"Erro na Validação: {e}")
-                    st.warning("O histórico de dados pode ser muito curto para os parâmetros de validação. Verifique a função 'evaluate_model' em forecasting.py.")
-                except Exception as e:
-                    st.error(f"Ocorreu um erro inesperado durante a validação: {e}")
+            try:
+                runner.submit(job_key, df_full_prophet)
+            except ValueError as e:
+                _render_validation_error(e)
+                return
+            # Só o componente da previsão precisa ser redesenhado
+            st.rerun(scope="fragment")
 
 
 def display_revenue_forecast():
@@ -75,8 +202,8 @@ def display_revenue_forecast():
             min_value=30, max_value=365, value=60, step=30
         )
 
-        min_date = date(2016, 9, 15)
-        max_date = date(2018, 8, 29)
+        min_date = queries.DATA_START_DATE
+        max_date = queries.DATA_END_DATE
 
         start_date, end_date = st.slider(
             "Selecione o intervalo de datas para treinar o modelo:",
@@ -94,13 +221,23 @@ def display_revenue_forecast():
         # Busca os dados para o período de treino selecionado
         df_revenue = queries.get_orders_by_time_period(start_date, end_date)
         
-        if df_revenue.empty:
+        if df_revenue is None:
             st.warning("Nenhum dado de faturamento encontrado no período selecionado.")
             return
 
         df_prophet = df_revenue.rename(columns={'date': 'ds', 'total_price': 'y'})
         
-        fig_forecast, fig_components = _generate_and_plot_forecast(df_prophet, days_to_forecast)
+        session_forecasts = _session_forecasts()
+        forecast_key = (queries.get_data_version(), start_date, end_date, days_to_forecast)
+        if forecast_key in session_forecasts:
+            session_forecasts.move_to_end(forecast_key)
+            fig_forecast, fig_components = session_forecasts[forecast_key]
+        else:
+            fig_forecast, fig_components = _generate_and_plot_forecast(df_prophet, days_to_forecast)
+            if fig_forecast and fig_components:
+                session_forecasts[forecast_key] = (fig_forecast, fig_components)
+                while len(session_forecasts) > FORECAST_SESSION_CACHE_SIZE:
+                    session_forecasts.popitem(last=False)
 
         if fig_forecast and fig_components:
             st.plotly_chart(fig_forecast, use_container_width=True, theme="streamlit")
@@ -1,20 +1,25 @@
 import streamlit as st
-import plotly.express as px
 
+import prefetch
 import queries
 
 
+# Dicionário que mapeia o nome amigável para a coluna do banco de dados
+SALES_DIMENSIONS = {
+    "Cidade": "customer_city",
+    "Estado": "customer_state",
+    "Forma de Pagamento": "payment_type",
+    "Setor de Produto": "product_category_name",
+}
+
+
 def display_sales_by_category_pie_chart():
+    import plotly.express as px
+
     with st.container(border=True):
         st.markdown("#### Análise de Faturamento por Categoria")
 
-        # Dicionário que mapeia o nome amigável para a coluna do banco de dados
-        categories = {
-            "Cidade": "customer_city",
-            "Estado": "customer_state",
-            "Forma de Pagamento": "payment_type",
-            "Setor de Produto": "product_category_name",
-        }
+        categories = SALES_DIMENSIONS
 
         # Seletor para o usuário escolher a métrica
         selected_category = st.selectbox(
@@ -26,7 +31,7 @@ def display_sales_by_category_pie_chart():
         column_to_query = categories[selected_category]
 
         # Chama a função de consulta com a coluna dinâmica
-        df_dimension = queries.get_sales_by_dimension(column_to_query, categories.values())
+        df_dimension = prefetch.resolve(queries.get_sales_by_dimension, column_to_query, list(categories.values()))
 
         # Verifica se a consulta retornou dados
         if not df_dimension.empty:
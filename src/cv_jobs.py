@@ -0,0 +1,150 @@
+import hashlib
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import pandas as pd
+import streamlit as st
+
+import forecasting
+from model_registry import data_fingerprint, params_fingerprint
+
+
+# Número de processos usados pela validação cruzada em segundo plano
+CV_MAX_WORKERS = int(os.environ.get("CV_MAX_WORKERS", "2"))
+
+# Diretório onde ficam as métricas já calculadas
+CV_RESULTS_PATH = os.environ.get("CV_RESULTS_PATH", ".cv_results")
+
+
+class CrossValidationJob:
+    """
+    Validação cruzada em andamento: um par (modelo, corte) por tarefa no pool
+    de processos.
+    """
+
+    def __init__(self, key: str, futures: list[Future]):
+        self.key = key
+        self.futures = futures
+        self.error: Exception | None = None
+        self.finished = False
+
+    @property
+    def total(self) -> int:
+        return len(self.futures)
+
+    @property
+    def completed(self) -> int:
+        return sum(future.done() for future in self.futures)
+
+    @property
+    def progress(self) -> float:
+        return self.completed / self.total if self.total else 1.0
+
+
+class CrossValidationRunner:
+    """
+    Executa a validação cruzada do modelo num pool de processos, fora da
+    execução do script, e guarda as métricas em disco.
+
+    As métricas são indexadas pela versão dos dados e pela configuração do
+    modelo, então todos os usuários compartilham o mesmo resultado e ele só é
+    recalculado quando o pipeline publica dados novos.
+    """
+
+    def __init__(self, results_path: str, max_workers: int):
+        self.results_path = results_path
+        self.max_workers = max_workers
+        self._executor: ProcessPoolExecutor | None = None
+        self._jobs: dict[str, CrossValidationJob] = {}
+        self._lock = threading.Lock()
+        os.makedirs(results_path, exist_ok=True)
+
+    def job_key(self, df: pd.DataFrame, data_version=None) -> str:
+        """
+        Chave das métricas: versão publicada dos dados (ou, sem ela, o hash do
+        histórico) mais os hiperparâmetros e a configuração da validação.
+        """
+        data = str(data_version) if data_version is not None else data_fingerprint(df)
+        config = params_fingerprint({
+            "params": forecasting.PROPHET_PARAMS,
+            "models": list(forecasting.FORECASTERS),
+            "initial": forecasting.CV_INITIAL,
+            "period": forecasting.CV_PERIOD,
+            "horizon": forecasting.CV_HORIZON,
+        })
+        return hashlib.sha256(f"{data}:{config}".encode()).hexdigest()[:32]
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.results_path, f"{key}.pkl")
+
+    def load_metrics(self, key: str) -> pd.DataFrame | None:
+        try:
+            return pd.read_pickle(self._path(key))
+        except FileNotFoundError:
+            return None
+
+    def _save_metrics(self, key: str, df_metrics: pd.DataFrame) -> None:
+        # Arquivo temporário + troca atômica, como no registro de modelos
+        tmp_path = f"{self._path(key)}.{os.getpid()}.tmp"
+        df_metrics.to_pickle(tmp_path)
+        os.replace(tmp_path, self._path(key))
+
+    def get_job(self, key: str) -> CrossValidationJob | None:
+        with self._lock:
+            return self._jobs.get(key)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # "spawn" evita herdar as threads do servidor do Streamlit no fork
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def submit(self, key: str, df: pd.DataFrame) -> CrossValidationJob:
+        """
+        Dispara a validação cruzada de `df`, a menos que ela já esteja em
+        andamento. Levanta ValueError se o histórico for curto demais.
+        """
+        tasks = forecasting.cross_validation_tasks(df)
+
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.error is None:
+                return job
+
+            executor = self._get_executor()
+            futures = [executor.submit(forecasting.forecast_cutoff, df, cutoff, name) for name, cutoff in tasks]
+            job = CrossValidationJob(key, futures)
+            self._jobs[key] = job
+
+        for future in futures:
+            future.add_done_callback(lambda _, job=job: self._on_cutoff_done(job))
+        return job
+
+    def _on_cutoff_done(self, job: CrossValidationJob) -> None:
+        with self._lock:
+            if job.finished or job.completed < job.total:
+                return
+            job.finished = True
+
+        try:
+            df_cv = pd.concat([future.result() for future in job.futures], ignore_index=True)
+            self._save_metrics(job.key, forecasting.summarize_cross_validation(df_cv))
+        except Exception as e:
+            job.error = e
+            return
+
+        with self._lock:
+            self._jobs.pop(job.key, None)
+
+
+@st.cache_resource
+def get_runner() -> CrossValidationRunner:
+    """
+    Cria o executor de validação cruzada compartilhado pelas sessões do app.
+    """
+    return CrossValidationRunner(CV_RESULTS_PATH, CV_MAX_WORKERS)
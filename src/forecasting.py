@@ -1,14 +1,91 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from statistics import NormalDist
+
+import numpy as np
 import pandas as pd
-from prophet import Prophet
-from prophet.diagnostics import cross_validation, performance_metrics
 import streamlit as st
 
+import instrumentation
+from model_registry import ModelRegistry, warm_start_params
+
+
+# Diretório do registro de modelos treinados e número máximo de modelos guardados
+MODEL_REGISTRY_PATH = os.environ.get("MODEL_REGISTRY_PATH", ".model_registry")
+MODEL_REGISTRY_MAX_ENTRIES = int(os.environ.get("MODEL_REGISTRY_MAX_ENTRIES", "20"))
+
+# Hiperparâmetros do modelo de previsão (fazem parte da chave do registro)
+PROPHET_PARAMS = {
+    "yearly_seasonality": True,
+    "weekly_seasonality": True,
+    "daily_seasonality": False,
+}
+
+# Configuração da validação cruzada
+# initial: período inicial de treino
+# period: a cada quantos dias faremos um novo "corte" de treino
+# horizon: quantos dias à frente queremos prever em cada corte
+CV_INITIAL = '360 days'
+CV_PERIOD = '30 days'
+CV_HORIZON = '60 days'
+
+# Treinos do Prophet executados em paralelo em segundo plano e quantos
+# resultados concluídos ficam guardados para a recarga da página que os exibe
+FORECAST_MAX_WORKERS = int(os.environ.get("FORECAST_MAX_WORKERS", "2"))
+FORECAST_MAX_RESULTS = 8
+
+# Largura dos intervalos de previsão (a mesma do padrão do Prophet)
+INTERVAL_WIDTH = 0.8
+
+# Treinos do Prophet em andamento ou recentes, indexados pelos dados e pelo horizonte
+_forecasts: OrderedDict[tuple, Future] = OrderedDict()
+_forecasts_lock = threading.Lock()
+
+
+def _new_prophet():
+    # O Prophet (e o cmdstanpy) só é importado quando um modelo é treinado
+    from prophet import Prophet
+
+    return Prophet(**PROPHET_PARAMS)
+
+
+def _warm_start_fit(df: pd.DataFrame, nearest):
+    """
+    Treina um Prophet novo partindo dos parâmetros de `nearest`, ou retorna
+    None se o Stan recusar esse ponto de partida.
+
+    O registro casa os modelos só pelos hiperparâmetros, e o Prophet reduz o
+    número de changepoints em históricos curtos: um vizinho treinado com outro
+    período pode ter um vetor `delta` de outro tamanho, e o fit falha.
+    """
+    model = _new_prophet()
+    try:
+        model.fit(df, init=warm_start_params(nearest))
+    except Exception:
+        # Um Prophet só pode ser treinado uma vez; o treino do zero usa outra instância
+        return None
+    return model
+
+
+@st.cache_resource
+def get_model_registry() -> ModelRegistry:
+    """
+    Cria o registro de modelos compartilhado pelas sessões do app.
+    """
+    return ModelRegistry(MODEL_REGISTRY_PATH, MODEL_REGISTRY_MAX_ENTRIES)
+
 
-@st.cache_data
 def train_and_forecast_model(df: pd.DataFrame, periods: int):
     """
     Recebe um DataFrame, treina o modelo Prophet e retorna o modelo e a previsão.
 
+    Modelos e previsões ficam no registro em disco: se os mesmos dados já foram
+    treinados com os mesmos hiperparâmetros, o modelo é reaproveitado e, quando
+    só o horizonte muda, apenas a previsão é recalculada. Um treino novo parte
+    dos parâmetros do modelo guardado com o período de treino mais próximo.
+
     Args:
         df (pd.DataFrame): DataFrame preparado com as colunas 'ds' e 'y'.
         periods (int): Número de dias para prever no futuro.
@@ -16,50 +93,317 @@ def train_and_forecast_model(df: pd.DataFrame, periods: int):
     Returns:
         tuple: Uma tupla contendo o modelo treinado e o DataFrame da previsão.
     """
-    # Instancia o modelo com sazonalidades padrão
-    model = Prophet(
-        yearly_seasonality=True,
-        weekly_seasonality=True,
-        daily_seasonality=False
-    )
-    
-    # Treina o modelo com os dados
-    model.fit(df)
-    
-    # Cria um DataFrame com as datas futuras
-    future = model.make_future_dataframe(periods=periods)
-    
-    # Gera a previsão
-    forecast = model.predict(future)
-    
+    registry = get_model_registry()
+    key = registry.key(df, PROPHET_PARAMS)
+
+    model = registry.load_model(key)
+    if model is None:
+        # Treina o modelo com os dados, partindo do modelo mais próximo se houver
+        nearest = registry.nearest_model(df, PROPHET_PARAMS)
+        with instrumentation.timed("prophet_fit", "prophet", rows=len(df), warm_start=nearest is not None) as event:
+            model = None
+            if nearest is not None:
+                model = _warm_start_fit(df, nearest)
+                event["warm_start"] = model is not None
+            if model is None:
+                # Instancia o modelo com sazonalidades padrão
+                model = _new_prophet()
+                model.fit(df)
+        registry.save_model(key, model, df, PROPHET_PARAMS)
+
+    forecast = registry.load_forecast(key, periods)
+    if forecast is None:
+        # Cria um DataFrame com as datas futuras
+        future = model.make_future_dataframe(periods=periods)
+
+        # Gera a previsão
+        with instrumentation.timed("prophet_predict", "prophet", rows=len(future)):
+            forecast = model.predict(future)
+        registry.save_forecast(key, periods, forecast)
+
     return model, forecast
 
 
-def evaluate_model(df: pd.DataFrame):
+@st.cache_resource
+def _get_forecast_executor() -> ThreadPoolExecutor:
+    """
+    Cria o pool de threads dos treinos do Prophet, compartilhado pelas sessões.
+    """
+    return ThreadPoolExecutor(max_workers=FORECAST_MAX_WORKERS, thread_name_prefix="forecast")
+
+
+def submit_forecast(df: pd.DataFrame, periods: int) -> Future:
+    """
+    Dispara `train_and_forecast_model` em segundo plano e retorna a future com
+    o par (modelo, previsão). Pedidos iguais, de qualquer sessão, compartilham
+    o mesmo treino. As futures concluídas mais recentes são mantidas, para que
+    a recarga que exibe o resultado (ou o erro) não dispare o treino de novo.
+    """
+    key = (get_model_registry().key(df, PROPHET_PARAMS), periods)
+    with _forecasts_lock:
+        future = _forecasts.get(key)
+        if future is None:
+            future = _get_forecast_executor().submit(train_and_forecast_model, df, periods)
+            _forecasts[key] = future
+        _forecasts.move_to_end(key)
+
+        finished = [k for k, f in _forecasts.items() if f.done()]
+        for k in finished[:max(len(finished) - FORECAST_MAX_RESULTS, 0)]:
+            del _forecasts[k]
+    return future
+
+
+class _DailyForecaster:
+    """
+    Base dos modelos de referência, com a mesma interface do Prophet
+    (`fit`, `make_future_dataframe` e `predict`).
+
+    A série é reindexada para um vetor denso com uma posição por dia (dias sem
+    vendas valem zero), de modo que qualquer data vira uma posição no vetor.
+    As subclasses implementam `_fit` e `_predict` sobre esse vetor.
     """
-    Executa a validação cruzada no modelo e retorna as métricas de performance.
+
+    def fit(self, df: pd.DataFrame):
+        self.history = df.assign(ds=pd.to_datetime(df['ds'])).sort_values('ds').reset_index(drop=True)
+        self.start = self.history['ds'].min()
+        days = pd.date_range(self.start, self.history['ds'].max(), freq='D')
+        self.y = self.history.set_index('ds')['y'].reindex(days, fill_value=0.0).to_numpy(dtype=np.float64)
+        self._fit(self.y)
+        return self
+
+    def make_future_dataframe(self, periods: int) -> pd.DataFrame:
+        future = pd.date_range(self.history['ds'].max() + pd.Timedelta(days=1), periods=periods, freq='D')
+        return pd.DataFrame({'ds': np.concatenate([self.history['ds'].to_numpy(), future.to_numpy()])})
+
+    def predict(self, future: pd.DataFrame) -> pd.DataFrame:
+        ds = pd.to_datetime(future['ds']).reset_index(drop=True)
+        positions = (ds - self.start).dt.days.to_numpy()
+        if (positions < 0).any():
+            raise ValueError("Não é possível prever datas anteriores ao início do histórico.")
+
+        yhat, sigma = self._predict(max(int(positions.max()) + 1 - len(self.y), 0))
+        z = NormalDist().inv_cdf(0.5 + INTERVAL_WIDTH / 2)
+        return pd.DataFrame({
+            'ds': ds,
+            'yhat': yhat[positions],
+            'yhat_lower': yhat[positions] - z * sigma[positions],
+            'yhat_upper': yhat[positions] + z * sigma[positions],
+        })
+
+    def _fit(self, y: np.ndarray) -> None:
+        raise NotImplementedError
+
+    def _predict(self, horizon: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Retorna a previsão e o desvio padrão para todas as posições do
+        histórico (ajuste um passo à frente) mais `horizon` dias futuros.
+        """
+        raise NotImplementedError
+
+
+class SeasonalNaiveForecaster(_DailyForecaster):
+    """
+    Sazonal ingênuo: cada dia repete o valor do mesmo dia da semana anterior.
+    """
+
+    def __init__(self, period: int = 7):
+        self.period = period
+
+    def _fit(self, y: np.ndarray) -> None:
+        if len(y) <= self.period:
+            raise ValueError(f"O modelo sazonal ingênuo precisa de mais de {self.period} dias de histórico.")
+        self.sigma = np.std(y[self.period:] - y[:-self.period])
+
+    def _predict(self, horizon: int) -> tuple[np.ndarray, np.ndarray]:
+        n, period = len(self.y), self.period
+        fitted = np.concatenate([np.full(period, np.nan), self.y[:-period]])
+
+        # O dia h à frente repete a última temporada observada; a incerteza
+        # cresce com o número de temporadas desde a última observação
+        steps = np.arange(1, horizon + 1)
+        forecast = self.y[n - period + (steps - 1) % period]
+        seasons = np.ceil(steps / period)
+
+        yhat = np.concatenate([fitted, forecast])
+        sigma = np.concatenate([np.full(n, self.sigma), self.sigma * np.sqrt(seasons)])
+        return yhat, sigma
+
+
+class HoltWintersForecaster(_DailyForecaster):
+    """
+    Holt-Winters aditivo com sazonalidade semanal e anual (na forma de
+    correção de erro de Taylor para duas sazonalidades).
+
+    Os parâmetros de suavização são escolhidos numa grade pelo menor erro um
+    passo à frente. A recursão percorre os dias uma única vez, vetorizada
+    sobre todas as combinações da grade ao mesmo tempo.
+    """
+
+    WEEK = 7
+    YEAR = 365
+
+    ALPHAS = (0.05, 0.1, 0.2, 0.3, 0.5)
+    BETAS = (0.0, 0.01, 0.05)
+    GAMMAS_WEEKLY = (0.05, 0.1, 0.2, 0.3)
+    GAMMAS_YEARLY = (0.0, 0.05, 0.1, 0.2)
+
+    # Dias iniciais ignorados na escolha dos parâmetros, enquanto os estados se ajustam
+    BURN_IN = 28
+
+    def _fit(self, y: np.ndarray) -> None:
+        n = len(y)
+        if n <= self.BURN_IN:
+            raise ValueError(f"O modelo Holt-Winters precisa de mais de {self.BURN_IN} dias de histórico.")
+
+        grid = np.array(np.meshgrid(self.ALPHAS, self.BETAS, self.GAMMAS_WEEKLY, self.GAMMAS_YEARLY)).reshape(4, -1)
+        alpha, beta, gamma_weekly, gamma_yearly = grid
+        size = grid.shape[1]
+
+        # Estados iniciais: nível da primeira semana, sem tendência, perfil
+        # semanal da primeira semana e perfil anual do primeiro ano (se houver
+        # dois anos de histórico para não confundi-lo com a tendência)
+        level = np.full(size, y[:self.WEEK].mean())
+        trend = np.zeros(size)
+        weekly = np.tile(y[:self.WEEK] - y[:self.WEEK].mean(), (size, 1))
+        yearly = np.zeros((size, self.YEAR))
+        if n >= 2 * self.YEAR:
+            smoothed = pd.Series(y[:self.YEAR]).rolling(self.WEEK, center=True, min_periods=1).mean().to_numpy()
+            yearly[:] = smoothed - smoothed.mean()
+
+        fitted = np.empty((size, n))
+        for t in range(n):
+            w, d = t % self.WEEK, t % self.YEAR
+            fitted[:, t] = level + trend + weekly[:, w] + yearly[:, d]
+            error = y[t] - fitted[:, t]
+            level = level + trend + alpha * error
+            trend = trend + alpha * beta * error
+            weekly[:, w] += gamma_weekly * error
+            yearly[:, d] += gamma_yearly * error
+
+        best = np.argmin(((y - fitted)[:, self.BURN_IN:] ** 2).sum(axis=1))
+        self.alpha, self.beta = alpha[best], beta[best]
+        self.level, self.trend = level[best], trend[best]
+        self.weekly, self.yearly = weekly[best], yearly[best]
+        self.fitted = fitted[best]
+        self.sigma = np.std((y - self.fitted)[self.BURN_IN:])
+
+    def _predict(self, horizon: int) -> tuple[np.ndarray, np.ndarray]:
+        n = len(self.y)
+        steps = np.arange(1, horizon + 1)
+        t = n - 1 + steps
+        forecast = (self.level + steps * self.trend
+                    + self.weekly[t % self.WEEK] + self.yearly[t % self.YEAR])
+
+        # Variância do erro h passos à frente do modelo com tendência aditiva
+        coefficients = self.alpha * (1 + self.beta * np.arange(1, horizon))
+        variance = np.concatenate([[1.0], 1.0 + np.cumsum(coefficients ** 2)])[:horizon]
+
+        yhat = np.concatenate([self.fitted, forecast])
+        sigma = np.concatenate([np.full(n, self.sigma), self.sigma * np.sqrt(variance)])
+        return yhat, sigma
+
+
+# Modelos disponíveis, todos com a interface do Prophet
+FORECASTERS = {
+    "prophet": _new_prophet,
+    "seasonal_naive": SeasonalNaiveForecaster,
+    "holt_winters": HoltWintersForecaster,
+}
+
+MODEL_LABELS = {
+    "prophet": "Prophet",
+    "seasonal_naive": "Sazonal ingênuo (semanal)",
+    "holt_winters": "Holt-Winters (semanal e anual)",
+}
+
+
+def forecast_baseline(df: pd.DataFrame, periods: int, model_name: str = "holt_winters"):
+    """
+    Treina um modelo de referência, que leva milissegundos, e retorna o modelo
+    e a previsão, no mesmo formato de `train_and_forecast_model`.
+    """
+    model = FORECASTERS[model_name]().fit(df)
+    forecast = model.predict(model.make_future_dataframe(periods=periods))
+    return model, forecast
+
+
+def cross_validation_cutoffs(df: pd.DataFrame) -> list[pd.Timestamp]:
+    """
+    Retorna as datas de corte da validação cruzada para o histórico `df`.
+    Levanta ValueError se o histórico for curto demais para a configuração.
+    """
+    from prophet.diagnostics import generate_cutoffs
+
+    history = df.assign(ds=pd.to_datetime(df['ds']))
+    return generate_cutoffs(
+        history,
+        horizon=pd.Timedelta(CV_HORIZON),
+        initial=pd.Timedelta(CV_INITIAL),
+        period=pd.Timedelta(CV_PERIOD),
+    )
+
+
+def forecast_cutoff(df: pd.DataFrame, cutoff: pd.Timestamp, model_name: str = "prophet") -> pd.DataFrame:
+    """
+    Treina o modelo com os dados até `cutoff` e prevê o horizonte seguinte.
+    Retorna as mesmas colunas de um corte do `cross_validation` do Prophet,
+    mais o nome do modelo, para que os cortes possam ser executados um a um,
+    em outros processos.
+    """
+    history = df.assign(ds=pd.to_datetime(df['ds']))
+    model = FORECASTERS[model_name]().fit(history[history['ds'] <= cutoff])
+
+    test = history[(history['ds'] > cutoff) & (history['ds'] <= cutoff + pd.Timedelta(CV_HORIZON))]
+    forecast = model.predict(test[['ds']])
+    return pd.DataFrame({
+        'ds': forecast['ds'].values,
+        'yhat': forecast['yhat'].values,
+        'yhat_lower': forecast['yhat_lower'].values,
+        'yhat_upper': forecast['yhat_upper'].values,
+        'y': test['y'].values,
+        'cutoff': cutoff,
+        'model': model_name,
+    })
+
+
+def cross_validation_tasks(df: pd.DataFrame, model_names=tuple(FORECASTERS)) -> list[tuple]:
+    """
+    Lista os pares (modelo, data de corte) da validação cruzada comparativa.
+    """
+    cutoffs = cross_validation_cutoffs(df)
+    return [(name, cutoff) for name in model_names for cutoff in cutoffs]
+
+
+def summarize_cross_validation(df_cv: pd.DataFrame) -> pd.DataFrame:
+    """
+    Calcula as métricas de performance de cada modelo a partir dos cortes.
+    """
+    from prophet.diagnostics import performance_metrics
+
+    return pd.concat([
+        performance_metrics(group.drop(columns='model')).assign(model=name)
+        for name, group in df_cv.groupby('model', sort=False)
+    ], ignore_index=True)
+
+
+def evaluate_model(df: pd.DataFrame, model_names=tuple(FORECASTERS)):
+    """
+    Executa a validação cruzada nos modelos e retorna as métricas de performance.
 
     Args:
         df (pd.DataFrame): DataFrame com as colunas 'ds' e 'y'.
+        model_names (tuple): Modelos de `FORECASTERS` a comparar.
 
     Returns:
-        pd.DataFrame: Um DataFrame contendo diversas métricas de erro.
-    """
-    # Configuração da validação cruzada
-    # initial: período inicial de treino
-    # period: a cada quantos dias faremos um novo "corte" de treino
-    # horizon: quantos dias à frente queremos prever em cada corte
-    df_cv = cross_validation(
-        model=Prophet().fit(df),
-        initial='360 days',
-        period='30 days',
-        horizon='60 days',
-        parallel="processes"
-        # initial=f'{len(df)} days',
-        # period=f'{horizon//2} days'
-        # horizon=f'{horizon} days',
-    )
-    
-    df_performance = performance_metrics(df_cv)
+        pd.DataFrame: Um DataFrame contendo diversas métricas de erro, com a
+        coluna 'model' indicando o modelo de cada linha.
+    """
+    tasks = cross_validation_tasks(df, model_names)
+
+    with ProcessPoolExecutor() as executor:
+        results = executor.map(forecast_cutoff, *zip(*[(df, cutoff, name) for name, cutoff in tasks]))
+        df_cv = pd.concat(results, ignore_index=True)
+
+    df_performance = summarize_cross_validation(df_cv)
     
     return df_performance
@@ -0,0 +1,70 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+
+# Bits do hash que escolhem o registrador: cada sketch tem 2^14 = 16384
+# registradores
+PRECISION = 14
+REGISTERS = 1 << PRECISION
+# Bits restantes do hash de 64 bits, de onde sai o valor de cada registrador
+RANK_BITS = 64 - PRECISION
+# Erro padrão relativo da estimativa, 1,04 / sqrt(REGISTERS) ≈ 0,81%: cerca
+# de 68% das estimativas ficam a menos de um erro padrão do valor exato e 95%
+# a menos de dois (1,6%). Abaixo de 2,5 x REGISTERS (~41 mil) distintos a
+# estimativa se aproxima da contagem linear, bem mais precisa.
+STANDARD_ERROR = 1.04 / math.sqrt(REGISTERS)
+
+# Constante do estimador para muitos registradores, 1 / (2 ln 2)
+_ALPHA_INF = 1 / (2 * math.log(2))
+
+
+def _sigma(x: float) -> float:
+    if x == 1.0:
+        return math.inf
+    y, z = 1.0, x
+    while True:
+        x *= x
+        previous, z = z, z + x * y
+        y += y
+        if z == previous:
+            return z
+
+
+def _tau(x: float) -> float:
+    if x == 0.0 or x == 1.0:
+        return 0.0
+    y, z = 1.0, 1.0 - x
+    while True:
+        x = math.sqrt(x)
+        y *= 0.5
+        previous, z = z, z - (1 - x) ** 2 * y
+        if z == previous:
+            return z / 3
+
+
+def estimate(rank_counts: pd.Series) -> float:
+    """
+    Estima a quantidade de valores distintos de um sketch HyperLogLog.
+
+    O sketch é descrito pelo histograma dos registradores: `rank_counts` é
+    indexado pelo valor do registrador (posição do primeiro bit 1 nos
+    RANK_BITS bits do hash, de 1 a RANK_BITS + 1) e guarda quantos
+    registradores têm esse valor; os que faltam para REGISTERS valem zero.
+    Como unir sketches é tomar o máximo de cada registrador, o histograma de
+    qualquer união de dias e fatias sai de um GROUP BY no banco.
+
+    Usa o estimador de Ertl ("New cardinality estimation algorithms for
+    HyperLogLog sketches", 2017), que parte do mesmo histograma e não tem o
+    viés do estimador original entre a contagem linear e o regime assintótico.
+    """
+    counts = np.zeros(RANK_BITS + 2, dtype=np.float64)
+    counts[rank_counts.index.to_numpy(dtype=np.int64)] = rank_counts.to_numpy(dtype=np.float64)
+    counts[0] = REGISTERS - counts[1:].sum()
+
+    z = REGISTERS * _tau(1 - counts[RANK_BITS + 1] / REGISTERS)
+    for rank in range(RANK_BITS, 0, -1):
+        z = 0.5 * (z + counts[rank])
+    z += REGISTERS * _sigma(counts[0] / REGISTERS)
+    return _ALPHA_INF * REGISTERS * REGISTERS / z
@@ -0,0 +1,133 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+import pandas as pd
+
+
+# Exibe a barra lateral de diagnóstico em todas as sessões (também é possível
+# abri-la só para uma sessão com ?debug=1 na URL)
+DEBUG_SIDEBAR = os.environ.get("DASHBOARD_DEBUG", "0") == "1"
+# Queries (fora do cache) mais lentas que isso, em segundos, vão para o log de queries lentas
+SLOW_QUERY_SECONDS = float(os.environ.get("DASHBOARD_SLOW_QUERY_SECONDS", "1.0"))
+# Nível do log estruturado: INFO registra todos os eventos; WARNING, só as queries lentas
+LOG_LEVEL = os.environ.get("DASHBOARD_LOG_LEVEL", "WARNING")
+# Quantos eventos recentes ficam em memória para a barra lateral
+MAX_EVENTS = 1000
+# Quantas queries lentas ficam em memória
+MAX_SLOW_QUERIES = 100
+
+# Um evento por linha, em JSON, na saída de erro do processo
+logger = logging.getLogger("dashboard.instrumentation")
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+
+# Eventos compartilhados por todas as sessões do processo
+_events: deque[dict] = deque(maxlen=MAX_EVENTS)
+_slow_queries: deque[dict] = deque(maxlen=MAX_SLOW_QUERIES)
+_lock = threading.Lock()
+
+
+def record(kind: str, name: str, seconds: float, **fields) -> dict:
+    """
+    Registra um evento medido (`kind`: 'query', 'component', 'prophet_fit'...)
+    e o escreve no log estruturado. Queries que foram ao banco e levaram
+    SLOW_QUERY_SECONDS ou mais também entram no log de queries lentas.
+    """
+    event = {"ts": time.time(), "kind": kind, "name": name, "ms": round(seconds * 1000, 3), **fields}
+    slow = kind == "query" and fields.get("cache") != "hit" and seconds >= SLOW_QUERY_SECONDS
+
+    with _lock:
+        _events.append(event)
+        if slow:
+            _slow_queries.append(event)
+
+    if slow:
+        logger.warning(json.dumps({"event": "slow_query", **event}, default=str))
+    else:
+        logger.info(json.dumps({"event": kind, **event}, default=str))
+    return event
+
+
+@contextmanager
+def timed(kind: str, name: str, **fields):
+    """
+    Mede o tempo do bloco e registra o evento ao final, mesmo com erro. O
+    bloco recebe o dicionário `fields` e pode completá-lo (linhas, bytes...).
+    """
+    start = time.perf_counter()
+    try:
+        yield fields
+    except Exception as e:
+        fields.setdefault("error", f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        record(kind, name, time.perf_counter() - start, **fields)
+
+
+def instrument(kind: str, name: str | None = None):
+    """
+    Decorator que mede cada chamada da função com `timed`.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed(kind, name or fn.__name__):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def get_events(kind: str | None = None) -> list[dict]:
+    with _lock:
+        return [event for event in _events if kind is None or event["kind"] == kind]
+
+
+def get_slow_queries() -> list[dict]:
+    with _lock:
+        return list(_slow_queries)
+
+
+def summarize(kind: str) -> pd.DataFrame:
+    """
+    Resume os eventos de um tipo por nome: chamadas e tempos (média, p95,
+    máximo e total, em ms) e, quando medidos, acertos do cache e as linhas e
+    bytes da última chamada. Ordenado pelo tempo total.
+    """
+    events = get_events(kind)
+    if not events:
+        return pd.DataFrame()
+
+    df = pd.DataFrame(events)
+    grouped = df.groupby("name")
+    summary = grouped["ms"].agg(
+        chamadas="count",
+        media_ms="mean",
+        p95_ms=lambda ms: ms.quantile(0.95),
+        max_ms="max",
+        total_ms="sum",
+    )
+    if "cache" in df:
+        summary["hits"] = (df["cache"] == "hit").groupby(df["name"]).sum()
+        summary["misses"] = (df["cache"] == "miss").groupby(df["name"]).sum()
+    for column in ("rows", "bytes", "backend"):
+        if column in df:
+            summary[column] = grouped[column].last()
+    if "error" in df:
+        summary["erros"] = grouped["error"].count()
+    return summary.sort_values("total_ms", ascending=False)
+
+
+def clear() -> None:
+    with _lock:
+        _events.clear()
+        _slow_queries.clear()
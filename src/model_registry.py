@@ -0,0 +1,193 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pandas as pd
+
+if TYPE_CHECKING:
+    from prophet import Prophet
+
+
+def data_fingerprint(df: pd.DataFrame) -> str:
+    """
+    Hash do conteúdo das colunas 'ds' e 'y' usadas no treino.
+    """
+    hashed = pd.util.hash_pandas_object(df[['ds', 'y']], index=False).values
+    return hashlib.sha256(hashed.tobytes()).hexdigest()
+
+
+def params_fingerprint(params: dict) -> str:
+    return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def warm_start_params(model: "Prophet") -> dict:
+    """
+    Extrai os parâmetros ajustados de um modelo para inicializar um novo fit
+    (receita da documentação do Prophet para "warm start").
+    """
+    params = {}
+    for name in ['k', 'm', 'sigma_obs']:
+        if model.mcmc_samples == 0:
+            params[name] = model.params[name][0][0]
+        else:
+            params[name] = np.mean(model.params[name])
+    for name in ['delta', 'beta']:
+        if model.mcmc_samples == 0:
+            params[name] = model.params[name][0]
+        else:
+            params[name] = np.mean(model.params[name], axis=0)
+    return params
+
+
+class ModelRegistry:
+    """
+    Registro em disco dos modelos Prophet treinados e das suas previsões.
+
+    Cada entrada é indexada pelo fingerprint dos dados de treino e dos
+    hiperparâmetros e guarda o modelo serializado (JSON), a maior previsão já
+    calculada com ele e metadados do treino. As entradas menos usadas são
+    removidas quando o registro passa de `max_entries`. Os últimos modelos
+    lidos também ficam em memória, para não desserializar a cada rerun.
+    """
+
+    def __init__(self, root_dir: str, max_entries: int, memory_entries: int = 4):
+        self.root_dir = root_dir
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self._models: OrderedDict[str, "Prophet"] = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(root_dir, exist_ok=True)
+
+    def key(self, df: pd.DataFrame, params: dict) -> str:
+        return hashlib.sha256(f"{data_fingerprint(df)}:{params_fingerprint(params)}".encode()).hexdigest()[:32]
+
+    def _path(self, key: str, filename: str = "") -> str:
+        return os.path.join(self.root_dir, key, filename)
+
+    def _write(self, path: str, write) -> None:
+        # Escreve num arquivo temporário e troca de uma vez, para que leitores
+        # concorrentes nunca vejam um arquivo pela metade
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        write(tmp_path)
+        os.replace(tmp_path, path)
+
+    def _write_text(self, path: str, text: str) -> None:
+        def write(tmp_path):
+            with open(tmp_path, "w") as f:
+                f.write(text)
+        self._write(path, write)
+
+    def _write_metadata(self, key: str, metadata: dict) -> None:
+        self._write_text(self._path(key, "metadata.json"), json.dumps(metadata))
+
+    def _read_metadata(self, key: str) -> dict | None:
+        try:
+            with open(self._path(key, "metadata.json")) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _touch(self, key: str) -> None:
+        metadata = self._read_metadata(key)
+        if metadata is not None:
+            metadata["last_used"] = time.time()
+            self._write_metadata(key, metadata)
+
+    def load_model(self, key: str) -> "Prophet | None":
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key]
+        from prophet.serialize import model_from_json
+
+        try:
+            with open(self._path(key, "model.json")) as f:
+                model = model_from_json(f.read())
+        except FileNotFoundError:
+            return None
+        self._touch(key)
+        self._remember(key, model)
+        return model
+
+    def save_model(self, key: str, model: "Prophet", df: pd.DataFrame, params: dict) -> None:
+        from prophet.serialize import model_to_json
+
+        os.makedirs(self._path(key), exist_ok=True)
+        self._write_text(self._path(key, "model.json"), model_to_json(model))
+        metadata = {
+            "params": params_fingerprint(params),
+            "train_start": str(pd.to_datetime(df['ds']).min().date()),
+            "train_end": str(pd.to_datetime(df['ds']).max().date()),
+            "rows": len(df),
+            "created": time.time(),
+            "last_used": time.time(),
+        }
+        self._write_metadata(key, metadata)
+        self._remember(key, model)
+        self._evict()
+
+    def load_forecast(self, key: str, periods: int) -> pd.DataFrame | None:
+        """
+        Retorna a previsão de `periods` dias, recortada de uma previsão maior
+        já calculada com o mesmo modelo, se houver.
+        """
+        metadata = self._read_metadata(key)
+        if metadata is None or metadata.get("forecast_periods", -1) < periods:
+            return None
+        try:
+            forecast = pd.read_pickle(self._path(key, "forecast.pkl"))
+        except FileNotFoundError:
+            return None
+        return forecast.iloc[:metadata["rows"] + periods].copy()
+
+    def save_forecast(self, key: str, periods: int, forecast: pd.DataFrame) -> None:
+        metadata = self._read_metadata(key)
+        if metadata is None or metadata.get("forecast_periods", -1) >= periods:
+            return
+        self._write(self._path(key, "forecast.pkl"), forecast.to_pickle)
+        metadata["forecast_periods"] = periods
+        self._write_metadata(key, metadata)
+
+    def nearest_model(self, df: pd.DataFrame, params: dict) -> "Prophet | None":
+        """
+        Modelo já treinado com os mesmos hiperparâmetros cujo período de treino
+        é o mais próximo do de `df`, para servir de ponto de partida do fit.
+        """
+        target = params_fingerprint(params)
+        start = pd.to_datetime(df['ds']).min()
+        end = pd.to_datetime(df['ds']).max()
+
+        best_key, best_distance = None, None
+        for key in self._keys():
+            metadata = self._read_metadata(key)
+            if metadata is None or metadata["params"] != target:
+                continue
+            distance = (abs((pd.Timestamp(metadata["train_start"]) - start).days)
+                        + abs((pd.Timestamp(metadata["train_end"]) - end).days))
+            if best_distance is None or distance < best_distance:
+                best_key, best_distance = key, distance
+        return self.load_model(best_key) if best_key else None
+
+    def _keys(self) -> list[str]:
+        return [name for name in os.listdir(self.root_dir) if os.path.isdir(self._path(name))]
+
+    def _remember(self, key: str, model: "Prophet") -> None:
+        with self._lock:
+            self._models[key] = model
+            self._models.move_to_end(key)
+            while len(self._models) > self.memory_entries:
+                self._models.popitem(last=False)
+
+    def _evict(self) -> None:
+        keys = self._keys()
+        last_used = sorted(((self._read_metadata(key) or {}).get("last_used", 0), key) for key in keys)
+        for _, key in last_used[:max(len(keys) - self.max_entries, 0)]:
+            shutil.rmtree(self._path(key), ignore_errors=True)
+            with self._lock:
+                self._models.pop(key, None)
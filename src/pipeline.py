@@ -1,9 +1,19 @@
+import hashlib
+import io
 import os
+import json
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import pandas as pd
 from sqlalchemy import create_engine, text
 from sqlalchemy.engine import Engine
 from dotenv import load_dotenv
 
+import hll
+
 # --- 1. CONFIGURAÇÕES GLOBAIS ---
 
 # Carregando variáveis de ambiente do arquivo .env
@@ -22,11 +32,116 @@ if not DB_PASSWORD:
 
 DATA_PATH = "data/"
 
+# Modo de carga da etapa de staging: 'copy' (COPY FROM STDIN) ou 'insert' (DataFrame.to_sql)
+LOAD_MODE = os.environ.get("PIPELINE_LOAD_MODE", "copy")
+# Quantidade de linhas do CSV lidas e enviadas ao banco por vez no modo 'copy'
+LOAD_CHUNK_SIZE = int(os.environ.get("PIPELINE_CHUNK_SIZE", "100000"))
+# Quantos arquivos são carregados ao mesmo tempo; como cada carga lê o CSV em
+# blocos, o pico de memória fica em torno de LOAD_WORKERS x LOAD_CHUNK_SIZE linhas
+LOAD_WORKERS = int(os.environ.get("PIPELINE_LOAD_WORKERS", "4"))
+
+# 'full' recria todas as tabelas; 'incremental' carrega apenas os arquivos
+# alterados e mescla os pedidos novos nas tabelas existentes
+PIPELINE_MODE = os.environ.get("PIPELINE_MODE", "full")
+# Quantos dias antes da marca d'água a carga incremental volta a ler
+INCREMENTAL_LOOKBACK_DAYS = int(os.environ.get("PIPELINE_LOOKBACK_DAYS", "30"))
+# Se a etapa de tuning da carga completa mede as queries do dashboard com
+# EXPLAIN ANALYZE antes e depois
+TUNING_EXPLAIN = os.environ.get("PIPELINE_TUNING_EXPLAIN", "1") == "1"
+# Diretório onde as tabelas de análise são exportadas em formato colunar para o
+# backend DuckDB do dashboard (vazio desativa a exportação)
+EXPORT_PATH = os.environ.get("PIPELINE_EXPORT_PATH", "data/parquet/")
+# 'parquet' (comprimido com zstd) ou 'arrow' (Arrow IPC sem compressão, lido
+# pelo dashboard por memory-map e sem cópias)
+EXPORT_FORMAT = os.environ.get("PIPELINE_EXPORT_FORMAT", "parquet")
+# Linhas lidas do PostgreSQL por vez na exportação (e tamanho máximo dos row groups)
+EXPORT_CHUNK_SIZE = int(os.environ.get("PIPELINE_EXPORT_CHUNK_SIZE", "100000"))
+# Conexão com o Snowflake, backend padrão do dashboard: com SNOWFLAKE_ACCOUNT
+# definido, o pipeline publica lá as tabelas de análise
+SNOWFLAKE_PARAMETERS = {
+    key: os.environ.get(f"SNOWFLAKE_{key.upper()}")
+    for key in ("account", "user", "password", "role", "warehouse", "database", "schema")
+}
+# Linhas lidas do PostgreSQL e enviadas ao Snowflake por vez na publicação
+SNOWFLAKE_CHUNK_SIZE = int(os.environ.get("PIPELINE_SNOWFLAKE_CHUNK_SIZE", "500000"))
+
+FILES_TO_LOAD = {
+    'olist_orders_dataset.csv': 'orders',
+    'olist_order_items_dataset.csv': 'order_items',
+    'olist_customers_dataset.csv': 'customers',
+    'olist_products_dataset.csv': 'products',
+    'olist_order_payments_dataset.csv': 'order_payments',
+    'olist_order_reviews_dataset.csv': 'order_reviews',
+    'product_category_name_translation.csv': 'category_name_translation'
+}
+
+# Tipos explícitos de cada coluna das tabelas de staging (modo 'copy')
+RAW_TABLE_SCHEMAS = {
+    'orders': {
+        'order_id': 'TEXT',
+        'customer_id': 'TEXT',
+        'order_status': 'TEXT',
+        'order_purchase_timestamp': 'TIMESTAMP',
+        'order_approved_at': 'TIMESTAMP',
+        'order_delivered_carrier_date': 'TIMESTAMP',
+        'order_delivered_customer_date': 'TIMESTAMP',
+        'order_estimated_delivery_date': 'TIMESTAMP',
+    },
+    'order_items': {
+        'order_id': 'TEXT',
+        'order_item_id': 'INTEGER',
+        'product_id': 'TEXT',
+        'seller_id': 'TEXT',
+        'shipping_limit_date': 'TIMESTAMP',
+        'price': 'NUMERIC(12, 2)',
+        'freight_value': 'NUMERIC(12, 2)',
+    },
+    'customers': {
+        'customer_id': 'TEXT',
+        'customer_unique_id': 'TEXT',
+        'customer_zip_code_prefix': 'TEXT',
+        'customer_city': 'TEXT',
+        'customer_state': 'CHAR(2)',
+    },
+    'products': {
+        'product_id': 'TEXT',
+        'product_category_name': 'TEXT',
+        'product_name_lenght': 'INTEGER',
+        'product_description_lenght': 'INTEGER',
+        'product_photos_qty': 'INTEGER',
+        'product_weight_g': 'INTEGER',
+        'product_length_cm': 'INTEGER',
+        'product_height_cm': 'INTEGER',
+        'product_width_cm': 'INTEGER',
+    },
+    'order_payments': {
+        'order_id': 'TEXT',
+        'payment_sequential': 'INTEGER',
+        'payment_type': 'TEXT',
+        'payment_installments': 'INTEGER',
+        'payment_value': 'NUMERIC(12, 2)',
+    },
+    'order_reviews': {
+        'review_id': 'TEXT',
+        'order_id': 'TEXT',
+        'review_score': 'SMALLINT',
+        'review_comment_title': 'TEXT',
+        'review_comment_message': 'TEXT',
+        'review_creation_date': 'TIMESTAMP',
+        'review_answer_timestamp': 'TIMESTAMP',
+    },
+    'category_name_translation': {
+        'product_category_name': 'TEXT',
+        'product_category_name_english': 'TEXT',
+    },
+}
+
 
 def create_db_engine(user, password, host, port, db_name) -> Engine | None:
     try:
         connection_str = f"postgresql://{user}:{password}@{host}:{port}/{db_name}"
-        engine = create_engine(connection_str)
+        # Uma conexão por worker de carga, além das usadas pelas outras etapas
+        engine = create_engine(connection_str, pool_size=max(5, LOAD_WORKERS))
         print("Conexão com o PostgreSQL bem-sucedida!")
         return engine
     except Exception as e:
@@ -34,72 +149,1026 @@ def create_db_engine(user, password, host, port, db_name) -> Engine | None:
         return None
 
 
-def load_raw_data(engine: Engine, data_path: str) -> None:
-    files_to_load = {
-        'olist_orders_dataset.csv': 'orders',
-        'olist_order_items_dataset.csv': 'order_items',
-        'olist_customers_dataset.csv': 'customers',
-        'olist_products_dataset.csv': 'products',
-        'olist_order_payments_dataset.csv': 'order_payments',
-        'olist_order_reviews_dataset.csv': 'order_reviews',
-        'product_category_name_translation.csv': 'category_name_translation'
-    }
+def _load_table_insert(engine: Engine, file_path: str, tablename: str) -> int:
+    rows = 0
+    for chunk in pd.read_csv(file_path, chunksize=LOAD_CHUNK_SIZE):
+        # O primeiro bloco recria a tabela; os demais são acrescentados
+        chunk.to_sql(tablename, engine, if_exists='replace' if rows == 0 else 'append', index=False)
+        rows += len(chunk)
+    return rows
 
-    print("\nIniciando carregamento dos dados brutos (Etapa de Staging)...")
 
-    for filename, tablename in files_to_load.items():
-        try:
-            file_path = os.path.join(data_path, filename)
-            df = pd.read_csv(file_path)
-            df.to_sql(tablename, engine, if_exists='replace', index=False)
-            print(f"  - Tabela '{tablename}' carregada com {len(df)} linhas.")
-        except FileNotFoundError:
-            print(f"  - ERRO: Arquivo '{filename}' não encontrado. Pulando.")
-        except Exception as e:
-            print(f"  - ERRO ao carregar a tabela '{tablename}': {e}")
+def _load_table_copy(engine: Engine, file_path: str, tablename: str) -> int:
+    """
+    Recria a tabela de staging com os tipos de RAW_TABLE_SCHEMAS e envia o CSV
+    via COPY FROM STDIN, em blocos de LOAD_CHUNK_SIZE linhas, para que a
+    memória usada não dependa do tamanho do arquivo.
+    """
+    schema = RAW_TABLE_SCHEMAS[tablename]
+    columns = list(schema)
+    column_defs = ", ".join(f"{column} {sql_type}" for column, sql_type in schema.items())
+    copy_sql = f"COPY {tablename} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+
+    rows = 0
+    raw_connection = engine.raw_connection()
+    try:
+        with raw_connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {tablename}; CREATE TABLE {tablename} ({column_defs});")
+
+            # Lendo tudo como texto, o valor chega ao banco exatamente como está no
+            # arquivo e é convertido pelos tipos da tabela; vazios viram NULL
+            chunks = pd.read_csv(file_path, dtype=str, keep_default_na=False, chunksize=LOAD_CHUNK_SIZE)
+            for chunk in chunks:
+                buffer = io.StringIO()
+                chunk[columns].to_csv(buffer, index=False, header=False)
+                buffer.seek(0)
+                cursor.copy_expert(copy_sql, buffer)
+                rows += len(chunk)
+        raw_connection.commit()
+    except Exception:
+        raw_connection.rollback()
+        raise
+    finally:
+        raw_connection.close()
+    return rows
+
+
+def _file_checksum(file_path: str) -> str:
+    digest = hashlib.md5()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_file_manifest(engine: Engine) -> dict[str, tuple[str, float]]:
+    """
+    Retorna, para cada arquivo já carregado, o checksum e o mtime registrados
+    na última execução bem-sucedida do pipeline.
+    """
+    try:
+        df = pd.read_sql("SELECT filename, checksum, mtime FROM pipeline_file_manifest", engine)
+    except Exception:
+        return {}
+    return {row.filename: (row.checksum, row.mtime) for row in df.itertuples()}
+
+
+def record_file_manifest(engine: Engine, fingerprints: dict[str, tuple[str, float]]) -> None:
+    """
+    Registra o checksum e o mtime dos arquivos carregados, para que a próxima
+    carga incremental saiba quais arquivos mudaram.
+    """
+    if not fingerprints:
+        return
+    with engine.connect() as connection:
+        connection.execute(text("""
+        CREATE TABLE IF NOT EXISTS pipeline_file_manifest (
+            filename TEXT PRIMARY KEY,
+            checksum TEXT NOT NULL,
+            mtime DOUBLE PRECISION NOT NULL,
+            loaded_at TIMESTAMP NOT NULL
+        );
+        """))
+        for filename, (checksum, mtime) in fingerprints.items():
+            connection.execute(text("""
+            INSERT INTO pipeline_file_manifest (filename, checksum, mtime, loaded_at)
+            VALUES (:filename, :checksum, :mtime, NOW())
+            ON CONFLICT (filename) DO UPDATE
+            SET checksum = EXCLUDED.checksum, mtime = EXCLUDED.mtime, loaded_at = EXCLUDED.loaded_at;
+            """), {"filename": filename, "checksum": checksum, "mtime": mtime})
+        connection.commit()
+
+
+def _file_fingerprint(file_path: str, previous: tuple[str, float] | None) -> tuple[bool, str, float]:
+    """
+    Verifica se o arquivo mudou desde a última carga. O checksum só é
+    recalculado quando o mtime é diferente do registrado.
+    """
+    mtime = os.path.getmtime(file_path)
+    if previous is not None and previous[1] == mtime:
+        return False, previous[0], mtime
+    checksum = _file_checksum(file_path)
+    changed = previous is None or previous[0] != checksum
+    return changed, checksum, mtime
+
+
+_print_lock = threading.Lock()
+
+
+def _log(message: str) -> None:
+    # Evita que as mensagens dos workers de carga se misturem na mesma linha
+    with _print_lock:
+        print(message)
+
+
+def _load_file(engine: Engine, data_path: str, filename: str, tablename: str, load_table,
+               previous: tuple[str, float] | None, incremental: bool) -> tuple[str, float] | None:
+    """
+    Carrega um arquivo na sua tabela de staging. Retorna o checksum e o mtime
+    do arquivo carregado, ou None se ele foi pulado ou falhou.
+    """
+    try:
+        file_path = os.path.join(data_path, filename)
+        changed, checksum, mtime = _file_fingerprint(file_path, previous)
+        if incremental and not changed:
+            _log(f"  - Arquivo '{filename}' sem alterações. Pulando.")
+            return None
+
+        started_at = time.perf_counter()
+        rows = load_table(engine, file_path, tablename)
+        elapsed = time.perf_counter() - started_at
+        rows_per_second = rows / elapsed if elapsed > 0 else float("inf")
+        _log(f"  - Tabela '{tablename}' carregada com {rows} linhas em {elapsed:.2f}s ({rows_per_second:,.0f} linhas/s).")
+        return checksum, mtime
+    except FileNotFoundError:
+        _log(f"  - ERRO: Arquivo '{filename}' não encontrado. Pulando.")
+    except Exception as e:
+        _log(f"  - ERRO ao carregar a tabela '{tablename}': {e}")
+    return None
+
+
+def load_raw_data(engine: Engine, data_path: str, mode: str = LOAD_MODE, incremental: bool = False,
+                  max_workers: int = LOAD_WORKERS) -> dict[str, tuple[str, float]]:
+    """
+    Carrega os CSVs nas tabelas de staging, até `max_workers` arquivos ao
+    mesmo tempo, e só retorna quando todas as cargas terminaram. No modo
+    incremental, os arquivos cujo conteúdo não mudou desde a última carga
+    são ignorados.
+
+    Returns:
+        dict: O checksum e o mtime de cada arquivo carregado, para ser
+        registrado com `record_file_manifest` após a transformação.
+    """
+    load_table = _load_table_copy if mode == 'copy' else _load_table_insert
+    manifest = read_file_manifest(engine) if incremental else {}
+    loaded = {}
+
+    print(f"\nIniciando carregamento dos dados brutos (Etapa de Staging, modo '{mode}', {max_workers} workers)...")
+
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="staging") as executor:
+        futures = {
+            executor.submit(_load_file, engine, data_path, filename, tablename, load_table,
+                            manifest.get(filename), incremental): filename
+            for filename, tablename in FILES_TO_LOAD.items()
+        }
+        for future in as_completed(futures):
+            fingerprint = future.result()
+            if fingerprint is not None:
+                loaded[futures[future]] = fingerprint
+
+    print(f"Staging concluído em {time.perf_counter() - started_at:.2f}s.")
+    return loaded
+
 
+# --- Star schema da camada analítica ---
+# Cada tabela fica na sua granularidade natural: o pedido, o item do pedido e o
+# pagamento, com clientes e produtos como dimensões. Assim nenhuma junção
+# multiplica linhas e as métricas não precisam de COUNT(DISTINCT ...).
 
-def transform_data(engine: Engine) -> None:
-    create_analytics_table_query = """
-    DROP TABLE IF EXISTS analytics_orders;
-    CREATE TABLE analytics_orders AS
+DIMENSION_TABLES = {
+    'dim_customers': {
+        'keys': ['customer_id'],
+        'select': """
+        SELECT
+            customer_id,
+            customer_unique_id,
+            customer_city,
+            customer_state
+        FROM
+            customers
+        """,
+    },
+    'dim_products': {
+        'keys': ['product_id'],
+        'select': """
+        SELECT
+            p.product_id,
+            p.product_category_name,
+            cat.product_category_name_english AS product_category
+        FROM
+            products p
+        LEFT JOIN category_name_translation cat ON p.product_category_name = cat.product_category_name
+        """,
+    },
+}
+
+# Pedidos entregues, com cliente e pelo menos um item (o escopo da análise)
+DELIVERED_ORDERS = """(
+    SELECT o.*
+    FROM orders o
+    WHERE
+        o.order_status = 'delivered' AND
+        EXISTS (SELECT 1 FROM customers c WHERE c.customer_id = o.customer_id) AND
+        EXISTS (SELECT 1 FROM order_items oi WHERE oi.order_id = o.order_id)
+)"""
+
+# Os SELECTs das tabelas de fatos partem de {orders}: todos os pedidos entregues
+# na carga completa, ou apenas os pedidos alterados na carga incremental
+FACT_TABLES = {
+    'fact_orders': {
+        'keys': ['order_id'],
+        'select': """
+        SELECT
+            o.order_id,
+            o.customer_id,
+            o.order_status,
+            o.order_purchase_timestamp,
+            o.order_delivered_customer_date,
+            r.review_score
+        FROM
+            {orders} o
+        LEFT JOIN (
+            -- Alguns pedidos têm mais de uma avaliação; vale a mais recente
+            SELECT DISTINCT ON (order_id) order_id, review_score
+            FROM order_reviews
+            ORDER BY order_id, review_answer_timestamp DESC
+        ) r ON o.order_id = r.order_id
+        """,
+    },
+    'fact_order_items': {
+        'keys': ['order_id', 'order_item_id'],
+        'select': """
+        SELECT
+            oi.order_id,
+            oi.order_item_id,
+            oi.product_id,
+            o.customer_id,
+            o.order_purchase_timestamp,
+            oi.price,
+            oi.freight_value
+        FROM
+            {orders} o
+        JOIN order_items oi ON o.order_id = oi.order_id
+        """,
+    },
+    'fact_order_payments': {
+        'keys': ['order_id', 'payment_sequential'],
+        'select': """
+        SELECT
+            op.order_id,
+            op.payment_sequential,
+            o.customer_id,
+            o.order_purchase_timestamp,
+            op.payment_type,
+            op.payment_installments,
+            op.payment_value
+        FROM
+            {orders} o
+        JOIN order_payments op ON o.order_id = op.order_id
+        """,
+    },
+}
+
+# Nome de cada tabela de fatos nos templates dos rollups
+FACT_SOURCES = {
+    'orders': 'fact_orders',
+    'items': 'fact_order_items',
+    'payments': 'fact_order_payments',
+}
+
+
+def _fact_sources(suffix: str = "") -> dict[str, str]:
+    return {placeholder: f"{tablename}{suffix}" for placeholder, tablename in FACT_SOURCES.items()}
+
+
+def transform_data(engine: Engine) -> bool:
+    """
+    Cria o star schema (dimensões e tabelas de fatos) a partir do staging.
+    """
+    statements = [
+        # A antiga tabela larga foi substituída pelo star schema
+        "DROP TABLE IF EXISTS analytics_orders;"
+    ]
+    for tablename, table in {**DIMENSION_TABLES, **FACT_TABLES}.items():
+        select_query = table['select'].format(orders=DELIVERED_ORDERS)
+        statements.append(f"""
+        DROP TABLE IF EXISTS {tablename};
+        CREATE TABLE {tablename} AS {select_query};
+        ALTER TABLE {tablename} ADD PRIMARY KEY ({", ".join(table['keys'])});
+        """)
+
+    print("\nIniciando transformação dos dados (Criando o Star Schema)...")
+    try:
+        with engine.connect() as connection:
+            for statement in statements:
+                connection.execute(text(statement))
+            connection.commit()
+        print(f"Tabelas {', '.join({**DIMENSION_TABLES, **FACT_TABLES})} criadas com sucesso!")
+        return True
+    except Exception as e:
+        print(f"ERRO ao criar as tabelas de análise: {e}")
+        return False
+
+
+# Cada rollup é definido pelas colunas-chave, pelas medidas (somas) e pelo SELECT
+# que o agrega a partir das tabelas de fatos ({orders}, {items}, {payments}).
+# A mesma definição cria o rollup completo e calcula os deltas da carga incremental.
+# A última medida é uma contagem: chaves cuja contagem chega a zero são removidas.
+ROLLUP_DEFINITIONS = {
+    # Receita de itens, faturamento e pedidos por dia de compra
+    'daily_sales': {
+        'keys': ['sale_date'],
+        'measures': ['total_price', 'total_faturamento', 'total_pedidos', 'total_linhas'],
+        'select': """
+        SELECT
+            sale_date,
+            SUM(total_price) AS total_price,
+            SUM(total_faturamento) AS total_faturamento,
+            SUM(total_pedidos) AS total_pedidos,
+            COUNT(*) AS total_linhas
+        FROM (
+            SELECT DATE(order_purchase_timestamp) AS sale_date, price AS total_price, 0 AS total_faturamento, 0 AS total_pedidos
+            FROM {items}
+            UNION ALL
+            SELECT DATE(order_purchase_timestamp), 0, payment_value, 0
+            FROM {payments}
+            UNION ALL
+            SELECT DATE(order_purchase_timestamp), 0, 0, 1
+            FROM {orders}
+        ) vendas
+        WHERE
+            sale_date IS NOT NULL
+        GROUP BY
+            sale_date
+        """,
+    },
+    # Faturamento por cidade, estado e forma de pagamento (pagamentos, num único
+    # GROUP BY com GROUPING SETS) e receita de itens por categoria, já que o
+    # pagamento não é atribuído a um produto. Os valores nulos são mantidos para
+    # que cada dimensão some o faturamento total (no dashboard, vão para "Outros")
+    'sales_by_dimension': {
+        'keys': ['dimension', 'dimension_value'],
+        'measures': ['total_faturamento', 'total_linhas'],
+        'select': """
+        SELECT
+            CASE
+                WHEN GROUPING(c.customer_city) = 0 THEN 'customer_city'
+                WHEN GROUPING(c.customer_state) = 0 THEN 'customer_state'
+                ELSE 'payment_type'
+            END AS dimension,
+            COALESCE(c.customer_city, c.customer_state, f.payment_type) AS dimension_value,
+            SUM(f.payment_value) AS total_faturamento,
+            COUNT(*) AS total_linhas
+        FROM {payments} f LEFT JOIN dim_customers c ON f.customer_id = c.customer_id
+        GROUP BY GROUPING SETS ((c.customer_city), (c.customer_state), (f.payment_type))
+        UNION ALL
+        SELECT 'product_category_name', p.product_category_name, SUM(f.price), COUNT(*)
+        FROM {items} f LEFT JOIN dim_products p ON f.product_id = p.product_id
+        GROUP BY p.product_category_name
+        """,
+    },
+    # Quantidade de pedidos por (nota de avaliação, dias para entrega)
+    'delivery_days_by_review': {
+        'keys': ['review_score', 'dias_para_entrega'],
+        'measures': ['quantidade'],
+        'select': """
+        SELECT
+            review_score,
+            (order_delivered_customer_date::DATE - order_purchase_timestamp::DATE) AS dias_para_entrega,
+            COUNT(*) AS quantidade
+        FROM
+            {orders}
+        WHERE
+            order_delivered_customer_date IS NOT NULL AND
+            order_purchase_timestamp IS NOT NULL
+        GROUP BY
+            review_score,
+            (order_delivered_customer_date::DATE - order_purchase_timestamp::DATE)
+        """,
+    },
+}
+
+
+# Sketches HyperLogLog diários (ver hll.py) dos clientes únicos e dos pedidos,
+# no total ('all') e por estado do cliente. Cada linha é um registrador não
+# vazio do sketch de um (dia, fatia, métrica), com o índice tirado dos
+# PRECISION bits mais altos do hash e o valor igual à posição do primeiro bit 1
+# nos RANK_BITS restantes. Unir sketches é tomar o máximo de cada registrador,
+# então o dashboard estima os distintos de qualquer período ou estado com um
+# GROUP BY nesta tabela, sem COUNT(DISTINCT) nas tabelas de fatos.
+SKETCH_TABLE = 'daily_sketches'
+SKETCH_METRICS = {
+    'customer_unique_id': 'c.customer_unique_id',
+    'order_id': 'o.order_id',
+}
+SKETCH_SELECT = """
+WITH hashes AS (
     SELECT
-        o.order_id,
-        c.customer_unique_id,
-        c.customer_city,
-        c.customer_state,
-        oi.order_item_id,
-        p.product_category_name,
-        cat.product_category_name_english AS product_category,
-        oi.price,
-        oi.freight_value,
-        op.payment_type,
-        op.payment_installments,
-        op.payment_value,
-        r.review_score,
-        o.order_status,
-        o.order_purchase_timestamp,
-        o.order_delivered_customer_date
+        DATE(o.order_purchase_timestamp) AS sketch_date,
+        CAST(c.customer_state AS TEXT) AS customer_state,
+        m.metric,
+        hashtextextended(m.value, 0) AS h
     FROM
-        orders o
-    JOIN order_items oi ON o.order_id = oi.order_id
-    JOIN customers c ON o.customer_id = c.customer_id
-    LEFT JOIN products p ON oi.product_id = p.product_id
-    LEFT JOIN category_name_translation cat ON p.product_category_name = cat.product_category_name
-    LEFT JOIN order_payments op ON o.order_id = op.order_id
-    LEFT JOIN order_reviews r ON o.order_id = r.order_id
-    WHERE 
-        o.order_status = 'delivered';
-    """
-
-    print("\nIniciando transformação dos dados (Criando Tabela de Análise)...")
+        fact_orders o
+    JOIN dim_customers c ON o.customer_id = c.customer_id
+    CROSS JOIN LATERAL (VALUES {metrics}) AS m(metric, value)
+    WHERE
+        o.order_purchase_timestamp IS NOT NULL {days_filter}
+),
+registers AS (
+    SELECT
+        sketch_date,
+        customer_state,
+        metric,
+        (h >> {rank_bits}) & {index_mask} AS register_index,
+        -- Primeiro bit 1 dos bits restantes (RANK_BITS + 1 quando são todos zero)
+        {rank_bits} + 1 - LENGTH(LTRIM(CAST(CAST(h & {rank_mask} AS BIT({rank_bits})) AS TEXT), '0')) AS register_rank
+    FROM
+        hashes
+)
+SELECT
+    sketch_date,
+    CAST('all' AS TEXT) AS dimension,
+    CAST('' AS TEXT) AS dimension_value,
+    metric,
+    CAST(register_index AS SMALLINT) AS register_index,
+    CAST(MAX(register_rank) AS SMALLINT) AS register_rank
+FROM registers
+GROUP BY sketch_date, metric, register_index
+UNION ALL
+SELECT
+    sketch_date,
+    'customer_state',
+    customer_state,
+    metric,
+    CAST(register_index AS SMALLINT),
+    CAST(MAX(register_rank) AS SMALLINT)
+FROM registers
+WHERE customer_state IS NOT NULL
+GROUP BY sketch_date, customer_state, metric, register_index
+"""
+
+
+def _sketch_select(days_table: str | None = None) -> str:
+    # Sketches de todos os dias, ou só dos dias listados em `days_table`
+    days_filter = f"AND DATE(o.order_purchase_timestamp) IN (SELECT sketch_date FROM {days_table})" if days_table else ""
+    return SKETCH_SELECT.format(
+        metrics=", ".join(f"('{metric}', {column})" for metric, column in SKETCH_METRICS.items()),
+        days_filter=days_filter,
+        rank_bits=hll.RANK_BITS,
+        index_mask=hll.REGISTERS - 1,
+        rank_mask=(1 << hll.RANK_BITS) - 1,
+    )
+
+
+def _build_sketches(connection, days_table: str | None = None) -> None:
+    """
+    Recria a tabela de sketches, ou, com `days_table`, só os sketches dos dias
+    listados nela: o máximo dos registradores não admite subtrair as linhas
+    removidas, então um dia alterado tem o sketch recalculado por inteiro.
+    """
+    if days_table is None:
+        connection.execute(text(f"DROP TABLE IF EXISTS {SKETCH_TABLE}; CREATE TABLE {SKETCH_TABLE} AS {_sketch_select()};"))
+    else:
+        connection.execute(text(f"""
+        DELETE FROM {SKETCH_TABLE} WHERE sketch_date IN (SELECT sketch_date FROM {days_table});
+        INSERT INTO {SKETCH_TABLE} {_sketch_select(days_table)};
+        """))
+
+
+def build_rollups(engine: Engine) -> bool:
+    """
+    Materializa as tabelas agregadas (rollups) a partir das tabelas de fatos.
+    As queries do dashboard passam a ler essas tabelas pequenas em vez de
+    agrupar os fatos a cada requisição.
+    """
+    print("\nIniciando criação das tabelas agregadas (Rollups)...")
     try:
         with engine.connect() as connection:
-            connection.execute(text(create_analytics_table_query))
+            for tablename, rollup in ROLLUP_DEFINITIONS.items():
+                select_query = rollup['select'].format(**_fact_sources())
+                connection.execute(text(f"DROP TABLE IF EXISTS {tablename}; CREATE TABLE {tablename} AS {select_query};"))
+                print(f"  - Rollup '{tablename}' criado.")
+            _build_sketches(connection)
+            print(f"  - Sketches HyperLogLog '{SKETCH_TABLE}' criados.")
             connection.commit()
-        print("Tabela 'analytics_orders' criada com sucesso!")
+        return True
     except Exception as e:
-        print(f"ERRO ao criar a tabela de análise: {e}")
+        print(f"ERRO ao criar as tabelas agregadas: {e}")
+        return False
+
+
+def _merge_rollup_delta(connection, tablename: str, rollup: dict) -> None:
+    """
+    Aplica ao rollup a diferença entre as linhas novas (tabelas *_changes) e as
+    linhas que elas substituem (tabelas *_removed): soma o delta nas chaves
+    existentes, insere as chaves novas e remove as que ficaram sem linhas.
+    """
+    keys, measures = rollup['keys'], rollup['measures']
+    key_list = ", ".join(keys)
+    measure_list = ", ".join(measures)
+    delta_sums = ", ".join(f"SUM({m}) AS {m}" for m in measures)
+    negated = ", ".join(f"-{m}" for m in measures)
+    key_match = " AND ".join(f"t.{k} IS NOT DISTINCT FROM d.{k}" for k in keys)
+    updates = ", ".join(f"{m} = t.{m} + d.{m}" for m in measures)
+    count_measure = measures[-1]
+
+    connection.execute(text(f"""
+    DROP TABLE IF EXISTS rollup_delta;
+    CREATE TEMP TABLE rollup_delta AS
+    SELECT {key_list}, {delta_sums}
+    FROM (
+        SELECT {key_list}, {measure_list} FROM ({rollup['select'].format(**_fact_sources('_changes'))}) novos
+        UNION ALL
+        SELECT {key_list}, {negated} FROM ({rollup['select'].format(**_fact_sources('_removed'))}) antigos
+    ) d
+    GROUP BY {key_list};
+
+    UPDATE {tablename} t SET {updates}
+    FROM rollup_delta d
+    WHERE {key_match};
+
+    INSERT INTO {tablename} ({key_list}, {measure_list})
+    SELECT {key_list}, {measure_list} FROM rollup_delta d
+    WHERE NOT EXISTS (SELECT 1 FROM {tablename} t WHERE {key_match});
+
+    DELETE FROM {tablename} WHERE {count_measure} <= 0;
+    """))
+
+
+def _upsert_statement(connection, tablename: str, keys: list[str], source: str) -> str:
+    # INSERT ... ON CONFLICT que atualiza todas as colunas que não são chave
+    columns = list(connection.execute(text(f"SELECT * FROM {tablename} LIMIT 0")).keys())
+    updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in columns if c not in keys)
+    conflict_action = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+    return f"""
+    INSERT INTO {tablename} ({", ".join(columns)})
+    SELECT {", ".join(columns)} FROM {source}
+    ON CONFLICT ({", ".join(keys)}) {conflict_action};
+    """
+
+
+def refresh_analytics_incremental(engine: Engine) -> bool:
+    """
+    Atualiza o star schema e os rollups sem recriá-los.
+
+    As dimensões recebem um upsert completo (são pequenas). Nas tabelas de
+    fatos entram apenas os pedidos comprados depois da marca d'água (maior
+    order_purchase_timestamp já carregado, menos INCREMENTAL_LOOKBACK_DAYS
+    para capturar pedidos entregues depois da última execução): cada linha é
+    inserida ou atualizada pela sua chave natural (order_id + order_item_id,
+    order_id + payment_sequential) e as linhas que sumiram desses pedidos são
+    removidas. A janela considera todos os pedidos do período, qualquer que
+    seja o status, então um pedido que deixou de ser entregue (cancelado
+    depois da entrega, por exemplo) sai dos fatos e dos rollups. Os rollups recebem apenas o delta, e os sketches HyperLogLog
+    são recalculados nos dias de compra desses pedidos. Como tudo é feito com
+    INSERT/UPDATE/DELETE numa única transação, o dashboard continua lendo as
+    tabelas durante a atualização.
+    """
+    print("\nIniciando atualização incremental do star schema...")
+    try:
+        with engine.connect() as connection:
+            watermark = connection.execute(text(
+                "SELECT MAX(order_purchase_timestamp) FROM fact_orders"
+            )).scalar()
+            if watermark is None:
+                connection.rollback()
+                print("  - Tabelas de fatos vazias; executando a carga completa.")
+                return transform_data(engine) and build_rollups(engine)
+
+            since = pd.Timestamp(watermark) - pd.Timedelta(days=INCREMENTAL_LOOKBACK_DAYS)
+
+            # 1. Dimensões: upsert completo a partir do staging
+            for tablename, table in DIMENSION_TABLES.items():
+                connection.execute(text(_upsert_statement(connection, tablename, table['keys'], f"({table['select']}) dim")))
+
+            # 2. Pedidos da janela (no staging ou já nos fatos, com qualquer status),
+            #    os que continuam no escopo, suas novas linhas de fatos e as linhas
+            #    que elas substituem
+            connection.execute(text(f"""
+            DROP TABLE IF EXISTS window_orders;
+            CREATE TEMP TABLE window_orders AS
+            SELECT order_id FROM orders WHERE order_purchase_timestamp > :since
+            UNION
+            SELECT order_id FROM fact_orders WHERE order_purchase_timestamp > :since;
+
+            DROP TABLE IF EXISTS changed_orders;
+            CREATE TEMP TABLE changed_orders AS
+            SELECT * FROM {DELIVERED_ORDERS} o
+            WHERE o.order_id IN (SELECT order_id FROM window_orders);
+            """), {"since": since.to_pydatetime()})
+            for tablename, table in FACT_TABLES.items():
+                connection.execute(text(f"""
+                DROP TABLE IF EXISTS {tablename}_changes;
+                CREATE TEMP TABLE {tablename}_changes AS {table['select'].format(orders='changed_orders')};
+                DROP TABLE IF EXISTS {tablename}_removed;
+                CREATE TEMP TABLE {tablename}_removed AS
+                SELECT * FROM {tablename} WHERE order_id IN (SELECT order_id FROM window_orders);
+                """))
+
+            # 3. Rollups: aplica apenas a diferença
+            for tablename, rollup in ROLLUP_DEFINITIONS.items():
+                _merge_rollup_delta(connection, tablename, rollup)
+
+            # 4. Fatos: remove as linhas que sumiram (inclusive as dos pedidos que
+            #    saíram do escopo) e faz o upsert das novas
+            for tablename, table in FACT_TABLES.items():
+                key_match = " AND ".join(f"c.{k} = f.{k}" for k in table['keys'])
+                connection.execute(text(f"""
+                DELETE FROM {tablename} f
+                WHERE
+                    f.order_id IN (SELECT order_id FROM window_orders) AND
+                    NOT EXISTS (SELECT 1 FROM {tablename}_changes c WHERE {key_match});
+                """))
+                connection.execute(text(_upsert_statement(connection, tablename, table['keys'], f"{tablename}_changes")))
+
+            # 5. Sketches: recalculados nos dias de compra dos pedidos alterados
+            if connection.execute(text("SELECT to_regclass(:tablename)"), {"tablename": SKETCH_TABLE}).scalar() is None:
+                _build_sketches(connection)
+            else:
+                connection.execute(text("""
+                DROP TABLE IF EXISTS changed_days;
+                CREATE TEMP TABLE changed_days AS
+                SELECT DATE(order_purchase_timestamp) AS sketch_date FROM changed_orders
+                UNION
+                SELECT DATE(order_purchase_timestamp) FROM fact_orders_removed;
+                """))
+                _build_sketches(connection, 'changed_days')
+
+            changed_orders = connection.execute(text("SELECT COUNT(*) FROM changed_orders")).scalar()
+            removed_orders = connection.execute(text("""
+                SELECT COUNT(*) FROM fact_orders_removed r
+                WHERE NOT EXISTS (SELECT 1 FROM changed_orders c WHERE c.order_id = r.order_id)
+            """)).scalar()
+            connection.commit()
+
+        print(f"  - {changed_orders} pedidos comprados após {since} mesclados, {removed_orders} removidos.")
+        return True
+    except Exception as e:
+        print(f"ERRO na atualização incremental: {e}")
+        return False
+
+
+# Índices criados pela etapa de tuning: (nome, tabela, colunas)
+TUNING_INDEXES = [
+    # Filtros e agrupamentos por data de compra e de entrega
+    ('idx_fact_orders_purchase', 'fact_orders', 'order_purchase_timestamp'),
+    ('idx_fact_orders_delivered', 'fact_orders', 'order_delivered_customer_date'),
+    ('idx_fact_order_items_purchase', 'fact_order_items', 'order_purchase_timestamp'),
+    ('idx_fact_order_payments_purchase', 'fact_order_payments', 'order_purchase_timestamp'),
+    # Junções com as dimensões
+    ('idx_fact_orders_customer', 'fact_orders', 'customer_id'),
+    ('idx_fact_order_items_product', 'fact_order_items', 'product_id'),
+    ('idx_fact_order_payments_customer', 'fact_order_payments', 'customer_id'),
+    # Colunas usadas como dimensão de análise
+    ('idx_fact_order_payments_payment_type', 'fact_order_payments', 'payment_type'),
+    ('idx_dim_customers_state', 'dim_customers', 'customer_state'),
+    ('idx_dim_customers_city', 'dim_customers', 'customer_city'),
+    ('idx_dim_customers_unique_id', 'dim_customers', 'customer_unique_id'),
+    ('idx_dim_products_category', 'dim_products', 'product_category_name'),
+    # Rollups
+    ('idx_daily_sales_date', 'daily_sales', 'sale_date'),
+    ('idx_sales_by_dimension_top', 'sales_by_dimension', 'dimension, total_faturamento DESC'),
+    ('idx_daily_sketches_slice', SKETCH_TABLE, 'dimension, dimension_value, sketch_date'),
+]
+
+# Tabelas de fatos ordenadas fisicamente pela data de compra (CLUSTER exige um
+# índice B-tree), para que filtros por período leiam blocos contíguos
+CLUSTER_INDEXES = {
+    'fact_orders': 'idx_fact_orders_purchase',
+    'fact_order_items': 'idx_fact_order_items_purchase',
+    'fact_order_payments': 'idx_fact_order_payments_purchase',
+}
+
+
+def collect_dashboard_queries(engine: Engine) -> dict[str, tuple[str, list | None]]:
+    """
+    Monta, no dialeto do PostgreSQL e com os rollups existentes no banco, o
+    SQL de cada query principal do dashboard e seus parâmetros, indexados por
+    um nome legível (ver queries.DASHBOARD_QUERY_BUILDERS). Nada é executado.
+    """
+    import queries  # importado aqui: só esta etapa depende do código do dashboard
+    from backends import PostgresBackend
+
+    df = PostgresBackend(engine).execute(queries.build_available_rollups_query())
+    rollups = set(df['table_name'])
+    return {name: build(rollups, PostgresBackend) for name, build in queries.DASHBOARD_QUERY_BUILDERS.items()}
+
+
+def explain_timings(engine: Engine, dashboard_queries: dict[str, tuple[str, list | None]]) -> dict[str, float]:
+    """
+    Retorna o tempo de execução (ms) de cada query segundo EXPLAIN ANALYZE.
+    """
+    timings = {}
+    with engine.connect() as connection:
+        for name, (query, params) in dashboard_queries.items():
+            # Os marcadores posicionais (?) do dashboard viram parâmetros nomeados
+            bind = {}
+            for i, value in enumerate(params or ()):
+                query = query.replace("?", f":p{i}", 1)
+                bind[f"p{i}"] = value
+            plan = connection.execute(text(f"EXPLAIN (ANALYZE, FORMAT JSON) {query.strip().rstrip(';')}"), bind).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            timings[name] = plan[0]['Execution Time']
+        connection.rollback()
+    return timings
+
+
+def tune_database(engine: Engine, cluster: bool = True, explain: bool = TUNING_EXPLAIN) -> None:
+    """
+    Etapa de tuning físico após a transformação: cria os índices de
+    TUNING_INDEXES, ordena as tabelas de fatos pela data de compra (CLUSTER)
+    e atualiza as estatísticas do planejador (ANALYZE). Com `explain`,
+    imprime o tempo de cada query do dashboard antes e depois.
+
+    O CLUSTER bloqueia a tabela enquanto a reescreve, e o EXPLAIN ANALYZE
+    executa cada query do dashboard duas vezes; por isso a carga incremental
+    chama esta etapa com cluster=False e explain=False.
+    """
+    print("\nIniciando tuning físico das tabelas de análise...")
+
+    dashboard_queries, before = {}, {}
+    if explain:
+        try:
+            dashboard_queries = collect_dashboard_queries(engine)
+            before = explain_timings(engine, dashboard_queries)
+        except Exception as e:
+            print(f"  - Aviso: não foi possível medir as queries do dashboard: {e}")
+
+    try:
+        with engine.connect() as connection:
+            for index_name, tablename, columns in TUNING_INDEXES:
+                connection.execute(text(f"CREATE INDEX IF NOT EXISTS {index_name} ON {tablename} ({columns});"))
+            if cluster:
+                for tablename, index_name in CLUSTER_INDEXES.items():
+                    connection.execute(text(f"CLUSTER {tablename} USING {index_name};"))
+            connection.commit()
+
+        # ANALYZE fora da transação das alterações acima
+        with engine.connect() as connection:
+            tables = {tablename for _, tablename, _ in TUNING_INDEXES}
+            connection.execute(text(f"ANALYZE {', '.join(sorted(tables))};"))
+            connection.commit()
+        print(f"  - {len(TUNING_INDEXES)} índices verificados{', tabelas de fatos ordenadas por data' if cluster else ''} e estatísticas atualizadas.")
+    except Exception as e:
+        print(f"ERRO no tuning das tabelas: {e}")
+        return
+
+    if before:
+        after = explain_timings(engine, dashboard_queries)
+        print(f"  {'query':<40}{'antes (ms)':>12}{'depois (ms)':>14}")
+        for name in dashboard_queries:
+            print(f"  {name:<40}{before[name]:>12.2f}{after[name]:>14.2f}")
+
+
+def bump_data_version(engine: Engine) -> None:
+    """
+    Registra uma nova versão dos dados analíticos na tabela 'data_version'.
+    O dashboard compara essa versão com a do seu cache de queries e descarta
+    os resultados antigos quando ela muda.
+    """
+    bump_version_query = """
+    CREATE TABLE IF NOT EXISTS data_version (
+        version BIGINT NOT NULL,
+        updated_at TIMESTAMP NOT NULL
+    );
+    INSERT INTO data_version (version, updated_at)
+    SELECT COALESCE(MAX(version), 0) + 1, NOW() FROM data_version;
+    """
+
+    try:
+        with engine.connect() as connection:
+            connection.execute(text(bump_version_query))
+            connection.commit()
+        print("Versão dos dados atualizada.")
+    except Exception as e:
+        print(f"ERRO ao atualizar a versão dos dados: {e}")
+
+
+# Tabelas de fatos e rollups particionados por mês de compra na exportação,
+# com a coluna de data usada para calcular a partição
+EXPORT_PARTITIONS = {
+    'fact_orders': 'order_purchase_timestamp',
+    'fact_order_items': 'order_purchase_timestamp',
+    'fact_order_payments': 'order_purchase_timestamp',
+    'daily_sales': 'sale_date',
+    SKETCH_TABLE: 'sketch_date',
+}
+# Coluna de partição no formato Hive (<tabela>/purchase_month=2018-01/)
+EXPORT_PARTITION_COLUMN = 'purchase_month'
+
+# Tipo Arrow de cada tipo de coluna do PostgreSQL; os demais viram texto
+ARROW_TYPES = {
+    'smallint': 'int16',
+    'integer': 'int32',
+    'bigint': 'int64',
+    'numeric': 'double',
+    'real': 'float',
+    'double precision': 'double',
+    'boolean': 'bool',
+    'date': 'date32',
+    'timestamp without time zone': 'timestamp[us]',
+}
+
+EXPORT_EXTENSIONS = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+
+def _arrow_schema(connection, tablename: str, partitioned: bool):
+    # Schema Arrow da tabela a partir do information_schema, para que todos
+    # os blocos exportados tenham os mesmos tipos (mesmo os só com NULLs)
+    import pyarrow as pa
+
+    columns = connection.execute(text("""
+        SELECT column_name, data_type
+        FROM information_schema.columns
+        WHERE table_schema = CURRENT_SCHEMA() AND table_name = :tablename
+        ORDER BY ordinal_position
+    """), {"tablename": tablename}).fetchall()
+    fields = [pa.field(name, pa.type_for_alias(ARROW_TYPES.get(data_type, 'string'))) for name, data_type in columns]
+    if partitioned:
+        fields.append(pa.field(EXPORT_PARTITION_COLUMN, pa.string()))
+    return pa.schema(fields)
+
+
+def _export_table(engine: Engine, tablename: str, target_dir: str, export_format: str) -> None:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    date_column = EXPORT_PARTITIONS.get(tablename)
+    if export_format == 'parquet':
+        file_format = ds.ParquetFileFormat()
+        file_options = file_format.make_write_options(compression='zstd', write_statistics=True)
+    else:
+        file_format = ds.IpcFileFormat()
+        file_options = file_format.make_write_options(compression=None)
+
+    query = f"SELECT * FROM {tablename}"
+    if date_column:
+        # Ordenar pela data deixa cada row group com um intervalo estreito de
+        # datas, o que torna as estatísticas de mínimo/máximo seletivas
+        query = f"""
+        SELECT *, TO_CHAR({date_column}, 'YYYY-MM') AS {EXPORT_PARTITION_COLUMN}
+        FROM {tablename}
+        ORDER BY {date_column}
+        """
+
+    os.makedirs(target_dir)
+    with engine.connect() as connection:
+        schema = _arrow_schema(connection, tablename, partitioned=bool(date_column))
+        # stream_results usa um cursor no servidor: só um bloco fica em memória
+        chunks = pd.read_sql_query(text(query), connection.execution_options(stream_results=True),
+                                   chunksize=EXPORT_CHUNK_SIZE)
+        ds.write_dataset(
+            (pa.RecordBatch.from_pandas(chunk, schema=schema, preserve_index=False) for chunk in chunks),
+            target_dir,
+            schema=schema,
+            format=file_format,
+            file_options=file_options,
+            partitioning=[EXPORT_PARTITION_COLUMN] if date_column else None,
+            partitioning_flavor='hive' if date_column else None,
+            basename_template=f"part-{{i}}{EXPORT_EXTENSIONS[export_format]}",
+            max_rows_per_group=EXPORT_CHUNK_SIZE,
+            existing_data_behavior='overwrite_or_ignore',
+        )
+
+
+def _publish_export(staging_path: str, export_path: str, tablenames: list[str]) -> None:
+    """
+    Troca cada tabela da exportação anterior pela nova, na ordem dada. A
+    versão antiga é renomeada para um diretório oculto (que o dashboard
+    ignora) antes de ser apagada.
+    """
+    for tablename in tablenames:
+        target = os.path.join(export_path, tablename)
+        previous = os.path.join(export_path, f".{tablename}.old")
+        shutil.rmtree(previous, ignore_errors=True)
+        # Exportações antigas gravavam um único arquivo por tabela
+        for extension in EXPORT_EXTENSIONS.values():
+            if os.path.isfile(f"{target}{extension}"):
+                os.remove(f"{target}{extension}")
+        if os.path.isdir(target):
+            os.replace(target, previous)
+        os.replace(os.path.join(staging_path, tablename), target)
+        shutil.rmtree(previous, ignore_errors=True)
+
+
+def export_columnar(engine: Engine, export_path: str = EXPORT_PATH, export_format: str = EXPORT_FORMAT) -> None:
+    """
+    Exporta as dimensões, as tabelas de fatos, os rollups, os sketches e a
+    versão dos dados para arquivos colunares em `export_path`, lidos pelo
+    backend DuckDB do dashboard sem passar pelo banco.
+
+    Cada tabela vira um diretório. As tabelas de fatos, o daily_sales e os
+    sketches são particionados por mês de compra no formato Hive
+    (`fact_orders/purchase_month=2018-01/part-0.parquet`), então um filtro
+    por período só abre as partições do intervalo. O Parquet é comprimido
+    com zstd e guarda estatísticas de mínimo/máximo por row group; o Arrow IPC
+    não é comprimido, para que o dashboard o leia por memory-map sem cópias.
+
+    Tudo é escrito num diretório temporário e só então trocado, tabela a
+    tabela, com a data_version por último: quando o dashboard vê a versão
+    nova, os arquivos dela já estão no lugar.
+    """
+    if not export_path:
+        return
+    if export_format not in EXPORT_EXTENSIONS:
+        print(f"ERRO: formato de exportação desconhecido: {export_format}")
+        return
+
+    print(f"\nIniciando exportação colunar ({export_format}) para '{export_path}'...")
+    tablenames = [*DIMENSION_TABLES, *FACT_TABLES, *ROLLUP_DEFINITIONS, SKETCH_TABLE, 'data_version']
+    staging_path = os.path.join(export_path, f".export-{os.getpid()}")
+    try:
+        shutil.rmtree(staging_path, ignore_errors=True)
+        os.makedirs(staging_path)
+        for tablename in tablenames:
+            start = time.perf_counter()
+            _export_table(engine, tablename, os.path.join(staging_path, tablename), export_format)
+            print(f"  - '{tablename}' exportada em {time.perf_counter() - start:.2f}s.")
+        _publish_export(staging_path, export_path, tablenames)
+    except Exception as e:
+        print(f"ERRO na exportação colunar: {e}")
+    finally:
+        shutil.rmtree(staging_path, ignore_errors=True)
+
+
+# Tipo de coluna no Snowflake para cada tipo de coluna do PostgreSQL; os demais viram texto
+SNOWFLAKE_TYPES = {
+    'smallint': 'SMALLINT',
+    'integer': 'INTEGER',
+    'bigint': 'BIGINT',
+    'numeric': 'DOUBLE',
+    'real': 'FLOAT',
+    'double precision': 'DOUBLE',
+    'boolean': 'BOOLEAN',
+    'date': 'DATE',
+    'timestamp without time zone': 'TIMESTAMP_NTZ',
+}
+
+# Sufixo das tabelas de carga no Snowflake, trocadas pelas definitivas no fim
+SNOWFLAKE_STAGING_SUFFIX = '_publish'
+
+
+def _publish_snowflake_table(engine: Engine, snowflake_connection, tablename: str) -> int:
+    """
+    Copia uma tabela do PostgreSQL para a tabela de carga correspondente no
+    Snowflake, em blocos de SNOWFLAKE_CHUNK_SIZE linhas. Retorna as linhas copiadas.
+    """
+    from snowflake.connector.pandas_tools import write_pandas
+
+    staging = f"{tablename}{SNOWFLAKE_STAGING_SUFFIX}".upper()
+    rows = 0
+    with engine.connect() as connection:
+        columns = connection.execute(text("""
+            SELECT column_name, data_type
+            FROM information_schema.columns
+            WHERE table_schema = CURRENT_SCHEMA() AND table_name = :tablename
+            ORDER BY ordinal_position
+        """), {"tablename": tablename}).fetchall()
+        # Identificadores sem aspas ficam em maiúsculas no Snowflake, como as
+        # queries do dashboard os escrevem; os tipos valem para todos os blocos
+        definition = ", ".join(f"{name.upper()} {SNOWFLAKE_TYPES.get(data_type, 'VARCHAR')}" for name, data_type in columns)
+        snowflake_connection.cursor().execute(f"CREATE OR REPLACE TABLE {staging} ({definition})")
+
+        chunks = pd.read_sql_query(text(f"SELECT * FROM {tablename}"),
+                                   connection.execution_options(stream_results=True),
+                                   chunksize=SNOWFLAKE_CHUNK_SIZE)
+        for chunk in chunks:
+            chunk.columns = chunk.columns.str.upper()
+            write_pandas(snowflake_connection, chunk, staging, quote_identifiers=False, use_logical_type=True)
+            rows += len(chunk)
+    return rows
+
+
+def publish_snowflake(engine: Engine) -> None:
+    """
+    Publica no Snowflake as dimensões, as tabelas de fatos, os rollups, os
+    sketches e a versão dos dados, que o pipeline só constrói no PostgreSQL.
+    Sem essa etapa, o dashboard no backend padrão (Snowflake) não encontraria
+    o star schema nem os rollups.
+
+    Cada tabela é copiada para uma tabela de carga e, só depois que todas
+    chegaram, trocada pela definitiva (ALTER TABLE ... SWAP WITH), com a
+    data_version por último: quando o dashboard vê a versão nova, as tabelas
+    dela já estão no lugar. Fica desativada sem SNOWFLAKE_ACCOUNT.
+    """
+    if not SNOWFLAKE_PARAMETERS["account"]:
+        print("\nSNOWFLAKE_ACCOUNT não definido; publicação no Snowflake ignorada.")
+        return
+
+    print("\nIniciando publicação no Snowflake...")
+    tablenames = [*DIMENSION_TABLES, *FACT_TABLES, *ROLLUP_DEFINITIONS, SKETCH_TABLE, 'data_version']
+    try:
+        import snowflake.connector
+
+        parameters = {key: value for key, value in SNOWFLAKE_PARAMETERS.items() if value}
+        with snowflake.connector.connect(**parameters) as snowflake_connection:
+            for tablename in tablenames:
+                start = time.perf_counter()
+                rows = _publish_snowflake_table(engine, snowflake_connection, tablename)
+                print(f"  - '{tablename}' copiada ({rows} linhas) em {time.perf_counter() - start:.2f}s.")
+
+            cursor = snowflake_connection.cursor()
+            for tablename in tablenames:
+                staging = f"{tablename}{SNOWFLAKE_STAGING_SUFFIX}"
+                cursor.execute(f"CREATE TABLE IF NOT EXISTS {tablename} LIKE {staging}")
+                cursor.execute(f"ALTER TABLE {tablename} SWAP WITH {staging}")
+                cursor.execute(f"DROP TABLE {staging}")
+        print("Publicação no Snowflake concluída.")
+    except Exception as e:
+        print(f"ERRO na publicação no Snowflake: {e}")
 
 
 def main():
@@ -112,17 +1181,35 @@ def main():
     engine = create_db_engine(DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_NAME)
 
     if engine:
+        incremental = PIPELINE_MODE == 'incremental'
+
         # 2. Carrega os dados brutos
-        load_raw_data(engine, DATA_PATH)
+        loaded_files = load_raw_data(engine, DATA_PATH, incremental=incremental)
 
-        # 3. Transforma os dados
-        transform_data(engine)
+        # 3. Transforma os dados, cria os rollups, publica a nova versão para o dashboard,
+        #    exporta os arquivos colunares lidos pelo backend DuckDB e copia as tabelas
+        #    para o Snowflake
+        if incremental and not loaded_files:
+            print("\nNenhum arquivo alterado desde a última carga; nada a atualizar.")
+        elif incremental:
+            if refresh_analytics_incremental(engine):
+                tune_database(engine, cluster=False, explain=False)
+                record_file_manifest(engine, loaded_files)
+                bump_data_version(engine)
+                export_columnar(engine)
+                publish_snowflake(engine)
+        elif transform_data(engine) and build_rollups(engine):
+            tune_database(engine)
+            record_file_manifest(engine, loaded_files)
+            bump_data_version(engine)
+            export_columnar(engine)
+            publish_snowflake(engine)
 
         # 4. Verifica o resultado
         print("\n--- Verificação Final ---")
         try:
-            df_final = pd.read_sql("SELECT * FROM analytics_orders LIMIT 5", engine)
-            print("Amostra da tabela final 'analytics_orders':")
+            df_final = pd.read_sql("SELECT * FROM fact_order_items LIMIT 5", engine)
+            print("Amostra da tabela de fatos 'fact_order_items':")
             print(df_final)
         except Exception as e:
             print(f"ERRO ao buscar dados da tabela de análise: {e}")
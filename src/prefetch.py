@@ -0,0 +1,72 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+import queries
+
+
+# Número máximo de queries executadas em paralelo durante o prefetch
+PREFETCH_MAX_WORKERS = 6
+
+# Futures do prefetch da execução atual do script (uma por thread de script)
+_active = threading.local()
+
+
+@st.cache_resource
+def _get_executor() -> ThreadPoolExecutor:
+    """
+    Cria o pool de threads compartilhado pelas sessões do app.
+    """
+    return ThreadPoolExecutor(max_workers=PREFETCH_MAX_WORKERS, thread_name_prefix="prefetch")
+
+
+def _job_key(fn, args) -> tuple:
+    # repr() permite usar argumentos não-hasheáveis (listas, dict_values...)
+    return fn.__name__, repr(args)
+
+
+def _run_job(ctx, fn, args):
+    # Anexa o contexto do script para que os caches do Streamlit funcionem na thread
+    add_script_run_ctx(threading.current_thread(), ctx)
+    with queries.deferred_errors():
+        return fn(*args)
+
+
+def start_prefetch(jobs: list[tuple]) -> dict[tuple, Future]:
+    """
+    Dispara todas as queries independentes da página em paralelo.
+
+    Args:
+        jobs (list[tuple]): Lista de tuplas (função, *argumentos).
+
+    Returns:
+        dict: As futures criadas, indexadas pela função e seus argumentos.
+    """
+    ctx = get_script_run_ctx()
+    executor = _get_executor()
+
+    futures = {}
+    for fn, *args in jobs:
+        args = tuple(args)
+        futures[_job_key(fn, args)] = executor.submit(_run_job, ctx, fn, args)
+
+    _active.futures = futures
+    return futures
+
+
+def resolve(fn, *args):
+    """
+    Retorna o resultado de `fn(*args)`, aguardando a future do prefetch se
+    ela existir. Se a query não foi antecipada, ou se falhou na thread de
+    prefetch, ela é executada aqui mesmo, e um eventual erro é exibido no
+    lugar do componente que pediu o dado.
+    """
+    future = getattr(_active, "futures", {}).get(_job_key(fn, args))
+    if future is not None:
+        try:
+            return future.result()
+        except Exception:
+            pass
+    return fn(*args)
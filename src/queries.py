@@ -1,18 +1,167 @@
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date
+from typing import TYPE_CHECKING
+
+import os
 import pandas as pd
-import snowflake.connector
 import streamlit as st
-from sqlalchemy import text
-from sqlalchemy.engine import Engine
 
+from backends import BACKENDS, DuckDBBackend, PostgresBackend, QueryBackend, SnowflakeBackend
+import hll
+import instrumentation
 from db_connection import get_db_engine
-from snowflake.snowpark import Session
+from query_cache import QueryCache, normalize_query
+from result_schema import ResultMemory, ResultSchema
+from timeseries_index import DailyRevenueIndex, DailySketchIndex
+
+if TYPE_CHECKING:
+    from snowflake.snowpark import Session
+
+
+# --- Backend de consulta ---
+# "snowflake" (padrão), "postgres" (o banco do pipeline, via DB_* do .env) ou
+# "duckdb" (embarcado, lendo os arquivos Parquet exportados pelo pipeline)
+QUERY_BACKEND = os.environ.get("DASHBOARD_BACKEND", "snowflake")
+# Diretório com os arquivos Parquet lidos pelo backend DuckDB
+PARQUET_PATH = os.environ.get("DASHBOARD_PARQUET_PATH", "data/parquet/")
+
+# --- Configurações do cache de resultados ---
+# TTL padrão (em segundos) de cada resultado guardado pelo fetch_data
+DEFAULT_CACHE_TTL = 900
+# Tempo que o snapshot de KPIs fica em cache entre os reruns
+KPI_CACHE_TTL = 600
+# Limite de memória ocupado pelos resultados em cache
+QUERY_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# Intervalo mínimo entre as consultas à tabela de versão do pipeline
+DATA_VERSION_CHECK_INTERVAL = 60
+# Quantos resultados recentes têm a memória registrada (ver get_result_memory)
+RESULT_MEMORY_MAX_ENTRIES = 50
+
+# Contagens de distintos (clientes únicos e pedidos) estimadas pelos sketches
+# HyperLogLog do pipeline, com erro padrão de hll.STANDARD_ERROR (~0,8%), em
+# vez de COUNT(DISTINCT) nas tabelas de fatos. '0' usa sempre a contagem exata
+APPROXIMATE_DISTINCT = os.environ.get("DASHBOARD_APPROXIMATE_DISTINCT", "1") == "1"
+
+# Tabelas agregadas materializadas pelo pipeline (ver pipeline.build_rollups)
+ROLLUP_TABLES = ('daily_sales', 'sales_by_dimension', 'delivery_days_by_review', 'daily_sketches')
+
+# Dimensões de faturamento: cidade, estado e forma de pagamento somam os
+# pagamentos; a categoria soma o preço dos itens, já que o pagamento não é
+# atribuído a um produto
+SALES_DIMENSION_COLUMNS = ('customer_city', 'customer_state', 'payment_type', 'product_category_name')
+# Quantos valores de cada dimensão aparecem no gráfico; os demais (e os
+# valores nulos) são somados em "Outros"
+SALES_TOP_N = 10
+SALES_OTHERS_LABEL = 'Outros'
+
+# Tipos compactos dos resultados (ver result_schema.ResultSchema)
+DELIVERY_DAYS_SCHEMA = ResultSchema({
+    'review_score': 'int16',
+    'dias_para_entrega': 'int16',
+    'quantidade': 'int32',
+    'quantidade_de_pedidos': 'int32',
+})
+HISTOGRAM_SCHEMA = ResultSchema({
+    'inicio_faixa': 'float32',
+    'largura_faixa': 'float32',
+    'quantidade_de_pedidos': 'int32',
+})
+BOX_STATS_SCHEMA = ResultSchema({
+    'review_score': 'int16',
+    'total_pedidos': 'int32',
+    'q1': 'int16',
+    'mediana': 'int16',
+    'q3': 'int16',
+    'limite_inferior': 'int16',
+    'limite_superior': 'int16',
+    'outliers': 'int32',
+})
+SALES_SCHEMA = ResultSchema({
+    'dimension': 'category',
+    'dimension_value': 'category',
+    'posicao': 'int16',
+})
+SKETCH_SCHEMA = ResultSchema({
+    'metric': 'category',
+    'register_index': 'int16',
+    'register_rank': 'int16',
+    'registradores': 'int32',
+})
+
+# Intervalo de datas coberto pelo dataset da Olist
+DATA_START_DATE = date(2016, 9, 15)
+DATA_END_DATE = date(2018, 8, 29)
+
+
+class QueryError(Exception):
+    """
+    Erro de execução de query levantado pelo fetch_data quando os erros
+    estão adiados (ver `deferred_errors`).
+    """
+
+
+# Guarda, por thread, se os erros do fetch_data devem ser levantados
+_error_mode = threading.local()
+
+# Memória dos últimos resultados buscados no banco, pela query normalizada
+_result_memory: OrderedDict[str, ResultMemory] = OrderedDict()
+_result_memory_lock = threading.Lock()
+
+
+@contextmanager
+def deferred_errors():
+    """
+    Dentro deste contexto o fetch_data levanta QueryError em vez de chamar
+    st.error. Usado pelas threads de prefetch, que não devem desenhar na
+    página; o erro é exibido depois, pelo componente que usa o resultado.
+    """
+    previous = getattr(_error_mode, "deferred", False)
+    _error_mode.deferred = True
+    try:
+        yield
+    finally:
+        _error_mode.deferred = previous
+
+
+@dataclass(frozen=True)
+class KpiSnapshot:
+    """
+    Fotografia dos KPIs principais do negócio, calculada em uma única consulta.
+    """
+    faturamento_total: float = 0.0
+    total_pedidos: int = 0
+    ticket_medio: float = 0.0
+    avaliacao_media: float = 0.0
+    tempo_medio_entrega: float = 0.0
+    total_clientes: int | None = None
+    # Erro padrão relativo de total_clientes quando estimado pelos sketches (0 se exato)
+    erro_padrao_clientes: float = 0.0
+
+
+@dataclass(frozen=True)
+class DistinctCounts:
+    """
+    Clientes únicos e pedidos de um período. Quando estimados pelos sketches
+    HyperLogLog, `erro_padrao` é o erro padrão relativo das estimativas; nas
+    contagens exatas, zero.
+    """
+    total_clientes: int = 0
+    total_pedidos: int = 0
+    erro_padrao: float = 0.0
+
 
 @st.cache_resource
-def get_snowflake_connection() -> Session:
+def get_snowflake_connection() -> "Session":
     """
     Cria e gerencia a conexão com o Snowflake usando a Session do Snowpark.
     A sessão é guardada em cache para ser reutilizada.
     """
+    # O Snowpark é importado só na primeira conexão, fora da inicialização do app
+    from snowflake.snowpark import Session
+
     try:
         # 2. O builder da Session usa o dicionário de st.secrets diretamente
         connection_parameters = st.secrets["snowflake"]
@@ -22,74 +171,446 @@ def get_snowflake_connection() -> Session:
         st.error(f"Erro ao conectar ao Snowflake com Snowpark: {e}")
         return None
 
-def fetch_data(query: str) -> pd.DataFrame:
+@st.cache_resource
+def get_backend() -> QueryBackend | None:
     """
-    Executa uma query no Snowflake usando a Session do Snowpark
-    e retorna um DataFrame do Pandas.
+    Cria o backend de consulta configurado em DASHBOARD_BACKEND. A conexão é
+    guardada em cache e compartilhada pelas sessões do app.
     """
-    session = get_snowflake_connection()
-    if session:
+    if QUERY_BACKEND == SnowflakeBackend.name:
+        session = get_snowflake_connection()
+        return SnowflakeBackend(session) if session else None
+    if QUERY_BACKEND == PostgresBackend.name:
+        engine = get_db_engine()
+        return PostgresBackend(engine) if engine else None
+    if QUERY_BACKEND == DuckDBBackend.name:
         try:
-            # 3. Executa a query e converte o resultado para Pandas
-            snowpark_df = session.sql(query)
-            pandas_df = snowpark_df.to_pandas()
-            
-            # O Snowpark também retorna nomes de colunas em MAIÚSCULAS.
-            # Convertemos para minúsculas para manter a consistência.
-            pandas_df.columns = pandas_df.columns.str.lower()
-            return pandas_df
+            return DuckDBBackend(PARQUET_PATH)
         except Exception as e:
-            st.error(f"Erro ao executar a query: {e}")
-            return pd.DataFrame()
+            st.error(f"Erro ao abrir os arquivos Parquet com o DuckDB: {e}")
+            return None
+    st.error(f"Backend de consulta desconhecido: {QUERY_BACKEND}")
+    return None
+
+
+def _dialect() -> type[QueryBackend]:
+    # Classe do backend configurado, usada para montar o SQL no dialeto certo
+    return BACKENDS.get(QUERY_BACKEND, QueryBackend)
+
+
+def _delivery_days(alias: str = "", dialect: type[QueryBackend] | None = None) -> str:
+    # Dias entre a compra e a entrega do pedido, no dialeto do backend
+    dialect = dialect or _dialect()
+    return dialect.days_between(f"{alias}order_purchase_timestamp", f"{alias}order_delivered_customer_date")
+
+
+@st.cache_resource
+def get_query_cache() -> QueryCache:
+    """
+    Cria o cache de resultados compartilhado por todas as sessões do app.
+    """
+    return QueryCache(
+        max_bytes=QUERY_CACHE_MAX_BYTES,
+        default_ttl=DEFAULT_CACHE_TTL,
+        version_check_interval=DATA_VERSION_CHECK_INTERVAL,
+    )
+
+
+def _sync_data_version(backend: QueryBackend, cache: QueryCache) -> None:
+    """
+    Lê a versão dos dados publicada pelo pipeline (tabela data_version) e
+    invalida o cache quando ela muda. A leitura acontece no máximo uma vez
+    a cada DATA_VERSION_CHECK_INTERVAL segundos.
+    """
+    if not cache.version_check_due():
+        return
+    try:
+        df = backend.execute("SELECT MAX(version) AS version FROM data_version")
+        version = df['version'].iloc[0] if not df.empty else None
+    except Exception:
+        # Bancos sem a tabela de versão continuam funcionando só com o TTL
+        version = None
+    version = None if pd.isna(version) else int(version)
+    if version != cache.data_version:
+        backend.refresh()
+    cache.set_data_version(version)
+
+
+def fetch_data(query: str, params=None, ttl: int | None = None,
+               schema: ResultSchema | None = None, use_cache: bool = True, *,
+               name: str) -> pd.DataFrame:
+    """
+    Executa uma query no backend configurado (Snowflake, PostgreSQL ou
+    DuckDB) e retorna um DataFrame do Pandas.
+
+    O resultado chega em lotes Arrow, convertidos para os tipos compactos de
+    `schema` à medida que chegam; a memória de cada resultado fica disponível
+    em get_result_memory.
+
+    Cada chamada é medida (tempo, linhas, bytes, backend e acerto do cache)
+    pelo módulo instrumentation e registrada como `name`, o nome da função
+    de query que pediu o dado.
+
+    Os resultados ficam no cache de queries, indexados pelo texto normalizado
+    da query e pelos parâmetros, por `ttl` segundos (DEFAULT_CACHE_TTL se
+    omitido) ou até o pipeline publicar uma nova versão dos dados. Com
+    `use_cache=False` o resultado não passa pelo cache: é o caso de quem
+    guarda só uma estrutura derivada dele, como os índices em memória.
+    """
+    backend = get_backend()
+    if backend:
+        cache = get_query_cache()
+        _sync_data_version(backend, cache)
+
+        key = cache.make_key(query, params)
+        with instrumentation.timed("query", name, backend=backend.name, sql=key[0]) as event:
+            cached_df = cache.get(key) if use_cache else None
+            if cached_df is not None:
+                event.update(cache="hit", rows=len(cached_df),
+                             bytes=int(cached_df.memory_usage(deep=True).sum()))
+                return cached_df
+
+            event["cache"] = "miss"
+            try:
+                pandas_df, memory = backend.fetch(query, params, schema)
+                event.update(rows=memory.rows, bytes=memory.frame_bytes)
+                _record_result_memory(query, memory)
+                if use_cache:
+                    cache.put(key, pandas_df, ttl)
+                return pandas_df
+            except Exception as e:
+                event["error"] = f"{type(e).__name__}: {e}"
+                if getattr(_error_mode, "deferred", False):
+                    raise QueryError(str(e)) from e
+                st.error(f"Erro ao executar a query: {e}")
+                return pd.DataFrame()
     else:
         return pd.DataFrame()
 
 
+def _record_result_memory(query: str, memory: ResultMemory) -> None:
+    key = normalize_query(query)
+    with _result_memory_lock:
+        _result_memory.pop(key, None)
+        _result_memory[key] = memory
+        while len(_result_memory) > RESULT_MEMORY_MAX_ENTRIES:
+            _result_memory.popitem(last=False)
+
+
+def get_result_memory() -> dict[str, ResultMemory]:
+    """
+    Retorna a memória (linhas, bytes em Arrow e bytes no DataFrame compacto)
+    dos resultados buscados mais recentemente, do mais antigo ao mais novo.
+    """
+    with _result_memory_lock:
+        return dict(_result_memory)
+
+
+def get_data_version():
+    """
+    Retorna a versão atual dos dados publicada pelo pipeline (ou None).
+    """
+    cache = get_query_cache()
+    backend = get_backend()
+    if backend:
+        _sync_data_version(backend, cache)
+    return cache.data_version
+
+
+def get_cache_stats() -> dict:
+    """
+    Retorna os contadores do cache de queries (hits, misses, evictions...).
+    """
+    return get_query_cache().stats()
+
+
+def get_available_rollups() -> set[str]:
+    """
+    Retorna quais tabelas agregadas criadas pelo pipeline existem no schema
+    atual. As queries abaixo usam essas tabelas automaticamente quando
+    disponíveis e caem para as tabelas de fatos caso contrário.
+    """
+    df = fetch_data(build_available_rollups_query(), name="get_available_rollups")
+    return set(df['table_name']) if not df.empty else set()
+
+
+def build_available_rollups_query() -> str:
+    """
+    Query do information_schema com os rollups de ROLLUP_TABLES existentes.
+    """
+    rollup_names = ", ".join(f"'{name}'" for name in ROLLUP_TABLES)
+    return f"""
+        SELECT
+            LOWER(table_name) AS table_name
+        FROM
+            information_schema.tables
+        WHERE
+            LOWER(table_schema) = LOWER(CURRENT_SCHEMA()) AND
+            LOWER(table_name) IN ({rollup_names});
+    """
+
+
 def get_delivery_time_distribution():
-    query = """
+    query, params = build_delivery_time_distribution_query(get_available_rollups(), _dialect())
+    return fetch_data(query, params=params, schema=DELIVERY_DAYS_SCHEMA, name="get_delivery_time_distribution")
+
+
+def build_delivery_time_distribution_query(rollups: set[str], dialect: type[QueryBackend]) -> tuple[str, list | None]:
+    if 'delivery_days_by_review' in rollups:
+        query = """
+            SELECT
+                dias_para_entrega,
+                SUM(quantidade) AS quantidade_de_pedidos
+            FROM delivery_days_by_review
+            GROUP BY dias_para_entrega
+            HAVING SUM(quantidade) > 100
+            ORDER BY dias_para_entrega ASC;
+        """
+        return query, None
+
+    query = f"""
         SELECT
-            (order_delivered_customer_date::DATE - order_purchase_timestamp::DATE) AS dias_para_entrega,
+            {_delivery_days(dialect=dialect)} AS dias_para_entrega,
             COUNT(*) AS quantidade_de_pedidos
-        FROM analytics_orders
+        FROM fact_orders
         WHERE order_delivered_customer_date IS NOT NULL 
         GROUP BY dias_para_entrega
         HAVING COUNT(*) > 100
         ORDER BY dias_para_entrega ASC;
     """
-    return fetch_data(query)
+    return query, None
 
 
 def get_raw_delivery_times():
-    query = """
+    """
+    Distribuição dos dias de entrega (colunas dias_para_entrega e
+    quantidade), uma linha por valor em vez de uma por pedido: quem usa o
+    resultado deve ponderar cada valor por `quantidade`.
+    """
+    if 'delivery_days_by_review' in get_available_rollups():
+        query = """
+            SELECT
+                dias_para_entrega,
+                SUM(quantidade) AS quantidade
+            FROM delivery_days_by_review
+            WHERE dias_para_entrega >= 0
+            GROUP BY dias_para_entrega
+            ORDER BY dias_para_entrega ASC;
+        """
+        return fetch_data(query, schema=DELIVERY_DAYS_SCHEMA, name="get_raw_delivery_times")
+
+    query = f"""
         WITH delivery_data AS (
             SELECT
-                (order_delivered_customer_date::DATE - order_purchase_timestamp::DATE) AS dias_para_entrega
+                {_delivery_days()} AS dias_para_entrega
             FROM
-                analytics_orders
+                fact_orders
             WHERE
                 order_delivered_customer_date IS NOT NULL AND
                 order_purchase_timestamp IS NOT NULL
         )
         SELECT
-            dias_para_entrega
+            dias_para_entrega,
+            COUNT(*) AS quantidade
         FROM
             delivery_data
         WHERE
-            dias_para_entrega >= 0;
+            dias_para_entrega >= 0
+        GROUP BY
+            dias_para_entrega
+        ORDER BY
+            dias_para_entrega ASC;
+    """
+    return fetch_data(query, schema=DELIVERY_DAYS_SCHEMA, name="get_raw_delivery_times")
+
+
+def _delivery_days_source(rollups: set[str], dialect: type[QueryBackend], require_review: bool = False) -> str:
+    """
+    SELECT com a distribuição (review_score, dias_para_entrega, quantidade),
+    lido do rollup quando ele existe ou agrupado a partir de fact_orders.
+    """
+    review_filter = "review_score IS NOT NULL AND" if require_review else ""
+    if 'delivery_days_by_review' in rollups:
+        return f"""
+            SELECT review_score, dias_para_entrega, quantidade
+            FROM delivery_days_by_review
+            WHERE {review_filter} dias_para_entrega >= 0
+        """
+    return f"""
+        SELECT
+            review_score,
+            {_delivery_days(dialect=dialect)} AS dias_para_entrega,
+            COUNT(*) AS quantidade
+        FROM fact_orders
+        WHERE
+            order_delivered_customer_date IS NOT NULL AND
+            order_purchase_timestamp IS NOT NULL AND
+            {review_filter}
+            {_delivery_days(dialect=dialect)} >= 0
+        GROUP BY 1, 2
     """
-    df = fetch_data(query)
-    return df
+
+
+def get_delivery_time_histogram(bins: int = 50, percentile: float = 0.99):
+    """
+    Histograma do tempo de entrega calculado no banco: o corte de outliers
+    (percentil `percentile`) e a contagem por faixa saem prontos, em cerca de
+    `bins` linhas (inicio_faixa, largura_faixa, quantidade_de_pedidos).
+
+    O percentil é exato e discreto: o primeiro valor de dias cuja frequência
+    acumulada alcança `percentile` do total.
+    """
+    query, params = build_delivery_time_histogram_query(get_available_rollups(), _dialect(), bins, percentile)
+    return fetch_data(query, params=params, schema=HISTOGRAM_SCHEMA, name="get_delivery_time_histogram")
+
+
+def build_delivery_time_histogram_query(rollups: set[str], dialect: type[QueryBackend], bins: int = 50,
+                                        percentile: float = 0.99) -> tuple[str, list | None]:
+    query = f"""
+        WITH distribuicao AS (
+            SELECT dias_para_entrega, SUM(quantidade) AS quantidade
+            FROM ({_delivery_days_source(rollups, dialect)}) d
+            GROUP BY dias_para_entrega
+        ),
+        acumulado AS (
+            SELECT
+                dias_para_entrega,
+                SUM(quantidade) OVER (ORDER BY dias_para_entrega ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW) AS acumulado,
+                SUM(quantidade) OVER () AS total
+            FROM distribuicao
+        ),
+        limites AS (
+            SELECT
+                MIN(dias_para_entrega) AS minimo,
+                MIN(CASE WHEN acumulado >= {float(percentile)} * total THEN dias_para_entrega END) AS corte
+            FROM acumulado
+        ),
+        faixas AS (
+            SELECT
+                minimo,
+                corte,
+                GREATEST(CEIL((corte - minimo + 1) / {float(bins)}), 1) AS largura
+            FROM limites
+        )
+        SELECT
+            f.minimo + FLOOR((d.dias_para_entrega - f.minimo) / f.largura) * f.largura AS inicio_faixa,
+            f.largura AS largura_faixa,
+            SUM(d.quantidade) AS quantidade_de_pedidos
+        FROM distribuicao d
+        CROSS JOIN faixas f
+        WHERE d.dias_para_entrega <= f.corte
+        GROUP BY 1, 2
+        ORDER BY inicio_faixa ASC;
+    """
+    return query, None
+
+
+def get_delivery_box_stats(percentile_cutoff: float = 0.95):
+    """
+    Estatísticas do box plot de tempo de entrega por nota de avaliação,
+    calculadas no banco: quartis, mediana, limites dos bigodes (1,5 x IQR)
+    e quantidade de outliers por nota. Os valores acima do percentil
+    `percentile_cutoff` geral são descartados antes, como no gráfico original.
+
+    O resultado tem uma linha por nota, independentemente do volume de pedidos.
+    """
+    query, params = build_delivery_box_stats_query(get_available_rollups(), _dialect(), percentile_cutoff)
+    return fetch_data(query, params=params, schema=BOX_STATS_SCHEMA, name="get_delivery_box_stats")
+
+
+def build_delivery_box_stats_query(rollups: set[str], dialect: type[QueryBackend],
+                                   percentile_cutoff: float = 0.95) -> tuple[str, list | None]:
+    query = f"""
+        WITH distribuicao AS (
+            SELECT review_score, dias_para_entrega, SUM(quantidade) AS quantidade
+            FROM ({_delivery_days_source(rollups, dialect, require_review=True)}) d
+            GROUP BY review_score, dias_para_entrega
+        ),
+        acumulado_geral AS (
+            SELECT
+                dias_para_entrega,
+                SUM(quantidade) OVER (ORDER BY dias_para_entrega ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW) AS acumulado,
+                SUM(quantidade) OVER () AS total
+            FROM (
+                SELECT dias_para_entrega, SUM(quantidade) AS quantidade
+                FROM distribuicao
+                GROUP BY dias_para_entrega
+            ) g
+        ),
+        corte AS (
+            SELECT MIN(CASE WHEN acumulado >= {float(percentile_cutoff)} * total THEN dias_para_entrega END) AS corte
+            FROM acumulado_geral
+        ),
+        filtrado AS (
+            SELECT d.review_score, d.dias_para_entrega, d.quantidade
+            FROM distribuicao d
+            CROSS JOIN corte c
+            WHERE d.dias_para_entrega <= c.corte
+        ),
+        acumulado AS (
+            SELECT
+                review_score,
+                dias_para_entrega,
+                SUM(quantidade) OVER (PARTITION BY review_score ORDER BY dias_para_entrega ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW) AS acumulado,
+                SUM(quantidade) OVER (PARTITION BY review_score) AS total
+            FROM filtrado
+        ),
+        quartis AS (
+            SELECT
+                review_score,
+                MAX(total) AS total_pedidos,
+                MIN(CASE WHEN acumulado >= 0.25 * total THEN dias_para_entrega END) AS q1,
+                MIN(CASE WHEN acumulado >= 0.50 * total THEN dias_para_entrega END) AS mediana,
+                MIN(CASE WHEN acumulado >= 0.75 * total THEN dias_para_entrega END) AS q3
+            FROM acumulado
+            GROUP BY review_score
+        )
+        SELECT
+            q.review_score,
+            q.total_pedidos,
+            q.q1,
+            q.mediana,
+            q.q3,
+            MIN(CASE WHEN f.dias_para_entrega >= q.q1 - 1.5 * (q.q3 - q.q1) THEN f.dias_para_entrega END) AS limite_inferior,
+            MAX(CASE WHEN f.dias_para_entrega <= q.q3 + 1.5 * (q.q3 - q.q1) THEN f.dias_para_entrega END) AS limite_superior,
+            SUM(CASE
+                WHEN f.dias_para_entrega < q.q1 - 1.5 * (q.q3 - q.q1)
+                  OR f.dias_para_entrega > q.q3 + 1.5 * (q.q3 - q.q1)
+                THEN f.quantidade ELSE 0
+            END) AS outliers
+        FROM filtrado f
+        JOIN quartis q ON f.review_score = q.review_score
+        GROUP BY q.review_score, q.total_pedidos, q.q1, q.mediana, q.q3
+        ORDER BY q.review_score ASC;
+    """
+    return query, None
 
 
 def get_delivery_times_and_reviews():
-    query = """
+    """
+    Distribuição dos dias de entrega por nota de avaliação (colunas
+    review_score, dias_para_entrega e quantidade), uma linha por par em vez
+    de uma por pedido: quem usa o resultado deve ponderar por `quantidade`.
+    """
+    if 'delivery_days_by_review' in get_available_rollups():
+        query = """
+            SELECT
+                review_score,
+                dias_para_entrega,
+                quantidade
+            FROM delivery_days_by_review
+            WHERE review_score IS NOT NULL AND dias_para_entrega >= 0
+            ORDER BY review_score, dias_para_entrega;
+        """
+        return fetch_data(query, schema=DELIVERY_DAYS_SCHEMA, name="get_delivery_times_and_reviews")
+
+    query = f"""
         WITH delivery_data AS (
             SELECT
-                order_id,
                 review_score,
-                (order_delivered_customer_date::DATE - order_purchase_timestamp::DATE) AS dias_para_entrega
+                {_delivery_days()} AS dias_para_entrega
             FROM
-                analytics_orders
+                fact_orders
             WHERE
                 order_delivered_customer_date IS NOT NULL AND
                 order_purchase_timestamp IS NOT NULL AND
@@ -97,127 +618,455 @@ def get_delivery_times_and_reviews():
         )
         SELECT
             review_score,
-            dias_para_entrega
+            dias_para_entrega,
+            COUNT(*) AS quantidade
         FROM
             delivery_data
         WHERE
-            dias_para_entrega >= 0;
+            dias_para_entrega >= 0
+        GROUP BY
+            review_score,
+            dias_para_entrega
+        ORDER BY
+            review_score,
+            dias_para_entrega;
+    """
+    return fetch_data(query, schema=DELIVERY_DAYS_SCHEMA, name="get_delivery_times_and_reviews")
+
+
+def get_sales_by_all_dimensions() -> pd.DataFrame:
+    """
+    Faturamento das quatro dimensões (colunas dimension, dimension_value,
+    total_faturamento e posicao) numa única query: os SALES_TOP_N maiores
+    valores de cada dimensão, em ordem, e uma linha "Outros" com o restante
+    (inclusive os valores nulos), de modo que cada dimensão soma o
+    faturamento total. Trocar a dimensão no dashboard só filtra este
+    resultado, que fica no cache de queries.
+
+    Lê o rollup sales_by_dimension quando disponível; senão agrega as
+    tabelas de fatos com GROUPING SETS. O ranking por dimensão é feito no
+    banco com ROW_NUMBER.
+    """
+    query, params = build_sales_by_all_dimensions_query(get_available_rollups(), _dialect())
+    return fetch_data(query, params=params, schema=SALES_SCHEMA, name="get_sales_by_all_dimensions")
+
+
+def build_sales_by_all_dimensions_query(rollups: set[str], dialect: type[QueryBackend]) -> tuple[str, list | None]:
+    if 'sales_by_dimension' in rollups:
+        source = """
+            SELECT
+                dimension,
+                dimension_value,
+                total_faturamento
+            FROM
+                sales_by_dimension
+        """
+    else:
+        source = """
+            SELECT
+                CASE
+                    WHEN GROUPING(d.customer_city) = 0 THEN 'customer_city'
+                    WHEN GROUPING(d.customer_state) = 0 THEN 'customer_state'
+                    ELSE 'payment_type'
+                END AS dimension,
+                COALESCE(d.customer_city, d.customer_state, f.payment_type) AS dimension_value,
+                SUM(f.payment_value) AS total_faturamento
+            FROM
+                fact_order_payments f
+            LEFT JOIN dim_customers d ON f.customer_id = d.customer_id
+            GROUP BY
+                GROUPING SETS ((d.customer_city), (d.customer_state), (f.payment_type))
+            UNION ALL
+            SELECT
+                'product_category_name',
+                d.product_category_name,
+                SUM(f.price)
+            FROM
+                fact_order_items f
+            LEFT JOIN dim_products d ON f.product_id = d.product_id
+            GROUP BY
+                d.product_category_name
+        """
+
+    query = f"""
+        WITH faturamento AS ({source}),
+        ranking AS (
+            SELECT
+                dimension,
+                dimension_value,
+                total_faturamento,
+                -- Valores nulos ficam no fim e vão sempre para "Outros"
+                ROW_NUMBER() OVER (
+                    PARTITION BY dimension
+                    ORDER BY CASE WHEN dimension_value IS NULL THEN 1 ELSE 0 END, total_faturamento DESC, dimension_value
+                ) AS posicao
+            FROM
+                faturamento
+        ),
+        fatias AS (
+            SELECT
+                dimension,
+                CASE
+                    WHEN posicao <= {SALES_TOP_N} AND dimension_value IS NOT NULL THEN dimension_value
+                    ELSE '{SALES_OTHERS_LABEL}'
+                END AS fatia,
+                total_faturamento,
+                posicao
+            FROM
+                ranking
+        )
+        SELECT
+            dimension,
+            fatia AS dimension_value,
+            SUM(total_faturamento) AS total_faturamento,
+            MIN(posicao) AS posicao
+        FROM
+            fatias
+        GROUP BY
+            dimension,
+            fatia
+        ORDER BY
+            dimension,
+            posicao;
     """
-    df = fetch_data(query)
-    return df
+    return query, None
 
 
 def get_sales_by_dimension(dimension: str, allowed_dimensions: list[str]):
+    """
+    Faturamento de uma dimensão: os SALES_TOP_N maiores valores e "Outros",
+    recortados do resultado de get_sales_by_all_dimensions.
+    """
     # Validação simples para evitar SQL Injection
     if dimension not in allowed_dimensions:
         st.error(f"Dimensão de análise inválida: {dimension}")
         return pd.DataFrame()
 
+    df = get_sales_by_all_dimensions()
+    if df.empty:
+        return pd.DataFrame()
+
+    # O resultado do cache é compartilhado: o recorte vira um DataFrame novo com assign
+    df_dimension = df.loc[df['dimension'] == dimension, ['dimension_value', 'total_faturamento']]
+    df_dimension = df_dimension.assign(
+        # Descarta as categorias das outras dimensões, que o Plotly exibiria na legenda
+        dimension_value=df_dimension['dimension_value'].cat.remove_unused_categories(),
+    )
+    return df_dimension.rename(columns={'dimension_value': dimension}).reset_index(drop=True)
+
+
+def _approximate_distinct(rollups: set[str]) -> bool:
+    # Distintos estimados pelos sketches quando ativado e o pipeline os criou
+    return APPROXIMATE_DISTINCT and 'daily_sketches' in rollups
+
+
+def get_kpi_snapshot() -> KpiSnapshot:
+    """
+    Calcula os seis KPIs do card principal em uma única query sobre o star
+    schema: o faturamento vem de fact_order_payments e as métricas por pedido
+    de fact_orders, que tem uma linha por pedido (sem COUNT(DISTINCT order_id)).
+    Com APPROXIMATE_DISTINCT, os clientes únicos são estimados pelos sketches
+    (get_distinct_counts) e a query dispensa o COUNT(DISTINCT) e a junção
+    com dim_customers.
+    O resultado fica no cache de queries por KPI_CACHE_TTL segundos, então os
+    reruns do Streamlit não voltam ao banco.
+    """
+    rollups = get_available_rollups()
+    query, params = build_kpi_snapshot_query(rollups, _dialect())
+    df = fetch_data(query, params=params, ttl=KPI_CACHE_TTL, name="get_kpi_snapshot")
+    if df.empty:
+        return KpiSnapshot()
+
+    # AVG/SUM retornam NULL em tabelas vazias; tratamos como zero
+    row = df.iloc[0].fillna(0)
+    customers = get_distinct_counts() if _approximate_distinct(rollups) else None
+    return KpiSnapshot(
+        faturamento_total=float(row['faturamento_total']),
+        total_pedidos=int(row['total_pedidos']),
+        ticket_medio=float(row['ticket_medio']),
+        avaliacao_media=float(row['avaliacao_media']),
+        tempo_medio_entrega=float(row['tempo_medio_entrega']),
+        total_clientes=customers.total_clientes if customers else int(row['total_clientes']),
+        erro_padrao_clientes=customers.erro_padrao if customers else 0.0,
+    )
+
+
+def build_kpi_snapshot_query(rollups: set[str], dialect: type[QueryBackend]) -> tuple[str, list | None]:
+    if _approximate_distinct(rollups):
+        customers_column, customers_join = "0 AS total_clientes", ""
+    else:
+        customers_column = "COUNT(DISTINCT c.customer_unique_id) AS total_clientes"
+        customers_join = "JOIN dim_customers c ON o.customer_id = c.customer_id"
+
     query = f"""
-        SELECT 
-            {dimension},
-            SUM(payment_value) as total_faturamento
-        FROM 
-            analytics_orders
-        WHERE 
-            {dimension} IS NOT NULL
-        GROUP BY 
-            {dimension}
-        ORDER BY 
-            total_faturamento DESC
-        LIMIT 10; -- Pegando os 10 maiores para o gráfico não ficar poluído
-    """
-    return fetch_data(query)
+        WITH pagamentos AS (
+            SELECT
+                SUM(payment_value) AS faturamento_total
+            FROM
+                fact_order_payments
+        ),
+        pedidos AS (
+            SELECT
+                COUNT(*) AS total_pedidos,
+                AVG(o.review_score) AS avaliacao_media,
+                AVG({_delivery_days('o.', dialect)}) AS tempo_medio_entrega,
+                {customers_column}
+            FROM
+                fact_orders o
+            {customers_join}
+        )
+        SELECT
+            p.faturamento_total,
+            o.total_pedidos,
+            p.faturamento_total / NULLIF(o.total_pedidos, 0) AS ticket_medio,
+            o.avaliacao_media,
+            o.tempo_medio_entrega,
+            o.total_clientes
+        FROM
+            pagamentos p
+        CROSS JOIN pedidos o;
+    """
+    return query, None
 
 
-def get_faturamento_total():
-    query = """
-        SELECT 
-            SUM(payment_value) AS total_faturamento
-        FROM 
-            analytics_orders;
+def get_distinct_counts(start_date=None, end_date=None, customer_state: str | None = None) -> DistinctCounts:
     """
-    df = fetch_data(query)
-    return df['total_faturamento'].iloc[0] if not df.empty else 0.0
+    Clientes únicos e pedidos comprados entre `start_date` e `end_date`
+    (inclusive; todo o histórico se omitidos), opcionalmente só de um estado.
 
+    Com APPROXIMATE_DISTINCT e os sketches do pipeline disponíveis, o banco
+    une os sketches diários do período (máximo de cada registrador) e devolve
+    só o histograma dos registradores, de onde sai a estimativa (ver
+    hll.estimate): o custo é o mesmo para um dia ou para o histórico inteiro.
+    Caso contrário, ou se a consulta aos sketches não trouxer nada, conta com
+    COUNT(DISTINCT) nas tabelas de fatos.
+    """
+    rollups = get_available_rollups()
+    if _approximate_distinct(rollups):
+        counts = _estimate_distinct_counts(rollups, start_date, end_date, customer_state)
+        if counts is not None:
+            return counts
+        rollups = rollups - {'daily_sketches'}
 
-def get_total_orders():
-    query = """
+    query, params = build_distinct_counts_query(rollups, _dialect(), start_date, end_date, customer_state)
+    df = fetch_data(query, params=params, name="get_distinct_counts")
+    if df.empty:
+        return DistinctCounts()
+    row = df.iloc[0].fillna(0)
+    return DistinctCounts(total_clientes=int(row['total_clientes']), total_pedidos=int(row['total_pedidos']))
+
+
+def _estimate_distinct_counts(rollups: set[str], start_date, end_date, customer_state: str | None) -> DistinctCounts | None:
+    # Estimativa pelos sketches, ou None se a query falhou ou não trouxe
+    # registradores (um zero aqui viraria um KPI zerado, e não um fallback)
+    query, params = build_distinct_counts_query(rollups, _dialect(), start_date, end_date, customer_state)
+    df = fetch_data(query, params=params, schema=SKETCH_SCHEMA, name="_estimate_distinct_counts")
+    if df.empty:
+        return None
+    estimates = {
+        metric: round(hll.estimate(group.set_index('register_rank')['registradores']))
+        for metric, group in df.groupby('metric', observed=True)
+    }
+    return DistinctCounts(
+        total_clientes=estimates.get('customer_unique_id', 0),
+        total_pedidos=estimates.get('order_id', 0),
+        erro_padrao=hll.STANDARD_ERROR,
+    )
+
+
+def build_distinct_counts_query(rollups: set[str], dialect: type[QueryBackend], start_date=None, end_date=None,
+                                customer_state: str | None = None) -> tuple[str, list | None]:
+    approximate = _approximate_distinct(rollups)
+    if approximate:
+        conditions = ["dimension = ?", "dimension_value = ?"]
+        params = ['customer_state', customer_state] if customer_state else ['all', '']
+        date_column = "sketch_date"
+    else:
+        conditions, params = [], []
+        date_column = dialect.to_date('o.order_purchase_timestamp')
+        if customer_state:
+            conditions.append("c.customer_state = ?")
+            params.append(customer_state)
+    if start_date is not None:
+        conditions.append(f"{date_column} >= ?")
+        params.append(pd.Timestamp(start_date).date())
+    if end_date is not None:
+        conditions.append(f"{date_column} <= ?")
+        params.append(pd.Timestamp(end_date).date())
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    if approximate:
+        query = f"""
+            SELECT
+                metric,
+                register_rank,
+                COUNT(*) AS registradores
+            FROM (
+                SELECT
+                    metric,
+                    register_index,
+                    MAX(register_rank) AS register_rank
+                FROM
+                    daily_sketches
+                {where}
+                GROUP BY
+                    metric,
+                    register_index
+            ) sketch
+            GROUP BY
+                metric,
+                register_rank;
+        """
+        return query, params
+
+    query = f"""
         SELECT
-            COUNT(DISTINCT order_id) AS total_orders
+            COUNT(DISTINCT c.customer_unique_id) AS total_clientes,
+            COUNT(*) AS total_pedidos
         FROM
-            analytics_orders;
+            fact_orders o
+        JOIN dim_customers c ON o.customer_id = c.customer_id
+        {where};
     """
-    df = fetch_data(query)
-    return df['total_orders'].iloc[0] if not df.empty else 0
+    return query, params or None
+
+
+def get_faturamento_total():
+    return get_kpi_snapshot().faturamento_total
+
+
+def get_total_orders():
+    return get_kpi_snapshot().total_pedidos
 
 
 def get_ticket_medio():
-    query = """
-        SELECT 
-            SUM(payment_value) / COUNT(DISTINCT order_id) AS ticket_medio
-        FROM 
-            analytics_orders;
-    """
-    df = fetch_data(query)
-    return df['ticket_medio'].iloc[0] if not df.empty else 0.0
+    return get_kpi_snapshot().ticket_medio
 
 
 def get_average_rating():
-    query = """
-        SELECT 
-            AVG(review_score) AS average_rating
-        FROM 
-            analytics_orders
-        WHERE 
-            review_score IS NOT NULL;
-    """
-    df = fetch_data(query)
-    return df['average_rating'].iloc[0] if not df.empty else 0.0
+    return get_kpi_snapshot().avaliacao_media
 
 
 def get_average_delivery_time():
-    query = """
-        SELECT 
-            AVG(order_delivered_customer_date::DATE - order_purchase_timestamp::DATE) AS average_delivery_time
-        FROM 
-            analytics_orders
-        WHERE 
-            order_delivered_customer_date IS NOT NULL;
-    """
-    df = fetch_data(query)
-    return df['average_delivery_time'].iloc[0] if not df.empty else 0.0
+    return get_kpi_snapshot().tempo_medio_entrega
 
 
 def get_total_customers():
-    query = """
-        SELECT 
-            COUNT(DISTINCT customer_unique_id) AS total_customers
-        FROM 
-            analytics_orders;
-    """
-    df = fetch_data(query)
-    return df['total_customers'].iloc[0] if not df.empty else 0
+    return get_kpi_snapshot().total_clientes
 
 
-def get_orders_by_time_period(start_date: str, end_date: str):
+def _fetch_daily_revenue() -> pd.DataFrame:
+    # Histórico diário completo, usado para montar o índice de faturamento
+    query, params = build_daily_revenue_query(get_available_rollups(), _dialect())
+    return fetch_data(query, params=params, name="_fetch_daily_revenue")
+
+
+def build_daily_revenue_query(rollups: set[str], dialect: type[QueryBackend]) -> tuple[str, list | None]:
+    if 'daily_sales' in rollups:
+        query = """
+            SELECT
+                sale_date AS date,
+                total_price
+            FROM
+                daily_sales
+            ORDER BY
+                sale_date ASC;
+        """
+        return query, None
+
     query = f"""
         SELECT
-            DATE(order_purchase_timestamp) AS date,
+            {dialect.to_date('order_purchase_timestamp')} AS date,
             SUM(price) AS total_price
         FROM
-            analytics_orders
+            fact_order_items
         WHERE
-            order_purchase_timestamp IS NOT NULL AND
-            DATE(order_purchase_timestamp) BETWEEN '{start_date}' AND '{end_date}'
+            order_purchase_timestamp IS NOT NULL
         GROUP BY
-            DATE(order_purchase_timestamp)
+            {dialect.to_date('order_purchase_timestamp')}
         ORDER BY
             date ASC;
     """
-    df = fetch_data(query)
+    return query, None
+
+
+@st.cache_resource(ttl=DEFAULT_CACHE_TTL, max_entries=2, show_spinner=False)
+def _build_revenue_index(data_version) -> DailyRevenueIndex | None:
+    # O argumento só serve de chave: um novo índice é montado a cada versão dos dados
+    df = _fetch_daily_revenue()
+    return DailyRevenueIndex.from_frame(df) if not df.empty else None
+
+
+def get_revenue_index() -> DailyRevenueIndex | None:
+    """
+    Retorna o índice diário de faturamento da versão atual dos dados.
+    Ele é carregado uma única vez por versão e compartilhado entre as sessões.
+    """
+    return _build_revenue_index(get_data_version())
+
+
+def _fetch_daily_sketches() -> pd.DataFrame:
+    # Sketches diários do total (sem recorte por estado), usados no índice de sketches
+    if not _approximate_distinct(get_available_rollups()):
+        return pd.DataFrame()
+    query = """
+        SELECT
+            sketch_date,
+            metric,
+            register_index,
+            register_rank
+        FROM
+            daily_sketches
+        WHERE
+            dimension = 'all';
+    """
+    # Só o índice (compacto) fica em memória, não o DataFrame de milhões de linhas
+    return fetch_data(query, schema=SKETCH_SCHEMA, use_cache=False, name="_fetch_daily_sketches")
+
+
+@st.cache_resource(ttl=DEFAULT_CACHE_TTL, max_entries=2, show_spinner=False)
+def _build_sketch_index(data_version) -> DailySketchIndex | None:
+    # O argumento só serve de chave: um novo índice é montado a cada versão dos dados
+    df = _fetch_daily_sketches()
+    return DailySketchIndex.from_frame(df) if not df.empty else None
+
+
+def get_sketch_index() -> DailySketchIndex | None:
+    """
+    Retorna os sketches diários de clientes e pedidos da versão atual dos
+    dados, para estimar os distintos de qualquer período em memória (como o
+    índice de faturamento faz com a receita). None se os sketches não
+    existem ou APPROXIMATE_DISTINCT está desativado.
+    """
+    return _build_sketch_index(get_data_version())
+
+
+def get_orders_by_time_period(start_date: str, end_date: str):
+    """
+    Faturamento diário (soma de 'price') no intervalo, respondido pelo índice
+    em memória: mover o slider de datas não gera nenhuma query no banco.
+    """
+    index = get_revenue_index()
+    if index is None:
+        return None
+    df = index.slice(start_date, end_date)
     return df if not df.empty else None
 
 
+# Builders das queries principais do dashboard, por um nome legível. Cada um
+# recebe os rollups disponíveis e o dialeto e devolve o SQL e os parâmetros,
+# sem executar nada: a etapa de tuning do pipeline mede com eles exatamente o
+# SQL que o dashboard envia.
+DASHBOARD_QUERY_BUILDERS = {
+    'kpi_snapshot': build_kpi_snapshot_query,
+    'daily_revenue': build_daily_revenue_query,
+    'delivery_time_histogram': build_delivery_time_histogram_query,
+    'delivery_box_stats': build_delivery_box_stats_query,
+    'delivery_time_distribution': build_delivery_time_distribution_query,
+    'distinct_counts': lambda rollups, dialect: build_distinct_counts_query(rollups, dialect, DATA_START_DATE, DATA_END_DATE),
+    'sales_by_dimension': build_sales_by_all_dimensions_query,
+}
+
+
 if __name__ == "__main__":
     print(get_orders_by_time_period('2016-09-15', '2018-08-29'))
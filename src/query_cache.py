@@ -0,0 +1,129 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import pandas as pd
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normaliza o texto da query (espaços e ';' final) para que a mesma
+    consulta escrita com formatação diferente use a mesma entrada do cache.
+    """
+    return re.sub(r"\s+", " ", query).strip().rstrip(";").strip()
+
+
+@dataclass
+class _CacheEntry:
+    data: pd.DataFrame
+    size: int
+    expires_at: float
+
+
+class QueryCache:
+    """
+    Cache LRU em memória para os resultados das queries do dashboard.
+
+    Cada entrada tem seu próprio TTL e o total de memória é limitado por
+    `max_bytes`; quando o limite é atingido, as entradas usadas há mais tempo
+    são descartadas. O cache inteiro é invalidado quando a versão dos dados
+    publicada pelo pipeline muda.
+    """
+
+    def __init__(self, max_bytes: int, default_ttl: int, version_check_interval: int):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.version_check_interval = version_check_interval
+
+        self._entries: OrderedDict[tuple, _CacheEntry] = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._data_version = None
+        self._last_version_check = float("-inf")
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(query: str, params=None) -> tuple:
+        return normalize_query(query), tuple(params) if params else ()
+
+    def get(self, key: tuple) -> pd.DataFrame | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            # Devolve uma cópia para que o chamador possa alterar o DataFrame
+            return entry.data.copy()
+
+    def put(self, key: tuple, df: pd.DataFrame, ttl: int | None = None) -> None:
+        size = int(df.memory_usage(deep=True).sum())
+        if size > self.max_bytes:
+            return
+
+        expires_at = time.monotonic() + (ttl if ttl is not None else self.default_ttl)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _CacheEntry(df.copy(), size, expires_at)
+            self._bytes += size
+
+            while self._bytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def version_check_due(self) -> bool:
+        return time.monotonic() - self._last_version_check >= self.version_check_interval
+
+    def set_data_version(self, version) -> None:
+        """
+        Registra a versão atual dos dados. Se ela mudou desde a última
+        verificação, todas as entradas são descartadas.
+        """
+        with self._lock:
+            self._last_version_check = time.monotonic()
+            if version == self._data_version:
+                return
+            if self._data_version is not None:
+                self.invalidations += 1
+            self._data_version = version
+            self._entries.clear()
+            self._bytes = 0
+
+    @property
+    def data_version(self):
+        return self._data_version
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "data_version": self._data_version,
+            }
+
+    def _remove(self, key: tuple) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
@@ -0,0 +1,80 @@
+from dataclasses import dataclass
+from typing import Iterable
+
+import pandas as pd
+import pyarrow as pa
+
+
+# Tipo Arrow de cada tipo compacto aceito; no pandas, o dicionário vira 'category'
+_ARROW_TYPES = {
+    "category": pa.dictionary(pa.int32(), pa.string()),
+    "int16": pa.int16(),
+    "int32": pa.int32(),
+    "float32": pa.float32(),
+}
+
+
+@dataclass(frozen=True)
+class ResultMemory:
+    """
+    Memória de um resultado: os lotes Arrow recebidos do backend e o
+    DataFrame compacto entregue ao dashboard (em bytes).
+    """
+    rows: int = 0
+    arrow_bytes: int = 0
+    frame_bytes: int = 0
+
+
+class ResultSchema:
+    """
+    Tipos compactos das colunas do resultado de uma query.
+
+    Cada lote Arrow recebido do backend é convertido assim que chega: textos
+    de baixa cardinalidade (estado, cidade, forma de pagamento, categoria)
+    viram dicionários, dias e notas viram int16 e contagens int32. Medidas em
+    reais continuam em float64, já que o float32 perde os centavos. Colunas
+    fora do schema mantêm o tipo devolvido pelo banco.
+    """
+
+    def __init__(self, dtypes: dict[str, str] | None = None):
+        dtypes = dtypes or {}
+        unknown = set(dtypes.values()) - set(_ARROW_TYPES)
+        if unknown:
+            raise ValueError(f"Tipos sem conversão compacta: {', '.join(sorted(unknown))}")
+        self.dtypes = dtypes
+
+    def compact(self, batch: pa.RecordBatch) -> pa.RecordBatch:
+        # Os bancos podem devolver os nomes em maiúsculas (Snowflake)
+        names = [name.lower() for name in batch.schema.names]
+        schema = pa.schema([
+            pa.field(name, _ARROW_TYPES[self.dtypes[name]] if name in self.dtypes else field.type)
+            for name, field in zip(names, batch.schema)
+        ])
+        return batch.rename_columns(names).cast(schema)
+
+    def to_frame(self, batches: Iterable[pa.RecordBatch]) -> tuple[pd.DataFrame, ResultMemory]:
+        """
+        Consome os lotes, compactando um de cada vez, e monta o DataFrame.
+        Só um lote fica no tipo original por vez.
+        """
+        arrow_bytes = 0
+        tables = []
+        for batch in batches:
+            arrow_bytes += batch.nbytes
+            tables.append(pa.Table.from_batches([self.compact(batch)]))
+        if not tables:
+            return pd.DataFrame(), ResultMemory()
+
+        # "permissive" concilia lotes em que uma coluna veio só com NULLs
+        table = pa.concat_tables(tables, promote_options="permissive")
+        del tables
+        # self_destruct libera cada coluna Arrow assim que ela é convertida
+        df = table.to_pandas(self_destruct=True, split_blocks=True)
+        del table
+
+        for name, dtype in self.dtypes.items():
+            if dtype == "int16" and name in df and df[name].dtype.kind == "f":
+                # Inteiros com NULL chegam como float64; float32 os guarda sem perda
+                df[name] = df[name].astype("float32")
+
+        return df, ResultMemory(len(df), arrow_bytes, int(df.memory_usage(deep=True).sum()))
@@ -0,0 +1,151 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+import hll
+
+
+class DailyRevenueIndex:
+    """
+    Índice diário de faturamento com somas acumuladas (prefix sums).
+
+    A série é guardada como um vetor denso, com uma posição por dia entre a
+    primeira e a última data, de modo que qualquer intervalo vira um fatiamento
+    por posição. Totais e médias de um intervalo saem de duas consultas às
+    somas acumuladas, sem percorrer os dias do intervalo.
+    """
+
+    def __init__(self, dates: pd.Series, values: pd.Series):
+        days = pd.to_datetime(dates).values.astype("datetime64[D]")
+        self.start = days.min()
+        self.end = days.max()
+
+        size = int((self.end - self.start).astype(int)) + 1
+        positions = (days - self.start).astype(int)
+
+        self.values = np.zeros(size, dtype=np.float64)
+        self.values[positions] = np.asarray(values, dtype=np.float64)
+        # Marca os dias que tiveram vendas, para devolver a mesma série da query
+        self.observed = np.zeros(size, dtype=bool)
+        self.observed[positions] = True
+
+        # A posição i guarda a soma dos dias [0, i), então o intervalo
+        # [i, j) custa cumsum[j] - cumsum[i]
+        self.cumsum = np.concatenate(([0.0], np.cumsum(self.values)))
+        self.cumcount = np.concatenate(([0], np.cumsum(self.observed)))
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, date_column: str = "date", value_column: str = "total_price"):
+        return cls(df[date_column], df[value_column])
+
+    @property
+    def min_date(self) -> date:
+        return self.start.astype(date)
+
+    @property
+    def max_date(self) -> date:
+        return self.end.astype(date)
+
+    def _positions(self, start_date, end_date) -> tuple[int, int]:
+        # Converte o intervalo fechado [start_date, end_date] para [i, j)
+        i = int((np.datetime64(start_date, "D") - self.start).astype(int))
+        j = int((np.datetime64(end_date, "D") - self.start).astype(int)) + 1
+        size = len(self.values)
+        return min(max(i, 0), size), min(max(j, 0), size)
+
+    def total(self, start_date, end_date) -> float:
+        i, j = self._positions(start_date, end_date)
+        return float(self.cumsum[j] - self.cumsum[i]) if j > i else 0.0
+
+    def mean(self, start_date, end_date) -> float:
+        """
+        Faturamento médio por dia com vendas no intervalo.
+        """
+        i, j = self._positions(start_date, end_date)
+        days = self.cumcount[j] - self.cumcount[i] if j > i else 0
+        return self.total(start_date, end_date) / days if days else 0.0
+
+    def slice(self, start_date, end_date) -> pd.DataFrame:
+        """
+        Retorna a série diária do intervalo nas colunas 'date' e 'total_price',
+        apenas com os dias que tiveram vendas.
+        """
+        i, j = self._positions(start_date, end_date)
+        if j <= i:
+            return pd.DataFrame({"date": pd.Series(dtype="object"), "total_price": pd.Series(dtype="float64")})
+
+        mask = self.observed[i:j]
+        days = self.start + np.arange(i, j)[mask]
+        return pd.DataFrame({
+            "date": days.astype(date),
+            "total_price": self.values[i:j][mask],
+        })
+
+
+class DailySketchIndex:
+    """
+    Sketches HyperLogLog diários (ver hll) de cada métrica, em memória.
+
+    As linhas (dia, registrador, valor) ficam ordenadas por métrica e dia,
+    com a posição onde começa cada dia de cada métrica, de modo que os
+    sketches de um intervalo são um fatiamento por posição. A união deles é
+    o máximo de cada registrador, calculado sobre o recorte sem voltar ao
+    banco. Cada linha ocupa 3 bytes: o registrador em uint16 (são
+    hll.REGISTERS) e o valor em uint8; a métrica e o dia ficam só nos
+    deslocamentos.
+    """
+
+    # Erro padrão relativo das estimativas
+    standard_error = hll.STANDARD_ERROR
+
+    def __init__(self, dates: pd.Series, metrics: pd.Series, registers: pd.Series, ranks: pd.Series):
+        days = pd.to_datetime(dates).values.astype("datetime64[D]")
+        self.start = days.min()
+        self.end = days.max()
+
+        size = int((self.end - self.start).astype(int)) + 1
+        positions = (days - self.start).astype(np.int32)
+        # Cada métrica vira um código inteiro, e não um texto por linha
+        codes, names = pd.factorize(metrics)
+        order = np.lexsort((positions, codes))
+        codes, positions = codes[order], positions[order]
+        self.registers = np.asarray(registers, dtype=np.uint16)[order]
+        self.ranks = np.asarray(ranks, dtype=np.uint8)[order]
+
+        # metrica -> início de cada dia nas linhas (size + 1 posições)
+        self.offsets = {}
+        bounds = np.searchsorted(codes, np.arange(len(names) + 1))
+        for code, metric in enumerate(names):
+            first, last = bounds[code], bounds[code + 1]
+            self.offsets[metric] = first + np.searchsorted(positions[first:last], np.arange(size + 1))
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame):
+        return cls(df["sketch_date"], df["metric"], df["register_index"], df["register_rank"])
+
+    def _positions(self, start_date, end_date) -> tuple[int, int]:
+        # Converte o intervalo fechado [start_date, end_date] para [i, j)
+        size = int((self.end - self.start).astype(int)) + 1
+        i = int((np.datetime64(start_date, "D") - self.start).astype(int))
+        j = int((np.datetime64(end_date, "D") - self.start).astype(int)) + 1
+        return min(max(i, 0), size), min(max(j, 0), size)
+
+    def estimate(self, metric: str, start_date, end_date) -> int:
+        """
+        Estimativa dos valores distintos de `metric` entre `start_date` e
+        `end_date` (inclusive).
+        """
+        if metric not in self.offsets:
+            return 0
+        offsets = self.offsets[metric]
+        i, j = self._positions(start_date, end_date)
+        if j <= i:
+            return 0
+
+        first, last = offsets[i], offsets[j]
+        union = np.zeros(hll.REGISTERS, dtype=np.uint8)
+        np.maximum.at(union, self.registers[first:last], self.ranks[first:last])
+        # Histograma dos registradores, a entrada de hll.estimate
+        rank_counts = np.bincount(union, minlength=hll.RANK_BITS + 2)
+        return round(hll.estimate(pd.Series(rank_counts)))
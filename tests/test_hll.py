@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import hll
+
+
+def _rank_counts(hashes: np.ndarray) -> pd.Series:
+    """
+    Histograma dos registradores de um sketch montado como o pipeline faz:
+    os PRECISION bits mais altos do hash escolhem o registrador e o valor é
+    a posição do primeiro bit 1 nos RANK_BITS bits restantes.
+    """
+    index = (hashes >> np.uint64(hll.RANK_BITS)).astype(np.int64)
+    rest = hashes & np.uint64((1 << hll.RANK_BITS) - 1)
+    # frexp devolve o número de bits de `rest` (exato abaixo de 2^53)
+    bit_length = np.frexp(rest.astype(np.float64))[1]
+    ranks = hll.RANK_BITS + 1 - bit_length
+
+    registers = np.zeros(hll.REGISTERS, dtype=np.int64)
+    np.maximum.at(registers, index, ranks)
+    return pd.Series(np.bincount(registers, minlength=hll.RANK_BITS + 2))
+
+
+def _hashes(cardinality: int, seed: int = 0) -> np.ndarray:
+    # Hashes de 64 bits uniformes, um por valor distinto
+    return np.random.default_rng(seed).integers(0, 2**64, size=cardinality, dtype=np.uint64)
+
+
+def test_empty_sketch_estimates_zero():
+    assert hll.estimate(pd.Series(dtype="int64")) == 0
+
+
+@pytest.mark.parametrize("cardinality", [10, 100, 1_000])
+def test_small_cardinalities_are_almost_exact(cardinality):
+    # Com poucos valores quase todo registrador guarda um só, como na contagem linear
+    assert hll.estimate(_rank_counts(_hashes(cardinality))) == pytest.approx(cardinality, rel=0.01)
+
+
+@pytest.mark.parametrize("cardinality", [20_000, 100_000, 1_000_000])
+def test_large_cardinalities_within_three_standard_errors(cardinality):
+    estimate = hll.estimate(_rank_counts(_hashes(cardinality, seed=cardinality)))
+    assert estimate == pytest.approx(cardinality, rel=3 * hll.STANDARD_ERROR)
+
+
+def test_repeated_values_do_not_change_the_estimate():
+    hashes = _hashes(50_000)
+    repeated = np.concatenate([hashes, hashes[:20_000]])
+    assert hll.estimate(_rank_counts(repeated)) == hll.estimate(_rank_counts(hashes))
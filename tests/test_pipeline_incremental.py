@@ -0,0 +1,100 @@
+import os
+
+import pandas as pd
+
+import generate_olist_data as olist
+import pipeline
+
+# Tabelas que a carga incremental atualiza no lugar
+ANALYTICS_TABLES = [
+    *pipeline.DIMENSION_TABLES,
+    *pipeline.FACT_TABLES,
+    *pipeline.ROLLUP_DEFINITIONS,
+    pipeline.SKETCH_TABLE,
+]
+
+
+def _snapshot(engine) -> dict[str, pd.DataFrame]:
+    # Conteúdo de cada tabela em ordem canônica, para comparar cargas diferentes
+    snapshot = {}
+    for tablename in ANALYTICS_TABLES:
+        df = pd.read_sql(f"SELECT * FROM {tablename}", engine)
+        snapshot[tablename] = df.sort_values(list(df.columns), na_position='last').reset_index(drop=True)
+    return snapshot
+
+
+def _read(data_path: str, filename: str) -> pd.DataFrame:
+    return pd.read_csv(os.path.join(data_path, filename), dtype=str, keep_default_na=False)
+
+
+def _write(df: pd.DataFrame, data_path: str, filename: str) -> None:
+    df.to_csv(os.path.join(data_path, filename), index=False)
+
+
+def _change_recent_orders(data_path: str) -> None:
+    """
+    Altera pedidos dentro da janela de INCREMENTAL_LOOKBACK_DAYS: um pedido
+    entregue volta a 'canceled', outro muda de valor e de data de entrega,
+    um pedido enviado passa a entregue e um pedido novo é comprado.
+    """
+    orders = _read(data_path, olist.ORDERS_FILE)
+    items = _read(data_path, olist.ITEMS_FILE)
+    payments = _read(data_path, olist.PAYMENTS_FILE)
+
+    purchase = pd.to_datetime(orders['order_purchase_timestamp'])
+    recent = orders[purchase > purchase.max() - pd.Timedelta(days=10)]
+    delivered = recent[recent['order_status'] == 'delivered']['order_id'].tolist()
+    assert len(delivered) >= 3, "poucos pedidos recentes nos dados sintéticos"
+    regressed, changed, template = delivered[:3]
+
+    orders.loc[orders['order_id'] == regressed, 'order_status'] = 'canceled'
+    is_changed = orders['order_id'] == changed
+    delivered_at = pd.to_datetime(orders.loc[is_changed, 'order_delivered_customer_date']) + pd.Timedelta(days=1)
+    orders.loc[is_changed, 'order_delivered_customer_date'] = delivered_at.dt.strftime('%Y-%m-%d %H:%M:%S')
+    is_changed_payment = payments['order_id'] == changed
+    payments.loc[is_changed_payment, 'payment_value'] = (
+        payments.loc[is_changed_payment, 'payment_value'].astype(float) * 2
+    ).round(2).astype(str)
+
+    shipped = orders.index[(orders['order_status'] == 'shipped') & (purchase > purchase.max() - pd.Timedelta(days=20))]
+    if len(shipped):
+        orders.loc[shipped[:1], 'order_status'] = 'delivered'
+        orders.loc[shipped[:1], 'order_delivered_customer_date'] = (
+            purchase[shipped[:1]] + pd.Timedelta(days=5)
+        ).dt.strftime('%Y-%m-%d %H:%M:%S')
+
+    # Pedido novo, com os itens e pagamentos de um pedido existente, comprado um dia depois do último
+    new_id = 'f' * 32
+    new_order = orders[orders['order_id'] == template].assign(order_id=new_id)
+    new_order['order_purchase_timestamp'] = (purchase.max() + pd.Timedelta(days=1)).strftime('%Y-%m-%d %H:%M:%S')
+    orders = pd.concat([orders, new_order], ignore_index=True)
+    items = pd.concat([items, items[items['order_id'] == template].assign(order_id=new_id)], ignore_index=True)
+    payments = pd.concat([payments, payments[payments['order_id'] == template].assign(order_id=new_id)],
+                         ignore_index=True)
+
+    _write(orders, data_path, olist.ORDERS_FILE)
+    _write(items, data_path, olist.ITEMS_FILE)
+    _write(payments, data_path, olist.PAYMENTS_FILE)
+
+
+def test_incremental_refresh_matches_full_rebuild(pg_engine, tmp_path):
+    data_path = str(tmp_path)
+    olist.OlistGenerator(3000, data_path, seed=7).generate()
+
+    loaded = pipeline.load_raw_data(pg_engine, data_path)
+    assert pipeline.transform_data(pg_engine) and pipeline.build_rollups(pg_engine)
+    pipeline.record_file_manifest(pg_engine, loaded)
+
+    _change_recent_orders(data_path)
+    loaded = pipeline.load_raw_data(pg_engine, data_path, incremental=True)
+    assert set(loaded) == {olist.ORDERS_FILE, olist.ITEMS_FILE, olist.PAYMENTS_FILE}
+    assert pipeline.refresh_analytics_incremental(pg_engine)
+    incremental = _snapshot(pg_engine)
+
+    assert pipeline.transform_data(pg_engine) and pipeline.build_rollups(pg_engine)
+    full = _snapshot(pg_engine)
+
+    for tablename in ANALYTICS_TABLES:
+        pd.testing.assert_frame_equal(incremental[tablename], full[tablename], check_dtype=False,
+                                      obj=tablename)
+
@@ -0,0 +1,99 @@
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+import query_cache
+from query_cache import QueryCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Relógio controlado pelo teste no lugar de time.monotonic
+    now = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(query_cache, "time", SimpleNamespace(monotonic=lambda: now.value))
+    return now
+
+
+def _frame(rows: int = 100) -> pd.DataFrame:
+    return pd.DataFrame({"value": range(rows)})
+
+
+def _size(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True).sum())
+
+
+def test_keys_ignore_query_formatting():
+    assert QueryCache.make_key("SELECT  *\n  FROM orders;") == QueryCache.make_key("SELECT * FROM orders")
+    assert QueryCache.make_key("SELECT 1", ["a"]) != QueryCache.make_key("SELECT 1", ["b"])
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = QueryCache(max_bytes=10**6, default_ttl=60, version_check_interval=30)
+    cache.put(("short",), _frame(), ttl=10)
+    cache.put(("default",), _frame())
+
+    clock.value += 10
+    pd.testing.assert_frame_equal(cache.get(("short",)), _frame())
+
+    clock.value += 1
+    assert cache.get(("short",)) is None
+    assert cache.get(("default",)) is not None
+
+    clock.value += 50
+    assert cache.get(("default",)) is None
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["bytes"] == 0
+
+
+def test_least_recently_used_entries_are_evicted():
+    size = _size(_frame())
+    cache = QueryCache(max_bytes=2 * size, default_ttl=60, version_check_interval=30)
+    cache.put(("a",), _frame())
+    cache.put(("b",), _frame())
+    # Ler "a" faz de "b" a entrada usada há mais tempo
+    assert cache.get(("a",)) is not None
+
+    cache.put(("c",), _frame())
+    assert cache.get(("b",)) is None
+    assert cache.get(("a",)) is not None
+    assert cache.get(("c",)) is not None
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] == 2 * size
+
+
+def test_results_larger_than_the_cache_are_not_stored():
+    cache = QueryCache(max_bytes=_size(_frame()) - 1, default_ttl=60, version_check_interval=30)
+    cache.put(("big",), _frame())
+    assert cache.get(("big",)) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_returned_frames_are_copies():
+    cache = QueryCache(max_bytes=10**6, default_ttl=60, version_check_interval=30)
+    cache.put(("a",), _frame())
+    df = cache.get(("a",))
+    df["value"] = -1
+    pd.testing.assert_frame_equal(cache.get(("a",)), _frame())
+
+
+def test_new_data_version_invalidates_everything(clock):
+    cache = QueryCache(max_bytes=10**6, default_ttl=60, version_check_interval=30)
+    assert cache.version_check_due()
+    cache.set_data_version(1)
+    cache.put(("a",), _frame())
+
+    assert not cache.version_check_due()
+    clock.value += 30
+    assert cache.version_check_due()
+
+    # A mesma versão mantém as entradas
+    cache.set_data_version(1)
+    assert cache.get(("a",)) is not None
+    assert cache.stats()["invalidations"] == 0
+
+    cache.set_data_version(2)
+    assert cache.get(("a",)) is None
+    assert cache.data_version == 2
+    assert cache.stats()["invalidations"] == 1
+    assert cache.stats()["bytes"] == 0